@@ -0,0 +1,225 @@
+import numpy as np
+
+
+def group_bounds(*key_columns):
+    """
+    Return the start offset and size of each run of equal consecutive keys.
+
+    Args:
+        *key_columns (sequence): One or more group key columns of equal length,
+                                 sorted so that rows of the same group are adjacent.
+
+    Returns:
+        tuple: (starts, counts) as integer arrays, one entry per group.
+    """
+    size = len(key_columns[0])
+    if size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    changed = np.zeros(size - 1, dtype=bool)
+    for column in key_columns:
+        column = np.asarray(column, dtype=object)
+        changed |= column[1:] != column[:-1]
+    starts = np.flatnonzero(np.r_[True, changed])
+    counts = np.diff(np.r_[starts, size])
+    return starts, counts
+
+
+def grouped_percentiles(values, starts, counts, quantiles):
+    """
+    Compute percentiles for every group of a grouped, within-group sorted array.
+
+    Uses linear interpolation between the closest ranks, which is what
+    Postgres percentile_cont and statistics.median compute.
+
+    Args:
+        values (np.ndarray): Float values, sorted ascending inside each group.
+        starts (np.ndarray): Offset of each group, from group_bounds().
+        counts (np.ndarray): Size of each group, from group_bounds().
+        quantiles (sequence): Fractions in [0, 1].
+
+    Returns:
+        np.ndarray: Array of shape (len(starts), len(quantiles)).
+    """
+    quantiles = np.asarray(quantiles, dtype=float)
+    positions = (counts[:, None] - 1) * quantiles[None, :]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.ceil(positions).astype(np.intp)
+    low_values = values[starts[:, None] + lower]
+    high_values = values[starts[:, None] + upper]
+    return low_values + (high_values - low_values) * (positions - lower)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Select the points to keep with Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept. The points in between are
+    split into threshold - 2 buckets, and from each bucket the point forming
+    the largest triangle with the previously kept point and the average of
+    the next bucket is kept.
+
+    Args:
+        x (sequence): Ascending x values, e.g. epoch seconds.
+        y (sequence): Values to preserve the visual shape of.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        return np.array([0, size - 1], dtype=np.intp)[:max(threshold, 0)]
+
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+        else:
+            next_start, next_end = size - 1, size
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def cover_window(start, end, widths):
+    """
+    Split [start, end) into the fewest whole buckets of the given widths.
+
+    Buckets are aligned to the Unix epoch. Both ends are epoch seconds and
+    must be multiples of the smallest width. With 1d, 1h and 1m buckets, a
+    window of N days needs at most N + 2 * 23 + 2 * 59 of them.
+
+    Args:
+        start (int): Window start.
+        end (int): Window end (exclusive).
+        widths (dict): Bucket name -> width in seconds.
+
+    Returns:
+        list: (name, first bucket start, last bucket start) runs of consecutive buckets.
+    """
+    runs = []
+    widths = sorted(widths.items(), key=lambda item: -item[1])
+    position = start
+    while position < end:
+        for name, seconds in widths:
+            if position % seconds == 0 and position + seconds <= end:
+                if runs and runs[-1][0] == name and runs[-1][2] + seconds == position:
+                    runs[-1] = (name, runs[-1][1], position)
+                else:
+                    runs.append((name, position, position))
+                position += seconds
+                break
+    return runs
+
+
+class TDigest:
+    """
+    Mergeable t-digest quantile sketch (Dunning & Ertl, "Computing extremely
+    accurate quantiles using t-digests").
+
+    Values are summarized by at most about compression / 2 weighted
+    centroids. The k1 scale function makes centroids small near the tails and
+    larger around the median, so extreme percentiles stay accurate. Merging
+    digests and re-clustering their centroids gives a digest of the union.
+    The exact minimum and maximum are kept for the ends.
+
+    Digests of fewer than compression / pi values keep every value, so
+    their quantiles are exact and match percentile_cont.
+    """
+
+    def __init__(self, means, weights, minimum, maximum):
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    @classmethod
+    def from_values(cls, values, compression=200):
+        """Build a digest of an array of floats (NaNs are ignored)."""
+        values = np.asarray(values, dtype=float)
+        values = np.sort(values[~np.isnan(values)])
+        if not len(values):
+            return cls(np.empty(0), np.empty(0), np.nan, np.nan)
+        means, weights = _cluster(values, np.ones(len(values)), compression)
+        return cls(means, weights, float(values[0]), float(values[-1]))
+
+    @classmethod
+    def merge(cls, digests, compression=200):
+        """Return one digest of everything the `digests` summarize."""
+        digests = [digest for digest in digests if len(digest.means)]
+        if not digests:
+            return cls(np.empty(0), np.empty(0), np.nan, np.nan)
+        means = np.concatenate([digest.means for digest in digests])
+        weights = np.concatenate([digest.weights for digest in digests])
+        order = np.argsort(means, kind='stable')
+        means, weights = _cluster(means[order], weights[order], compression)
+        return cls(
+            means, weights,
+            min(digest.minimum for digest in digests),
+            max(digest.maximum for digest in digests)
+        )
+
+    @classmethod
+    def from_bytes(cls, data, minimum, maximum):
+        centroids = np.frombuffer(data, dtype='<f8').reshape(2, -1)
+        return cls(centroids[0], centroids[1], minimum, maximum)
+
+    def to_bytes(self):
+        """Serialize the centroids; the minimum and maximum are stored separately."""
+        return np.concatenate([self.means, self.weights]).astype('<f8').tobytes()
+
+    def quantile(self, quantiles):
+        """
+        Estimate quantiles, interpolating linearly between centroid centers.
+
+        Args:
+            quantiles (sequence): Fractions in [0, 1].
+
+        Returns:
+            np.ndarray: One estimate per quantile, NaN for an empty digest.
+        """
+        quantiles = np.asarray(quantiles, dtype=float)
+        total = self.weights.sum()
+        if not total:
+            return np.full(quantiles.shape, np.nan)
+        centers = np.cumsum(self.weights) - self.weights / 2
+        # Rank positions as in percentile_cont, with the first value at 0.5
+        positions = quantiles * (total - 1) + 0.5
+        return np.interp(
+            positions,
+            np.r_[0.5, centers, total - 0.5],
+            np.r_[self.minimum, self.means, self.maximum]
+        )
+
+
+def _cluster(means, weights, compression):
+    """
+    Merge sorted centroids whose rank midpoints fall into the same unit of the k1 scale.
+
+    k1(q) = compression / (2 pi) * asin(2q - 1) spans compression / 2 units,
+    so the result has at most about compression / 2 centroids.
+    """
+    cumulative = np.cumsum(weights)
+    midpoints = (cumulative - weights / 2) / cumulative[-1]
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(np.clip(2 * midpoints - 1, -1, 1)))
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    merged_weights = np.add.reduceat(weights, starts)
+    return np.add.reduceat(means * weights, starts) / merged_weights, merged_weights
@@ -1,8 +1,9 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify
 from config import Config
-from extensions import db, socketio
+from extensions import db, socketio, scheduler, cache, metrics, leader, api_keys, db_router
+from commands import register_commands
+from json_provider import OrjsonProvider
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 import os
 import logging
 from flask_swagger_ui import get_swaggerui_blueprint
@@ -11,24 +12,42 @@ from flask import redirect
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
 
     # Set up logging
     logging.basicConfig(level=logging.INFO)
 
     db.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
-
-    from routes import providers, pools , slippage
+    db_router.init_app(app)
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
+    leader.init_app(app)
+    scheduler.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
+    register_commands(app)
+
+    from events import real_time  # noqa: F401 (registers the Socket.IO handlers)
+    from events.broadcaster import broadcaster
+    broadcaster.init_app(app)
+
+    from routes import providers, pools , slippage, ingest, transactions, candles
     app.register_blueprint(providers.bp)
     app.register_blueprint(pools.bp)
     app.register_blueprint(slippage.bp)
+    app.register_blueprint(ingest.bp)
+    app.register_blueprint(transactions.bp)
+    app.register_blueprint(candles.bp)
 
+    # Storage and strategy come from RATELIMIT_STORAGE_URI / RATELIMIT_STRATEGY
+    api_keys.init_app(app)
     limiter = Limiter(
-        key_func=get_remote_address,  # Make sure this is passed only once
+        key_func=api_keys.key_func,  # API key if valid, else client IP
         app=app,
-        default_limits=["200 per day", "50 per hour"]
+        default_limits=[api_keys.limits]
     )
+    limiter.request_filter(api_keys.exempt)
     app.limiter = limiter  # Store limiter on app for global access
+    limiter.exempt(metrics.export)  # Scraped every few seconds
 
     # Swagger UI setup
     SWAGGER_URL = '/api/docs'  # URL for exposing Swagger UI (without trailing '/')
@@ -49,17 +68,17 @@ def create_app():
     def health_check():
         return jsonify(status='healthy !'), 200
 
-    @app.before_request
-    def log_request_info():
-        # app.logger.info('Headers: %s', request.headers)
-        app.logger.info('Body: %s', request.get_data())
+    return app
 
-    @app.after_request
-    def log_response_info(response):
-        app.logger.info('Response Status: %s', response.status)
-        return response
 
-    return app
+def start_background_tasks():
+    """Start leader election, the scheduled jobs and the shared broadcaster in this worker."""
+    from events.broadcaster import broadcaster
+
+    leader.start()
+    scheduler.start()
+    broadcaster.start()
+
 
 app = create_app()
 
@@ -75,4 +94,5 @@ def rate_limited_resource():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
+    start_background_tasks()
     socketio.run(app, host='0.0.0.0', port=port, log_output=True, allow_unsafe_werkzeug=True)
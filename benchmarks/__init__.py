@@ -0,0 +1,35 @@
+"""
+Reproducible benchmarks of the API.
+
+    python -m benchmarks.generate --db-url sqlite:////tmp/bench.db --pools 200 --days 30
+    python -m benchmarks.run --db-url sqlite:////tmp/bench.db --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+"""
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_url, **config):
+    """
+    Import the application against `db_url`.
+
+    Config is read from the environment when config.py is imported, so the
+    database URL and any overrides (e.g. CACHE_BACKEND='none') have to be
+    set before the first import of app.
+    """
+    os.environ['DB_URL'] = db_url
+    for name, value in config.items():
+        os.environ[name] = str(value)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    from app import app
+
+    app.limiter.enabled = False
+    # Per-request INFO logs would measure the terminal, not the API
+    logging.getLogger().setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+    return app
@@ -0,0 +1,70 @@
+"""
+Compare a benchmark report against a baseline and fail on regressions.
+
+Latency, throughput, query counts and memory may drift by --tolerance (a
+fraction) before they count as regressions. New errors always fail.
+"""
+import argparse
+import json
+import sys
+
+# Endpoint metric -> whether a higher value is worse
+ENDPOINT_METRICS = {
+    'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'throughput_rps': False, 'queries_per_request': True,
+}
+
+
+def _regressed(old, new, higher_is_worse, tolerance):
+    if old is None or new is None or old == 0:
+        return False
+    change = (new - old) / old
+    return change > tolerance if higher_is_worse else change < -tolerance
+
+
+def compare(baseline, report, tolerance=0.25):
+    """
+    Return a list of (name, metric, baseline value, new value) regressions.
+    """
+    regressions = []
+    for name, old in baseline['endpoints'].items():
+        new = report['endpoints'].get(name)
+        if new is None:
+            continue
+        for metric, higher_is_worse in ENDPOINT_METRICS.items():
+            if _regressed(old[metric], new[metric], higher_is_worse, tolerance):
+                regressions.append((name, metric, old[metric], new[metric]))
+        if new['errors'] > old['errors']:
+            regressions.append((name, 'errors', old['errors'], new['errors']))
+
+    old, new = baseline.get('socketio'), report.get('socketio')
+    if old and new and _regressed(old['broadcast_queries_per_second'], new['broadcast_queries_per_second'], True, tolerance):
+        regressions.append(('socketio', 'broadcast_queries_per_second',
+                            old['broadcast_queries_per_second'], new['broadcast_queries_per_second']))
+
+    if _regressed(baseline['peak_rss_mb'], report['peak_rss_mb'], True, tolerance):
+        regressions.append(('process', 'peak_rss_mb', baseline['peak_rss_mb'], report['peak_rss_mb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('report')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative drift, default 0.25')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.report) as f:
+        report = json.load(f)
+
+    regressions = compare(baseline, report, args.tolerance)
+    for name, metric, old, new in regressions:
+        print(f'REGRESSION {name} {metric}: {old} -> {new}')
+    if regressions:
+        sys.exit(1)
+    print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Synthetic aptos_pools / aptos_transactions generator.
+
+Pools get a snapshot every --snapshot-minutes with random-walk TVL and
+volumes; trades arrive as a Poisson process at --tx-rate per second over
+--days, concentrated on a few popular pairs like on mainnet. The same
+--seed always produces the same rows, relative to an hour-aligned `now`.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import load_app
+
+PROVIDERS = ['liquidswap', 'thala', 'cellana', 'pancakeswap', 'sushiswap', 'aux', 'animeswap', 'cetus']
+
+COINS = [
+    '0x1::aptos_coin::AptosCoin',
+    '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::USDC',
+    '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::USDT',
+    '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::WETH',
+    '0x7fd500c11216f0fe3095d0c4b8aa4d64a4e2e04f83758462f2b127255643615::thl_coin::THL',
+    '0x111ae3e5bc816a5e63c2da97d0aa3886519e0cd5e4b046659fa35796bd11542a::stapt_token::StakedApt',
+    '0xcfea864b32833f157f042618bd845145256b1bf4c0da34a7013b76e42daa53cc::usdy::USDY',
+    '0x5e156f1207d0ebfa19a9eeff00d62a282278fb8719f4fab3a586a0a2c0fffbea::coin::T',
+]
+
+BATCH_SIZE = 5000
+
+
+def make_pools(rng, pools, providers):
+    """Return (pool_address, provider, token_a, token_b, base_tvl) tuples."""
+    result = []
+    for index in range(pools):
+        # The first pools are the popular APT/stablecoin pairs
+        if index < len(COINS) - 1:
+            token_a, token_b = COINS[0], COINS[index + 1]
+        else:
+            token_a, token_b = rng.sample(COINS, 2)
+        result.append((
+            f'0x{rng.getrandbits(256):064x}',
+            PROVIDERS[index % providers],
+            token_a,
+            token_b,
+            rng.lognormvariate(11, 2),
+        ))
+    return result
+
+
+def pool_rows(rng, pools, start, now, snapshot_minutes):
+    """Yield aptos_pools rows for every pool and snapshot time."""
+    step = timedelta(minutes=snapshot_minutes)
+    for pool_address, provider, token_a, token_b, base_tvl in pools:
+        tvl = base_tvl
+        timestamp = start
+        while timestamp <= now:
+            tvl = max(tvl * rng.lognormvariate(0, 0.02), 1.0)
+            volume_day = tvl * rng.uniform(0.01, 0.5)
+            yield {
+                'timestamp': timestamp,
+                'provider': provider,
+                'pool_address': pool_address,
+                'token_a': token_a,
+                'token_b': token_b,
+                'tvl': round(tvl, 6),
+                'volume_day': round(volume_day, 6),
+                'volume_week': round(volume_day * rng.uniform(5, 9), 6),
+                'volume_month': round(volume_day * rng.uniform(20, 40), 6),
+                'fees_day': round(volume_day * 0.003, 6),
+                'fees_week': round(volume_day * 0.02, 6),
+                'fees_month': round(volume_day * 0.09, 6),
+                'state': 'active',
+                'median_slippage_1d': round(rng.lognormvariate(-7, 1), 8),
+                'median_slippage_7d': round(rng.lognormvariate(-7, 1), 8),
+                'median_slippage_30d': round(rng.lognormvariate(-7, 1), 8),
+            }
+            timestamp += step
+
+
+def transaction_rows(rng, pools, start, now, tx_rate):
+    """Yield aptos_transactions rows arriving at `tx_rate` per second on average."""
+    # Zipf-like popularity, so a few pools carry most of the trades
+    weights = [1.0 / (rank + 1) for rank in range(len(pools))]
+    version = 1_000_000
+    elapsed = 0.0
+    total = (now - start).total_seconds()
+    while True:
+        elapsed += rng.expovariate(tx_rate)
+        if elapsed > total:
+            return
+        version += rng.randint(1, 50)
+        pool_address, provider, token_a, token_b, base_tvl = rng.choices(pools, weights)[0]
+        coin1, coin2 = (token_a, token_b) if rng.random() < 0.5 else (token_b, token_a)
+        volume = rng.lognormvariate(5, 2)
+        price = rng.uniform(5, 12)
+        yield {
+            'version': version,
+            'timestamp': start + timedelta(seconds=elapsed),
+            'pool_address': pool_address,
+            'coin1': coin1,
+            'coin2': coin2,
+            'provider': provider,
+            'volume': round(volume, 6),
+            'delta_x': round(volume / price, 8),
+            'price_x': round(price, 8),
+            'fees': round(volume * 0.003, 8),
+            'tvl': round(base_tvl, 6),
+            # Larger trades move the price more
+            'slippage': round(min(volume / base_tvl, 0.5) * rng.uniform(0.5, 1.5), 10),
+            'decimal_x': 8,
+            'delta_y': round(volume, 8),
+            'price_y': round(1 / price, 8),
+            'created_at': start + timedelta(seconds=elapsed + rng.uniform(1, 5)),
+            'pool_name': f'{token_a.rsplit("::", 1)[-1]}-{token_b.rsplit("::", 1)[-1]}',
+        }
+
+
+def insert_batches(table, rows):
+    """Insert rows with executemany in batches; return the number inserted."""
+    from extensions import db
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+
+def generate(db_url, pools=50, providers=4, days=7, tx_rate=0.05, snapshot_minutes=15, seed=42, reset=False):
+    """
+    Fill the database at `db_url` with synthetic data and build the derived tables.
+
+    Returns:
+        dict: Row counts and timings, also printed by the CLI.
+    """
+    app = load_app(db_url)
+
+    from extensions import db
+    from models.aptos_pool import AptosPool
+    from models.aptos_pool_compacted import AptosPoolHourly, AptosPoolDaily
+    from models.aptos_pool_latest import AptosPoolLatest, refresh_latest_pools
+    from models.aptos_transactions import AptosTransactions
+    from models.job_watermark import JobWatermark
+    from models.slippage_rollup import SlippageRollup, update_slippage_rollups
+    from models.slippage_sketch import SlippageSketch, update_slippage_sketches
+    from models.pool_candle import PoolCandle, update_pool_candles
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=days)
+    pool_specs = make_pools(rng, pools, min(providers, len(PROVIDERS)))
+
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=['db-upgrade'])
+        if result.exit_code != 0:
+            raise RuntimeError(f'db-upgrade failed: {result.output}')
+
+        if reset:
+            for model in (SlippageRollup, SlippageSketch, PoolCandle, JobWatermark, AptosPoolLatest, AptosTransactions, AptosPool, AptosPoolHourly, AptosPoolDaily):
+                db.session.query(model).delete()
+            db.session.commit()
+
+        began = time.perf_counter()
+        snapshots = insert_batches(AptosPool.__table__, pool_rows(rng, pool_specs, start, now, snapshot_minutes))
+        transactions = insert_batches(AptosTransactions.__table__, transaction_rows(rng, pool_specs, start, now, tx_rate))
+        inserted = time.perf_counter()
+
+        # Bulk inserts bypass the ORM listener, so rebuild the derived tables
+        refresh_latest_pools()
+        rollups = update_slippage_rollups()
+        sketches = update_slippage_sketches()
+        candles = update_pool_candles()
+        derived = time.perf_counter()
+
+    return {
+        'pools': pools,
+        'snapshots': snapshots,
+        'transactions': transactions,
+        'slippage_rollups': rollups,
+        'slippage_sketches': sketches,
+        'pool_candles': candles,
+        'insert_seconds': round(inserted - began, 3),
+        'derive_seconds': round(derived - inserted, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db-url', required=True, help='SQLAlchemy URL, e.g. sqlite:////tmp/bench.db')
+    parser.add_argument('--pools', type=int, default=50)
+    parser.add_argument('--providers', type=int, default=4, help=f'At most {len(PROVIDERS)}')
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--tx-rate', type=float, default=0.05, help='Average transactions per second')
+    parser.add_argument('--snapshot-minutes', type=int, default=15, help='Minutes between pool snapshots')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Delete existing rows first')
+    args = parser.parse_args()
+
+    summary = generate(
+        args.db_url, pools=args.pools, providers=args.providers, days=args.days, tx_rate=args.tx_rate,
+        snapshot_minutes=args.snapshot_minutes, seed=args.seed, reset=args.reset
+    )
+    for name, value in summary.items():
+        print(f'{name}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Drive every endpoint and the Socket.IO rooms under concurrent load.
+
+Requests go through the WSGI app in-process (Flask test client), so the
+numbers cover routing, caching, SQL and serialization without a network
+hop, and every SQL statement can be attributed to the endpoint that ran it.
+The JSON report keeps the same shape across runs, so CI can diff it
+against a stored baseline with benchmarks.compare.
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks import load_app
+
+# Name -> URL template; {pool} and {provider} are drawn from the data per request
+SCENARIOS = {
+    'pools': '/api/pools',
+    'top': '/top',
+    'top_paginated': '/top?metric=volume_day&limit=20',
+    'providers': '/api/providers',
+    'provider': '/api/providers/{provider}',
+    'pool_current': '/api/pool/{pool}/current',
+    'pool_history_day': '/api/pool/{pool}/history?range=day',
+    'pool_history_month_1h': '/api/pool/{pool}/history?range=month&resolution=1h',
+    'pool_history_page': '/api/pool/{pool}/history?range=week&limit=100',
+    'pool_candles_1h': '/api/pool/{pool}/candles?interval=1h',
+    'pool_candles_1m': '/api/pool/{pool}/candles?interval=1m&limit=1000',
+    'pool_transactions': '/api/pool/{pool}/transactions?limit=100',
+    'transactions': '/api/transactions?limit=100',
+    'slippage_hour': '/api/slippage?range=hour',
+    'slippage_week': '/api/slippage?range=week',
+    'slippage_percentiles_week': '/api/slippage/percentiles?range=week&q=50,99,99.9',
+}
+
+
+class QueryCounter:
+    """Count SQL statements per scenario, across the worker threads."""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        name = getattr(self.local, 'scenario', None)
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3), 'p99_ms': round(float(p99), 3)}
+
+
+def run_scenario(app, counter, name, template, samples, requests, concurrency, seed):
+    """Issue `requests` GETs of one scenario from `concurrency` threads."""
+    rng = random.Random(seed)
+    urls = [template.format(pool=rng.choice(samples['pools']), provider=rng.choice(samples['providers']))
+            for _ in range(requests)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = app.test_client()
+        counter.local.scenario = name
+        for url in chunk:
+            began = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+        counter.local.scenario = None
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, [urls[index::concurrency] for index in range(concurrency)]))
+    wall = time.perf_counter() - began
+
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        **percentiles(latencies),
+        'throughput_rps': round(requests / wall, 1),
+        'queries_per_request': round(counter.counts.get(name, 0) / requests, 2),
+    }
+
+
+def run_socketio(app, counter, samples, clients, rooms_per_client, duration, format=None):
+    """Subscribe `clients` Socket.IO clients to pool rooms in `format` and measure the pushes."""
+    from extensions import socketio
+
+    rng = random.Random(0)
+    connected = [socketio.test_client(app) for _ in range(clients)]
+    counter.local.scenario = 'socketio'
+
+    began = time.perf_counter()
+    for index, client in enumerate(connected):
+        if index % 10 == 0:
+            client.emit('subscribe_overall_stats', {'format': format})
+        for pool_address in rng.sample(samples['pools'], min(rooms_per_client, len(samples['pools']))):
+            client.emit('subscribe_pool', {'pool_address': pool_address, 'format': format})
+    subscribed = time.perf_counter()
+    for client in connected:
+        client.get_received()
+
+    # Reads of the broadcaster thread are attributed to no scenario; count them here
+    background_before = counter.counts.get(None, 0)
+    socketio.sleep(duration)
+    received = sum(len(client.get_received()) for client in connected)
+    background = counter.counts.get(None, 0) - background_before
+
+    for client in connected:
+        client.disconnect()
+    counter.local.scenario = None
+
+    return {
+        'clients': clients,
+        'rooms_per_client': rooms_per_client,
+        'format': format,
+        'subscribe_ms_per_client': round((subscribed - began) * 1000 / clients, 3),
+        'messages_per_second': round(received / duration, 1),
+        'broadcast_queries_per_second': round(background / duration, 2),
+    }
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run(db_url, requests=200, concurrency=8, scenarios=None, socketio_clients=50, rooms_per_client=3,
+        socketio_duration=5.0, socketio_format=None, cache=True, seed=0):
+    """
+    Run the benchmark and return the report.
+
+    Returns:
+        dict: {'config', 'endpoints': {scenario: stats}, 'socketio', 'peak_rss_mb'}.
+    """
+    overrides = {'REALTIME_INTERVAL': 1}
+    if not cache:
+        overrides['CACHE_BACKEND'] = 'none'
+    app = load_app(db_url, **overrides)
+
+    from sqlalchemy import event
+    from extensions import db
+    from models.aptos_pool_latest import AptosPoolLatest
+
+    with app.app_context():
+        rows = db.session.query(AptosPoolLatest.pool_address, AptosPoolLatest.provider).all()
+        engine = db.engine
+    if not rows:
+        raise RuntimeError('The database has no pools; run benchmarks.generate first.')
+    samples = {'pools': sorted({row[0] for row in rows}), 'providers': sorted({row[1] for row in rows})}
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+
+    endpoints = {}
+    for index, name in enumerate(scenarios or SCENARIOS):
+        endpoints[name] = run_scenario(app, counter, name, SCENARIOS[name], samples, requests, concurrency, seed + index)
+
+    socketio_report = None
+    if socketio_clients:
+        socketio_report = run_socketio(
+            app, counter, samples, socketio_clients, rooms_per_client, socketio_duration, socketio_format
+        )
+
+    event.remove(engine, 'before_cursor_execute', counter)
+
+    return {
+        'config': {
+            'database': engine.dialect.name,
+            'pools': len(samples['pools']),
+            'requests': requests,
+            'concurrency': concurrency,
+            'cache': cache,
+            'python': platform.python_version(),
+        },
+        'endpoints': endpoints,
+        'socketio': socketio_report,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db-url', required=True, help='Database filled by benchmarks.generate')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients per scenario')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Run only these (repeatable)')
+    parser.add_argument('--socketio-clients', type=int, default=50, help='0 skips the Socket.IO run')
+    parser.add_argument('--rooms-per-client', type=int, default=3)
+    parser.add_argument('--socketio-duration', type=float, default=5.0, help='Seconds of pushes to measure')
+    parser.add_argument('--socketio-format', choices=['delta', 'msgpack'], help='Subscribe in this format (default full JSON)')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run(
+        args.db_url, requests=args.requests, concurrency=args.concurrency, scenarios=args.scenario,
+        socketio_clients=args.socketio_clients, rooms_per_client=args.rooms_per_client,
+        socketio_format=args.socketio_format,
+        socketio_duration=args.socketio_duration, cache=not args.no_cache, seed=args.seed
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
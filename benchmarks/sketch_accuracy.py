@@ -0,0 +1,176 @@
+"""
+Measure the error of the t-digest slippage percentiles against exact quantiles.
+
+Synthetic mode runs skewed distributions through the same pipeline as
+update_slippage_sketches and /api/slippage/percentiles: one digest per
+minute, merged into hours and days, then merged again over a window that
+is not day-aligned. --db-url compares slippage_percentiles() with the exact
+quantiles of aptos_transactions instead (run update-slippage-sketches
+first). Exits non-zero when an error exceeds the bounds below.
+
+    python -m benchmarks.sketch_accuracy
+    python -m benchmarks.sketch_accuracy --db-url sqlite:////tmp/bench.db
+"""
+import argparse
+import json
+import sys
+from datetime import timedelta, timezone
+
+import numpy as np
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Bounds at the default compression of 200. Rank error is how far the
+# estimate's rank is from the requested one (0.001 is 0.1 percentile
+# points); value error is relative to the exact quantile. Value error is
+# only bounded up to p90: further out it depends on how sparse the tail is
+# (on 7 days of synthetic ingested data, p99 is within 6% and p99.9 within
+# 15%), and a quantile falling in a gap between modes has no meaningful
+# value at all, so the bimodal mix keeps p90 inside a mode.
+MAX_RANK_ERROR = 0.001
+MAX_VALUE_ERROR = 0.05
+VALUE_ERROR_QUANTILES = (0.5, 0.9)
+# A sample of a few thousand values is summarized by centroids of a dozen
+# values or more, so small samples may be this many values off instead
+SMALL_SAMPLE_RANKS = 5
+
+DISTRIBUTIONS = {
+    'lognormal': lambda rng, size: rng.lognormal(-6, 1.2, size),
+    'exponential': lambda rng, size: rng.exponential(0.002, size),
+    'bimodal': lambda rng, size: np.where(
+        rng.random(size) < 0.8, rng.normal(0.001, 0.0002, size), rng.normal(0.02, 0.004, size)
+    ),
+}
+
+
+def errors(exact, estimates, quantiles):
+    """Return the rank and relative value error of each estimate against the sorted exact values."""
+    exact = np.sort(exact)
+    truth = np.quantile(exact, quantiles)
+    ranks = (np.searchsorted(exact, estimates, 'left') + np.searchsorted(exact, estimates, 'right')) / 2 / len(exact)
+    return [
+        {
+            'quantile': q,
+            'exact': float(value),
+            'estimate': float(estimate),
+            'rank_error': round(abs(rank - q), 6),
+            'value_error': round(abs(estimate - value) / abs(value), 6) if value else None,
+        }
+        for q, value, estimate, rank in zip(quantiles, truth, estimates, ranks)
+    ]
+
+
+def synthetic(days, tx_per_minute, compression, seed):
+    from aggregates import TDigest
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    for name, draw in DISTRIBUTIONS.items():
+        minutes = []
+        for _ in range(int(days * 1440)):
+            count = rng.poisson(tx_per_minute)
+            values = draw(rng, count)
+            minutes.append((values, TDigest.from_values(values, compression) if count else None))
+
+        # Cover minutes [90, end - 30): whole days where possible, the edges from hours and minutes
+        first, last = 90, len(minutes) - 30
+        hours = [
+            TDigest.merge([digest for _, digest in minutes[start:start + 60] if digest], compression)
+            for start in range(0, len(minutes), 60)
+        ]
+        daily = [TDigest.merge(hours[start:start + 24], compression) for start in range(0, len(hours), 24)]
+        parts = (
+            [digest for _, digest in minutes[first:120] if digest]
+            + hours[2:24]
+            + daily[1:len(minutes) // 1440 - 1]
+            + hours[(len(minutes) // 1440 - 1) * 24:last // 60]
+            + [digest for _, digest in minutes[last // 60 * 60:last] if digest]
+        )
+        window = TDigest.merge(parts, compression)
+        exact = np.concatenate([values for values, _ in minutes[first:last]])
+        assert window.count == len(exact)
+
+        results[name] = {
+            'count': len(exact),
+            'centroids': len(window.means),
+            'quantiles': errors(exact, window.quantile(QUANTILES), QUANTILES),
+        }
+    return results
+
+
+def database(db_url, days):
+    from benchmarks import load_app
+
+    app = load_app(db_url, CACHE_BACKEND='none')
+
+    from extensions import db
+    from models.aptos_transactions import AptosTransactions
+    from models.functions import pair_least, pair_greatest
+    from models.slippage_sketch import slippage_percentiles
+
+    results = {}
+    with app.app_context():
+        end = db.session.query(db.func.max(AptosTransactions.timestamp)).scalar()
+        if end is None:
+            return results
+        end = (end if end.tzinfo else end.replace(tzinfo=timezone.utc)) + timedelta(minutes=1)
+        start = end - timedelta(days=days)
+        coin_a = pair_least(AptosTransactions.coin1, AptosTransactions.coin2)
+        coin_b = pair_greatest(AptosTransactions.coin1, AptosTransactions.coin2)
+        rows = db.session.query(coin_a, coin_b, AptosTransactions.slippage).filter(
+            AptosTransactions.timestamp >= start,
+            AptosTransactions.timestamp < end,
+            AptosTransactions.slippage.isnot(None)
+        ).all()
+
+        pairs = {}
+        for pair_a, pair_b, slippage in rows:
+            pairs.setdefault((pair_a, pair_b), []).append(float(slippage))
+        for coins, exact in pairs.items():
+            # The sketches cover whole minutes, so align the window as the route does
+            estimate = slippage_percentiles(
+                QUANTILES, start.replace(second=0, microsecond=0), end.replace(second=0, microsecond=0), coins=coins
+            )
+            results['-'.join(coins)] = {
+                'count': len(exact),
+                'sketches': estimate['sketches'],
+                'quantiles': errors(np.array(exact), estimate['quantiles'], QUANTILES),
+            }
+    return results
+
+
+def violations(results):
+    found = []
+    for name, result in results.items():
+        for row in result['quantiles']:
+            if row['rank_error'] > max(MAX_RANK_ERROR, SMALL_SAMPLE_RANKS / result['count']):
+                found.append(f"{name} p{row['quantile'] * 100:g} rank error {row['rank_error']}")
+            if row['quantile'] in VALUE_ERROR_QUANTILES and (row['value_error'] or 0) > MAX_VALUE_ERROR:
+                found.append(f"{name} p{row['quantile'] * 100:g} value error {row['value_error']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db-url', help='Compare against aptos_transactions instead of synthetic data')
+    parser.add_argument('--days', type=float, default=7, help='Window length, default 7')
+    parser.add_argument('--tx-per-minute', type=float, default=20, help='Synthetic transactions per minute')
+    parser.add_argument('--compression', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.db_url:
+        results = database(args.db_url, args.days)
+    else:
+        results = synthetic(args.days, args.tx_per_minute, args.compression, args.seed)
+
+    print(json.dumps(results, indent=2))
+    found = violations(results)
+    for violation in found:
+        print(f'OUT OF BOUNDS {violation}', file=sys.stderr)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+import pickle
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response
+from signals import ingested
+
+logger = logging.getLogger(__name__)
+
+
+class LRUBackend:
+    """
+    In-process cache with per-entry expiry and least-recently-used eviction.
+
+    Bounded by entry count and, when `max_bytes` is set, by the total
+    `sizeof` of the values; a value larger than `max_bytes` is not stored.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.generation_count = 0
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self.entries[key] = (time.monotonic() + ttl, value, size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def generation(self):
+        return self.generation_count
+
+    def bump_generation(self):
+        self.generation_count += 1
+        self.clear()
+
+
+class RedisBackend:
+    """
+    Cache shared by all workers through Redis (or any server speaking its protocol).
+
+    Entries expire through Redis TTLs. Explicit invalidation bumps a shared
+    generation counter that is part of every key, so stale entries are
+    simply never read again.
+    """
+
+    def __init__(self, url, prefix='aptos-api:cache'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(f'{self.prefix}:{key}')
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(f'{self.prefix}:{key}', pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        self.bump_generation()
+
+    def generation(self):
+        return int(self.client.get(f'{self.prefix}:generation') or 0)
+
+    def bump_generation(self):
+        self.client.incr(f'{self.prefix}:generation')
+
+
+class ResponseCache:
+    """
+    Response cache for GET routes, keyed on the path and normalized query args.
+
+    Keys also embed a data watermark, the newest AptosPool snapshot timestamp
+    and AptosTransactions version. It is re-read at most every
+    CACHE_WATERMARK_INTERVAL seconds, so entries stop being served as soon
+    as new data is seen. Only complete 200 responses are stored.
+
+    Usage:
+        @bp.route('/top')
+        @cache.cached(ttl=30)
+        def get_top_pools():
+            ...
+    """
+
+    def __init__(self):
+        self.app = None
+        self.backend = None
+        self.watermark = None
+        self.checked_at = 0.0
+        self.watermark_interval = 2.0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        self.app = app
+        self.watermark_interval = app.config['CACHE_WATERMARK_INTERVAL']
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'lru':
+            # Bound by the response bodies, which make up nearly all of an entry
+            self.backend = LRUBackend(
+                app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_BYTES'], sizeof=lambda entry: len(entry[0])
+            )
+        else:
+            self.backend = None
+        ingested.connect(self._on_ingested, sender=app)
+
+    def _on_ingested(self, sender, **extra):
+        self.invalidate()
+
+    def current_watermark(self):
+        """Return the data watermark, re-reading it when the check interval has passed."""
+        from extensions import db
+        from models.aptos_pool_latest import AptosPoolLatest
+        from models.aptos_transactions import AptosTransactions
+        from sqlalchemy import func
+
+        now = time.monotonic()
+        if self.watermark is not None and now - self.checked_at < self.watermark_interval:
+            return self.watermark
+
+        with self.lock:
+            if self.watermark is None or now - self.checked_at >= self.watermark_interval:
+                latest_snapshot = db.session.query(func.max(AptosPoolLatest.timestamp)).scalar()
+                latest_version = db.session.query(func.max(AptosTransactions.version)).scalar()
+                watermark = (
+                    f"{latest_snapshot.isoformat() if latest_snapshot else ''}:{latest_version or 0}:"
+                    f"{self.backend.generation()}"
+                )
+                if self.watermark is not None and watermark != self.watermark:
+                    self.stats['invalidations'] += 1
+                    # Keys with the old watermark can never be read again
+                    if isinstance(self.backend, LRUBackend):
+                        self.backend.clear()
+                self.watermark = watermark
+                self.checked_at = now
+        return self.watermark
+
+    def invalidate(self):
+        """Drop every cached response, e.g. right after an ingestion commit."""
+        if self.backend is None:
+            return
+        self.backend.bump_generation()
+        # Pick up the new generation on the next request
+        self.checked_at = 0.0
+
+    def make_key(self):
+        from routes.helpers import wants_stream
+
+        args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+        return f'{request.path}?{args}|{int(wants_stream())}'
+
+    def ttl_for(self, ttl):
+        """Resolve the TTL of the current endpoint: CACHE_TTLS, then the decorator's, then CACHE_DEFAULT_TTL."""
+        overrides = self.app.config['CACHE_TTLS']
+        if request.endpoint in overrides:
+            return overrides[request.endpoint]
+        return ttl if ttl is not None else self.app.config['CACHE_DEFAULT_TTL']
+
+    def cached(self, ttl=None):
+        """
+        Cache a view's responses for `ttl` seconds (see ttl_for for overrides).
+
+        Streamed and non-200 responses are passed through uncached.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                try:
+                    key = f'{self.current_watermark()}|{self.make_key()}'
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    logger.error(f"Response cache unavailable: {str(e)}", exc_info=True)
+                    return view(*args, **kwargs)
+
+                if entry is not None:
+                    self.stats['hits'] += 1
+                    body, status, headers = entry
+                    return Response(body, status=status, headers=headers)
+
+                self.stats['misses'] += 1
+                response = self.app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    headers = [(name, value) for name, value in response.headers if name.lower() != 'set-cookie']
+                    try:
+                        self.backend.set(key, (response.get_data(), response.status_code, headers), self.ttl_for(ttl))
+                    except Exception as e:
+                        logger.error(f"Could not store the response: {str(e)}", exc_info=True)
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,334 @@
+import os
+import re
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from extensions import db, scheduler
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+NO_TRANSACTION_MARKER = '-- migrate:no-transaction'
+
+# History tables that must always be read through an index
+INDEXED_TABLES = re.compile(r'\b(aptos_pools(?:_hourly|_daily)?|aptos_transactions|slippage_sketches|pool_candles)\b(?!_)')
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade():
+    """
+    Apply pending SQL migrations from migrations/ in version order.
+
+    Postgres only; on other backends (SQLite for local runs) the tables and
+    indexes are created from the models instead. Each file runs in its own transaction,
+    unless it starts with a '-- migrate:no-transaction' line (needed for
+    CREATE INDEX CONCURRENTLY); its statements then run one by one in
+    autocommit mode.
+    """
+    # Make sure every model is registered before create_all
+    import models.api_key  # noqa: F401
+    import models.aptos_pool_compacted  # noqa: F401
+    import models.aptos_pool_latest  # noqa: F401
+    import models.slippage_rollup  # noqa: F401
+    import models.slippage_sketch  # noqa: F401
+    import models.pool_candle  # noqa: F401
+
+    if db.engine.dialect.name != 'postgresql':
+        db.create_all()
+        # create_all skips the indexes of tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        click.echo('Created tables from models')
+        return
+
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version VARCHAR PRIMARY KEY, applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())'
+        ))
+        applied = {row.version for row in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        version, ext = os.path.splitext(filename)
+        if ext != '.sql' or version in applied:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            sql = f.read()
+        if sql.startswith(NO_TRANSACTION_MARKER):
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for statement in sql.split(';\n'):
+                    # Skip the comment-only tail after the last statement
+                    if any(line.strip() and not line.strip().startswith('--') for line in statement.splitlines()):
+                        connection.exec_driver_sql(statement)
+        else:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(sql)
+        with db.engine.begin() as connection:
+            connection.execute(text('INSERT INTO schema_migrations (version) VALUES (:version)'), {'version': version})
+        click.echo(f'Applied {filename}')
+
+
+def _plan_seq_scans(connection, statement, parameters):
+    """Return the history tables the plan of `statement` reads with a sequential scan."""
+    if connection.dialect.name == 'postgresql':
+        with connection.begin():
+            # Make the planner pick any usable index, whatever the table sizes
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        nodes, scans = [plan[0]['Plan']], []
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', []))
+            if node['Node Type'] == 'Seq Scan' and INDEXED_TABLES.fullmatch(node['Relation Name']):
+                scans.append(node['Relation Name'])
+        return scans
+
+    scans = []
+    for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+        # 'SCAN t' is a full scan; 'SCAN t USING [COVERING] INDEX i' walks an index
+        match = re.match(r'SCAN (\w+)$', row[-1])
+        if match and INDEXED_TABLES.fullmatch(match.group(1)):
+            scans.append(match.group(1))
+    return scans
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans():
+    """
+    Fail if a route reads aptos_pools or aptos_transactions with a sequential scan.
+
+    Requests every endpoint against the current (seeded) database, captures
+    the SQL it runs and EXPLAINs each statement touching the history tables.
+    Exits non-zero on the first regression, so it can gate CI.
+    """
+    from flask import current_app
+    from sqlalchemy import event
+    from models.aptos_pool_latest import AptosPoolLatest
+
+    sample = db.session.query(AptosPoolLatest.pool_address, AptosPoolLatest.provider).first()
+    if sample is None:
+        raise click.ClickException('The database has no pools; seed it first.')
+    pool_address, provider = sample
+    db.session.remove()
+
+    urls = [
+        f'/api/pool/{pool_address}/current',
+        f'/api/pool/{pool_address}/history?range=week',
+        f'/api/pool/{pool_address}/history?range=month&resolution=1h',
+        f'/api/pool/{pool_address}/history?range=month&limit=50',
+        '/api/pools',
+        f'/top?provider={provider}',
+        '/api/providers',
+        f'/api/providers/{provider}',
+        '/api/slippage?range=week',
+        '/api/slippage/percentiles?range=week',
+        f'/api/pool/{pool_address}/transactions',
+        f'/api/pool/{pool_address}/transactions?since_version=0&limit=100',
+        '/api/transactions',
+        f'/api/transactions?since_version=0&provider={provider}',
+        f'/api/pool/{pool_address}/candles?interval=1h',
+        f'/api/pool/{pool_address}/candles?interval=1d',
+    ]
+    # POST routes with their JSON bodies
+    posts = {
+        '/api/pools/batch': {'addresses': [pool_address], 'range': 'week', 'resolution': '1h'},
+    }
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if INDEXED_TABLES.search(statement) and not statement.lstrip().upper().startswith('EXPLAIN'):
+            statements.append((statement, parameters))
+
+    client = current_app.test_client()
+    current_app.limiter.enabled = False
+
+    failures = 0
+    for url in urls + list(posts):
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            response = client.post(url, json=posts[url]) if url in posts else client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        if response.status_code != 200:
+            raise click.ClickException(f'GET {url} returned {response.status_code}')
+
+        url_failures = 0
+        with db.engine.connect() as connection:
+            for statement, parameters in statements:
+                scans = _plan_seq_scans(connection, statement, parameters)
+                if scans:
+                    url_failures += 1
+                    click.echo(f'FAIL {url}: sequential scan on {", ".join(sorted(set(scans)))}\n  {statement}', err=True)
+        if not url_failures:
+            click.echo(f'ok   {url} ({len(statements)} statements)')
+        failures += url_failures
+
+    if failures:
+        raise click.ClickException(f'{failures} statement(s) fell back to a sequential scan')
+    click.echo('All query plans use indexes')
+
+
+@click.command('create-api-key')
+@click.option('--name', required=True, help='Who the key is for')
+@click.option('--tier', required=True, help='A tier of RATELIMIT_TIERS')
+@with_appcontext
+def create_api_key(name, tier):
+    """Create an API key and print it; only its digest is stored."""
+    import secrets
+    from flask import current_app
+    from models.api_key import ApiKey
+
+    if tier not in current_app.config['RATELIMIT_TIERS']:
+        raise click.BadParameter(f"Unknown tier. Use one of: {', '.join(current_app.config['RATELIMIT_TIERS'])}.")
+    api_key = secrets.token_urlsafe(32)
+    db.session.add(ApiKey(key_hash=ApiKey.hash(api_key), name=name, tier=tier))
+    db.session.commit()
+    click.echo(api_key)
+
+
+@click.command('revoke-api-key')
+@click.argument('api_key')
+@with_appcontext
+def revoke_api_key(api_key):
+    """Deactivate an API key; running workers drop it within API_KEY_CACHE_TTL."""
+    from models.api_key import ApiKey
+
+    key = db.session.get(ApiKey, ApiKey.hash(api_key))
+    if key is None:
+        raise click.ClickException('Unknown API key')
+    key.active = False
+    db.session.commit()
+    click.echo(f'Revoked the key of {key.name}')
+
+
+@click.command('refresh-latest-pools')
+@with_appcontext
+def refresh_latest_pools_command():
+    """Rebuild aptos_pools_latest from the full aptos_pools history."""
+    from models.aptos_pool_latest import refresh_latest_pools
+
+    refresh_latest_pools()
+    click.echo('Refreshed aptos_pools_latest')
+
+
+@click.command('update-slippage-rollups')
+@with_appcontext
+def update_slippage_rollups_command():
+    """Fold new aptos_transactions versions into the slippage rollups."""
+    from models.slippage_rollup import update_slippage_rollups
+
+    written = update_slippage_rollups()
+    click.echo(f'Wrote {written} slippage rollup rows')
+
+
+@click.command('update-slippage-sketches')
+@with_appcontext
+def update_slippage_sketches_command():
+    """Fold new aptos_transactions versions into the slippage sketches."""
+    from models.slippage_sketch import update_slippage_sketches
+
+    written = update_slippage_sketches()
+    click.echo(f'Wrote {written} slippage sketch rows')
+
+
+@click.command('update-pool-candles')
+@with_appcontext
+def update_pool_candles_command():
+    """Store the OHLCV candles closed since the last run."""
+    from models.pool_candle import update_pool_candles
+
+    written = update_pool_candles()
+    click.echo(f'Wrote {written} candle rows')
+
+
+@click.command('backfill-pool-candles')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Rebuild from this day (UTC); defaults to the first transaction')
+@with_appcontext
+def backfill_pool_candles_command(since):
+    """Rebuild the OHLCV candles from aptos_transactions, one day at a time."""
+    from datetime import timezone
+    from models.pool_candle import backfill_pool_candles
+
+    def progress(day, written):
+        click.echo(f'{day:%Y-%m-%d}: {written} candles', err=True)
+
+    if since is not None:
+        since = since.replace(tzinfo=timezone.utc)
+    written = backfill_pool_candles(since, progress=progress)
+    click.echo(f'Wrote {written} candle rows')
+
+
+@click.command('compact-snapshots')
+@click.option('--raw-days', type=float, help='Keep raw snapshots this many days (default RAW_SNAPSHOT_RETENTION_DAYS)')
+@click.option('--hourly-days', type=float, help='Keep hourly rows this many days (default HOURLY_SNAPSHOT_RETENTION_DAYS)')
+@with_appcontext
+def compact_snapshots_command(raw_days, hourly_days):
+    """Roll old aptos_pools snapshots into the hourly and daily tables."""
+    from models.aptos_pool_compacted import compact_pool_snapshots
+
+    compacted = compact_pool_snapshots(raw_days=raw_days, hourly_days=hourly_days)
+    click.echo(f"Compacted {compacted['raw']} snapshots into hourly rows and {compacted['hourly']} hourly rows into daily rows")
+
+
+@click.command('ingest')
+@click.argument('kind', type=click.Choice(['pools', 'transactions']))
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--format', 'data_format', type=click.Choice(['ndjson', 'csv']),
+              help='Input format; defaults to csv for .csv files, else ndjson')
+@click.option('--batch-size', type=int, help='Rows per transaction (default INGEST_BATCH_SIZE)')
+@with_appcontext
+def ingest_command(kind, source, data_format, batch_size):
+    """Upsert NDJSON or CSV rows of KIND from SOURCE (a file, or - for stdin)."""
+    from models.ingest import IngestError, ingest
+
+    if data_format is None:
+        data_format = 'csv' if source.name.endswith('.csv') else 'ndjson'
+
+    def progress(summary):
+        click.echo(f"{summary['rows']} rows in {summary['batches']} batches, {summary['rows_per_second']} rows/s", err=True)
+
+    try:
+        summary = ingest(kind, source, format=data_format, batch_size=batch_size, progress=progress)
+    except IngestError as e:
+        raise click.ClickException(f"{e} ({e.summary['rows']} rows ingested before it)")
+    click.echo(f"Ingested {summary['rows']} {kind} rows in {summary['seconds']}s ({summary['rows_per_second']} rows/s)")
+
+
+def register_jobs(app):
+    """Register the periodic maintenance jobs on the shared scheduler."""
+    from models.aptos_pool_latest import refresh_latest_pools
+    from models.slippage_rollup import update_slippage_rollups
+    from models.slippage_sketch import update_slippage_sketches
+    from models.pool_candle import update_pool_candles
+    from models.provider_rollup import provider_rollups
+    from models.aptos_pool_compacted import compact_pool_snapshots
+
+    scheduler.add_job('refresh_latest_pools', app.config['LATEST_POOLS_REFRESH_INTERVAL'], refresh_latest_pools)
+    scheduler.add_job('update_slippage_rollups', app.config['SLIPPAGE_ROLLUP_INTERVAL'], update_slippage_rollups)
+    scheduler.add_job('update_slippage_sketches', app.config['SLIPPAGE_SKETCH_INTERVAL'], update_slippage_sketches)
+    scheduler.add_job('update_pool_candles', app.config['POOL_CANDLE_INTERVAL'], update_pool_candles)
+    scheduler.add_job('compact_pool_snapshots', app.config['SNAPSHOT_COMPACTION_INTERVAL'], compact_pool_snapshots)
+    # Every worker keeps its own provider rollups, so every worker verifies them
+    scheduler.add_job(
+        'verify_provider_rollups', app.config['PROVIDER_ROLLUP_VERIFY_INTERVAL'], provider_rollups.verify,
+        leader_only=False
+    )
+
+
+def register_commands(app):
+    app.cli.add_command(db_upgrade)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(create_api_key)
+    app.cli.add_command(revoke_api_key)
+    app.cli.add_command(refresh_latest_pools_command)
+    app.cli.add_command(update_slippage_rollups_command)
+    app.cli.add_command(update_slippage_sketches_command)
+    app.cli.add_command(update_pool_candles_command)
+    app.cli.add_command(backfill_pool_candles_command)
+    app.cli.add_command(compact_snapshots_command)
+    app.cli.add_command(ingest_command)
+    register_jobs(app)
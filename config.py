@@ -4,7 +4,156 @@ from dotenv import load_dotenv
 # Load the .env file
 load_dotenv()
 
+
+def engine_options(url):
+    """Connection pool options of the engine for `url`; SQLite keeps SQLAlchemy's own pools."""
+    options = {
+        # Test connections on checkout, so a restarted database costs no failed request
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        # Seconds before a connection is replaced, below proxies' and servers' idle timeouts
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if url and not url.startswith('sqlite'):
+        # Connections per worker, extra ones under bursts, and seconds to wait for a free one
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+        options['pool_timeout'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DB_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Streaming replica that GET requests and real-time pushes read from; writes always go to DB_URL
+    DB_REPLICA_URL = os.environ.get('DB_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': {'url': DB_REPLICA_URL, **engine_options(DB_REPLICA_URL)}} if DB_REPLICA_URL else {}
+    # Seconds of replication lag past which reads fall back to the primary
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+    # Seconds between checks of the replica's health and lag
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+    # Postgres statement_timeout of request queries in milliseconds (0 is no limit)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Per-endpoint overrides once DB_STATEMENT_TIMEOUT_MS is set, e.g. {'pools.get_pool_history': 15000}
+    DB_STATEMENT_TIMEOUTS = {
+        'pools.get_pool_history': 15000,
+        'pools.get_pools_batch': 15000,
+        'ingest.ingest_rows': 60000,
+    }
+
+    # Longest a trade feed request with `wait` is held open for new versions, and
+    # seconds between its checks for them (ingestion by the same worker wakes it at once)
+    TRANSACTIONS_MAX_WAIT = float(os.environ.get('TRANSACTIONS_MAX_WAIT', 30))
+    TRANSACTIONS_POLL_INTERVAL = float(os.environ.get('TRANSACTIONS_POLL_INTERVAL', 1))
+
+    # Seconds between full rebuilds of aptos_pools_latest (0 disables the job)
+    LATEST_POOLS_REFRESH_INTERVAL = int(os.environ.get('LATEST_POOLS_REFRESH_INTERVAL', 300))
+
+    # Seconds between real-time room heartbeats, and pushes with the change feed off
+    REALTIME_INTERVAL = float(os.environ.get('REALTIME_INTERVAL', 5))
+    # Seconds between full-state keyframes of a room; in between only changes are pushed
+    REALTIME_KEYFRAME_INTERVAL = float(os.environ.get('REALTIME_KEYFRAME_INTERVAL', 60))
+    # How the broadcaster learns which pools changed: 'notify' (Postgres LISTEN/NOTIFY,
+    # needs migration 0007), 'poll' (one max(id) query), 'auto' (notify on Postgres,
+    # else poll) or 'off' (query every room every REALTIME_INTERVAL seconds)
+    REALTIME_CHANGE_FEED = os.environ.get('REALTIME_CHANGE_FEED', 'auto')
+    # Seconds between looks at the change feed; changes in between are pushed together
+    REALTIME_FEED_INTERVAL = float(os.environ.get('REALTIME_FEED_INTERVAL', 0.5))
+
+    # Seconds of transactions the incremental jobs re-read on every run: transactions are
+    # not committed in version order, so their watermarks stay this far behind the newest
+    # one and the indexer must commit every transaction within this long of its timestamp.
+    # The provider rollups look back as far for aptos_pools_latest changes committed late
+    JOB_WATERMARK_MARGIN = int(os.environ.get('JOB_WATERMARK_MARGIN', 300))
+
+    # Seconds between incremental slippage rollup updates (0 disables the job)
+    SLIPPAGE_ROLLUP_INTERVAL = int(os.environ.get('SLIPPAGE_ROLLUP_INTERVAL', 60))
+
+    # Seconds between incremental slippage sketch updates (0 disables the job)
+    SLIPPAGE_SKETCH_INTERVAL = int(os.environ.get('SLIPPAGE_SKETCH_INTERVAL', 60))
+    # t-digest compression of the slippage sketches: about compression / 2 centroids each,
+    # higher is more accurate and larger (see benchmarks/sketch_accuracy.py)
+    SLIPPAGE_SKETCH_COMPRESSION = int(os.environ.get('SLIPPAGE_SKETCH_COMPRESSION', 200))
+
+    # Seconds between runs of the job storing closed OHLCV candles (0 disables the job)
+    POOL_CANDLE_INTERVAL = int(os.environ.get('POOL_CANDLE_INTERVAL', 60))
+    # Seconds a minute stays open after it ends, so trades committed late are in its stored candle.
+    # Never less than JOB_WATERMARK_MARGIN, the longest a transaction may take to be committed
+    POOL_CANDLE_DELAY = int(os.environ.get('POOL_CANDLE_DELAY', JOB_WATERMARK_MARGIN))
+
+    # Days of raw aptos_pools snapshots kept before they are compacted into
+    # hourly rows and deleted (0 keeps them all), and days of hourly rows kept
+    # before they become daily rows
+    RAW_SNAPSHOT_RETENTION_DAYS = float(os.environ.get('RAW_SNAPSHOT_RETENTION_DAYS', 0))
+    HOURLY_SNAPSHOT_RETENTION_DAYS = float(os.environ.get('HOURLY_SNAPSHOT_RETENTION_DAYS', 90))
+
+    # Seconds between snapshot compaction runs (0 disables the job)
+    SNAPSHOT_COMPACTION_INTERVAL = int(os.environ.get('SNAPSHOT_COMPACTION_INTERVAL', 3600))
+
+    # Seconds between full recomputes of the in-memory provider rollups, which
+    # detect and repair drift of the incremental totals (0 disables the job)
+    PROVIDER_ROLLUP_VERIFY_INTERVAL = int(os.environ.get('PROVIDER_ROLLUP_VERIFY_INTERVAL', 600))
+
+    # Short names accepted in place of full coin types, e.g. /api/slippage?pair=apt-usdc
+    TOKEN_ALIASES = {
+        'apt': '0x1::aptos_coin::AptosCoin',
+        'usdc': '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::USDC',
+    }
+
+    # Response cache: 'lru' (per process), 'redis' (shared by all workers) or 'none'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    # Total response body bytes the per-process LRU holds; larger responses are not cached
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 30))
+    # Per-endpoint TTL overrides in seconds, e.g. {'pools.get_top_pools': 10}
+    CACHE_TTLS = {}
+    # Seconds between checks of the newest snapshot/transaction that invalidate the cache
+    CACHE_WATERMARK_INTERVAL = float(os.environ.get('CACHE_WATERMARK_INTERVAL', 2))
+
+    # Share of requests written to the structured access log (0-1); server errors and slow requests are always logged
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 0.01))
+    # Requests slower than this many milliseconds are always logged
+    ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', 1000))
+
+    # Message queue (e.g. redis://redis:6379/0) through which all workers share Socket.IO emits and rooms
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    # How the worker that runs the scheduler and broadcasts is elected: 'redis', 'postgres' or 'none' (single process)
+    LEADER_ELECTION = os.environ.get('LEADER_ELECTION', 'redis' if SOCKETIO_MESSAGE_QUEUE else 'none')
+    LEADER_REDIS_URL = os.environ.get('LEADER_REDIS_URL', SOCKETIO_MESSAGE_QUEUE or 'redis://localhost:6379/0')
+    # Seconds before a dead leader's lock expires and another worker takes over
+    LEADER_LOCK_TTL = float(os.environ.get('LEADER_LOCK_TTL', 15))
+
+    # Rate-limit counters: 'memory://' (per process) or shared, e.g. redis://redis:6379/1
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'moving-window')
+    # Limits per client IP of requests without a valid API key
+    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '200 per day;50 per hour')
+    # Limits per API key by tier; None means unlimited
+    RATELIMIT_TIERS = {
+        'free': '2000 per day;200 per hour',
+        'pro': '50000 per day;5000 per hour',
+        'internal': None,
+    }
+    # Endpoints never rate limited, comma-separated, e.g. 'health_check,pools.get_current_pools'
+    RATELIMIT_EXEMPT_ENDPOINTS = [
+        name for name in os.environ.get('RATELIMIT_EXEMPT_ENDPOINTS', 'health_check').split(',') if name
+    ]
+    API_KEY_HEADER = os.environ.get('API_KEY_HEADER', 'X-API-Key')
+    # Seconds an API key lookup is cached in-process; revocations take effect after this
+    API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 300))
+
+    # Rows per committed batch of POST /api/ingest/<kind> and `flask ingest`
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 5000))
+    # Rows accepted per /api/ingest request; larger loads go through the CLI
+    INGEST_MAX_ROWS = int(os.environ.get('INGEST_MAX_ROWS', 100000))
+    # Concurrent /api/ingest requests per worker; more are turned away with 503
+    INGEST_MAX_CONCURRENCY = int(os.environ.get('INGEST_MAX_CONCURRENCY', 2))
+    # API key tiers allowed to ingest, comma-separated
+    INGEST_TIERS = [
+        name for name in os.environ.get('INGEST_TIERS', 'internal').split(',') if name
+    ]
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class RoutingSession(Session):
+    """
+    db.session class that sends reads to the read replica when DatabaseRouter allows it.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            from extensions import db_router
+
+            engine = db_router.read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class DatabaseRouter:
+    """
+    Read-replica routing and per-route statement timeouts.
+
+    With a 'replica' entry in SQLALCHEMY_BINDS, GET requests and the blocks
+    wrapped in replica() read from it; everything else, including every
+    write, uses the primary. The replica's lag is checked at most every
+    REPLICA_CHECK_INTERVAL seconds; while it is unreachable or more than
+    REPLICA_MAX_LAG_SECONDS behind, reads fall back to the primary.
+
+    On Postgres, every transaction opened during a request starts with
+    SET LOCAL statement_timeout: DB_STATEMENT_TIMEOUTS[endpoint], else
+    DB_STATEMENT_TIMEOUT_MS. With DB_STATEMENT_TIMEOUT_MS at 0 (the default)
+    no request has one. Background jobs and CLI commands never do.
+
+    Usage:
+        with db_router.replica():
+            ...  # queries of this block read from the replica
+
+        @bp.route('/api/pools/batch', methods=['POST'])
+        @db_router.read_only
+        def get_pools_batch():
+            ...
+    """
+
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self.max_lag = 10.0
+        self.check_interval = 5.0
+        self.checked_at = None
+        self.healthy = False
+        self.lag = None
+        self.lock = threading.Lock()
+        self.default_timeout = 0
+        self.timeouts = {}
+        self.stats = {'replica_reads': 0, 'primary_fallbacks': 0}
+
+    def init_app(self, app):
+        from extensions import db
+
+        self.app = app
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.default_timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+        self.timeouts = app.config['DB_STATEMENT_TIMEOUTS']
+
+        with app.app_context():
+            engines = db.engines
+        self.engine = engines.get('replica')
+        for engine in engines.values():
+            if engine.dialect.name == 'postgresql':
+                event.listen(engine, 'begin', self._set_statement_timeout)
+
+        app.before_request(self._route_request)
+
+    def _route_request(self):
+        if request.method in ('GET', 'HEAD'):
+            g.db_replica = True
+
+    @contextmanager
+    def replica(self):
+        """Read from the replica inside the block, as GET requests do."""
+        previous = g.get('db_replica', False)
+        g.db_replica = True
+        try:
+            yield
+        finally:
+            g.db_replica = previous
+
+    def read_only(self, view):
+        """Decorate a view that only reads, so it uses the replica whatever its method."""
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            g.db_replica = True
+            return view(*args, **kwargs)
+        return decorated
+
+    def read_engine(self):
+        """Return the replica engine if this context reads from it and it is usable, else None."""
+        if self.engine is None or not has_app_context() or not g.get('db_replica', False):
+            return None
+        if not self.replica_ready():
+            self.stats['primary_fallbacks'] += 1
+            return None
+        self.stats['replica_reads'] += 1
+        return self.engine
+
+    def replica_ready(self):
+        now = time.monotonic()
+        # One caller re-checks while the others go on with the last result
+        if (self.checked_at is None or now - self.checked_at >= self.check_interval) and self.lock.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                self._check_replica()
+            finally:
+                self.lock.release()
+        return self.healthy
+
+    def _check_replica(self):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    lag = float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0)
+                else:
+                    connection.execute(text('SELECT 1'))
+                    lag = 0.0
+        except Exception as e:
+            logger.error(f"Read replica check failed: {str(e)}")
+            lag = None
+
+        healthy = lag is not None and lag <= self.max_lag
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Reading from the replica again")
+            elif lag is not None:
+                logger.warning(f"Read replica is {lag:.1f}s behind, reading from the primary")
+            else:
+                logger.warning("Read replica is unreachable, reading from the primary")
+        self.lag, self.healthy = lag, healthy
+
+    def statement_timeout(self):
+        """Milliseconds allowed per statement of the current request (0 is no limit)."""
+        if not self.default_timeout or not has_request_context():
+            return 0
+        return self.timeouts.get(request.endpoint, self.default_timeout)
+
+    def _set_statement_timeout(self, connection):
+        timeout = self.statement_timeout()
+        if timeout:
+            connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
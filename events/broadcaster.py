@@ -0,0 +1,344 @@
+from extensions import socketio, db, db_router
+from events.change_feed import change_feed
+from models.aptos_pool import AptosPool
+from models.aptos_pool_latest import AptosPoolLatest
+from sqlalchemy import func
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+OVERALL_STATS_ROOM = 'overall_stats'
+
+# How a client receives a room, chosen with `format` when subscribing. None
+# is the original protocol: the full JSON payload, now only when it changed.
+# 'delta' sends JSON with only the changed fields, 'msgpack' the same as a
+# binary MessagePack frame. Each is its own Socket.IO room, '<room>|<format>'.
+FORMATS = (None, 'delta', 'msgpack')
+
+# Sent with every delta but not compared, as they change on every tick
+DELTA_KEYS = ('pool_address', 'timestamp')
+
+
+def room_name(room, format=None):
+    return room if format is None else f'{room}|{format}'
+
+
+def split_room(name):
+    """Return (room, format) of a Socket.IO room name."""
+    room, _, format = name.rpartition('|')
+    if room and format in FORMATS:
+        return room, format
+    return name, None
+
+
+def changed_fields(previous, payload):
+    """Return the fields of `payload` that differ from `previous`, plus DELTA_KEYS; {} if none did."""
+    changes = {
+        key: value for key, value in payload.items()
+        if key not in DELTA_KEYS and previous.get(key) != value
+    }
+    if changes:
+        changes.update((key, payload[key]) for key in DELTA_KEYS if key in payload)
+    return changes
+
+
+def encode(message, format):
+    """Return what is emitted to the clients of `format` for a delta message."""
+    if format == 'msgpack':
+        import msgpack
+
+        return msgpack.packb(message)
+    return message
+
+
+def keyframe(payload, format):
+    """The full state sent to a client of `format` when it subscribes."""
+    if format is None:
+        return payload
+    # The sequence of a room starts with its first broadcast message
+    return encode(dict(payload, keyframe=True, seq=None), format)
+
+
+def query_overall_stats():
+    with db_router.replica():
+        data = db.session.query(
+            func.sum(AptosPool.tvl).label('total_tvl'),
+            func.sum(AptosPool.volume_day).label('total_volume_day'),
+            func.count(AptosPool.pool_address.distinct()).label('total_pools'),
+            func.count(AptosPool.provider.distinct()).label('total_providers')
+        ).first()
+
+    return {
+        'total_tvl': float(data.total_tvl or 0),
+        'total_volume_day': float(data.total_volume_day or 0),
+        'total_pools': data.total_pools,
+        'total_providers': data.total_providers,
+        'timestamp': time.time()
+    }
+
+
+def query_pool_data(pool_addresses):
+    """Return the latest pool_update payload for each address, in one query."""
+    with db_router.replica():
+        pools = db.session.query(AptosPoolLatest).filter(
+            AptosPoolLatest.pool_address.in_(pool_addresses)
+        ).all()
+
+    now = time.time()
+    return {
+        pool.pool_address: {
+            'pool_address': pool.pool_address,
+            'tvl': float(pool.tvl or 0),
+            'volume_day': float(pool.volume_day or 0),
+            'fees_day': float(pool.fees_day or 0),
+            'timestamp': now
+        }
+        for pool in pools
+    }
+
+
+class RedisRoomRegistry:
+    """
+    Rooms subscribed on any worker, shared through Redis.
+
+    Each worker publishes its own rooms under a key that expires unless it is
+    refreshed, so the rooms of a crashed worker disappear on their own. The
+    union of all live workers' keys is what the leader broadcasts to.
+    """
+
+    def __init__(self, url, ttl, prefix='aptos-api:rooms'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl_ms = int(ttl * 1000)
+        self.worker_key = f'{prefix}:worker:{os.getpid()}-{uuid.uuid4().hex}'
+
+    def publish(self, rooms):
+        """Replace this worker's rooms with `rooms` (room -> set of sids) and refresh their expiry."""
+        pipeline = self.client.pipeline()
+        pipeline.delete(self.worker_key)
+        if rooms:
+            pipeline.hset(self.worker_key, mapping={room: len(sids) for room, sids in rooms.items()})
+            pipeline.pexpire(self.worker_key, self.ttl_ms)
+        pipeline.execute()
+
+    def active_rooms(self):
+        """Return every room with a subscriber on any live worker."""
+        rooms = set()
+        for key in self.client.scan_iter(match=f'{self.prefix}:worker:*'):
+            rooms.update(room.decode('utf-8') for room in self.client.hkeys(key))
+        return rooms
+
+    def clear(self):
+        self.client.delete(self.worker_key)
+
+
+class RoomBroadcaster:
+    """
+    Shared publisher for the real-time rooms.
+
+    Tracks which clients are in which room and runs a single background task
+    while any room has subscribers. Each tick runs one query for the overall
+    stats room and one batched IN (...) query for the pool rooms. The task
+    exits when the last client leaves.
+
+    Ticks are driven by the change feed: every REALTIME_FEED_INTERVAL
+    seconds it reports the pools that changed, and only their rooms and the
+    overall stats room are queried, or nothing when no pool changed. Every
+    REALTIME_KEYFRAME_INTERVAL seconds all rooms are refreshed. With the
+    feed off, all rooms are queried every REALTIME_INTERVAL seconds.
+
+    The last payload sent to every room is kept. A tick whose payload did not
+    change sends nothing; otherwise one message is built and encoded per room
+    and format, and Socket.IO sends the same encoded packet to every client
+    of the room. Delta formats carry only the changed fields, a per-room
+    `seq` and `keyframe`; every REALTIME_KEYFRAME_INTERVAL seconds a room
+    gets its full state again, so clients that missed a message resync.
+
+    With SOCKETIO_MESSAGE_QUEUE set, several workers share the clients: each
+    worker publishes its rooms to a RedisRoomRegistry and only the elected
+    leader queries and emits, for the rooms of all workers. The message queue
+    delivers each emit to the clients on every worker.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.interval = 5
+        self.keyframe_interval = 60
+        self.feed_interval = 0.5
+        self.rooms = {}
+        self.sent = {}
+        self.refresh_at = 0.0
+        self.retry = {}
+        self.task = None
+        self.registry = None
+        self.stats = {'messages': 0, 'keyframes': 0, 'unchanged': 0}
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['REALTIME_INTERVAL']
+        self.keyframe_interval = app.config['REALTIME_KEYFRAME_INTERVAL']
+        self.feed_interval = app.config['REALTIME_FEED_INTERVAL']
+        change_feed.init_app(app)
+        if app.config['SOCKETIO_MESSAGE_QUEUE']:
+            # Outlive a few missed heartbeats before a worker's rooms expire
+            self.registry = RedisRoomRegistry(app.config['SOCKETIO_MESSAGE_QUEUE'], max(self.interval * 3, 10))
+
+    def start(self):
+        """
+        Start the shared broadcast loop of a multi-worker deployment.
+
+        A single process needs no call; its task starts with the first subscriber.
+        """
+        if self.registry is not None and self.task is None:
+            self.task = socketio.start_background_task(self._run_shared)
+
+    def subscribe(self, sid, room):
+        self.rooms.setdefault(room, set()).add(sid)
+        if self.registry is not None:
+            self.publish()
+        elif self.task is None:
+            self.task = socketio.start_background_task(self._run)
+
+    def unsubscribe(self, sid, room):
+        subscribers = self.rooms.get(room)
+        if subscribers is None:
+            return
+        subscribers.discard(sid)
+        if not subscribers:
+            del self.rooms[room]
+            if self.registry is not None:
+                self.publish()
+
+    def disconnect(self, sid):
+        for room in list(self.rooms):
+            self.unsubscribe(sid, room)
+
+    def publish(self):
+        try:
+            self.registry.publish(self.rooms)
+        except Exception as e:
+            logger.error(f"Could not publish the rooms: {str(e)}", exc_info=True)
+
+    def step(self, rooms=None):
+        """Tick the rooms the change feed woke up, or all of them when a refresh is due."""
+        now = time.monotonic()
+        changed = change_feed.changes() if change_feed.mode != 'off' else None
+        if changed is None or now >= self.refresh_at:
+            self.refresh_at = now + (self.interval if change_feed.mode == 'off' else self.keyframe_interval)
+            self.retry = {}
+            self.tick(rooms)
+            return
+
+        # A lagging replica may not show a change yet; look again until it does
+        retry = {room: deadline for room, deadline in self.retry.items() if deadline > now}
+        woken = changed | set(retry)
+        if not woken:
+            return
+        woken.add(OVERALL_STATS_ROOM)
+        window = db_router.max_lag if db_router.engine is not None else 0
+        self.retry = {room: retry.get(room, now + window) for room in self.tick(rooms, woken)}
+
+    def tick(self, rooms=None, only=None):
+        """
+        Query the active rooms (this worker's by default), or those in `only`, and emit what changed.
+
+        Returns:
+            set: The queried rooms whose data had not changed.
+        """
+        rooms = self.rooms if rooms is None else rooms
+        formats = {}
+        for name in rooms:
+            room, format = split_room(name)
+            if only is None or room in only:
+                formats.setdefault(room, set()).add(format)
+
+        payloads = {}
+        if OVERALL_STATS_ROOM in formats:
+            payloads[OVERALL_STATS_ROOM] = query_overall_stats()
+        pool_rooms = [room for room in formats if room != OVERALL_STATS_ROOM]
+        if pool_rooms:
+            payloads.update(query_pool_data(pool_rooms))
+
+        now = time.monotonic()
+        unchanged = {room for room, payload in payloads.items() if not self.push(room, payload, formats[room], now)}
+        if only is None:
+            # Rooms subscribed again later start over with a keyframe
+            for room in list(self.sent):
+                if room not in formats:
+                    del self.sent[room]
+        return unchanged
+
+    def push(self, room, payload, formats, now):
+        """Emit `payload` to the formats of `room` if anything changed; return whether it did."""
+        event = 'overall_stats' if room == OVERALL_STATS_ROOM else 'pool_update'
+        previous, seq, keyframe_at = self.sent.get(room, (None, 0, None))
+        is_keyframe = keyframe_at is None or now - keyframe_at >= self.keyframe_interval
+        changes = payload if is_keyframe else changed_fields(previous, payload)
+        if not changes:
+            self.stats['unchanged'] += 1
+            return False
+
+        seq += 1
+        self.sent[room] = (payload, seq, now if is_keyframe else keyframe_at)
+        message = dict(changes, keyframe=is_keyframe, seq=seq)
+        for format in formats:
+            data = payload if format is None else encode(message, format)
+            socketio.emit(event, data, room=room_name(room, format))
+        self.stats['messages'] += 1
+        self.stats['keyframes'] += int(is_keyframe)
+        return True
+
+    def _run(self):
+        while True:
+            # No yield between this check and clearing self.task, so a
+            # concurrent subscribe either sees the running task or starts a new one.
+            if not self.rooms:
+                self.task = None
+                self.sent.clear()
+                self.refresh_at = 0.0
+                change_feed.close()
+                return
+            try:
+                with self.app.app_context():
+                    self.step()
+            except Exception as e:
+                logger.error(f"Real-time broadcast failed: {str(e)}", exc_info=True)
+            socketio.sleep(self.interval if change_feed.mode == 'off' else self.feed_interval)
+
+    def _run_shared(self):
+        from extensions import leader
+
+        rooms = set()
+        published_at = None
+        while True:
+            now = time.monotonic()
+            if published_at is None or now - published_at >= self.interval:
+                # Doubles as the heartbeat that keeps this worker's rooms alive
+                self.publish()
+                published_at = now
+                if leader.is_leader:
+                    try:
+                        rooms = self.registry.active_rooms()
+                    except Exception as e:
+                        logger.error(f"Could not read the rooms: {str(e)}", exc_info=True)
+
+            if leader.is_leader and rooms:
+                try:
+                    with self.app.app_context():
+                        self.step(rooms)
+                except Exception as e:
+                    logger.error(f"Real-time broadcast failed: {str(e)}", exc_info=True)
+            elif change_feed.connection is not None or self.sent:
+                # Whoever leads next starts over with a full refresh
+                change_feed.close()
+                self.sent.clear()
+                self.refresh_at = 0.0
+            socketio.sleep(self.interval if change_feed.mode == 'off' else self.feed_interval)
+
+
+broadcaster = RoomBroadcaster()
@@ -0,0 +1,106 @@
+from extensions import db
+from models.aptos_pool_latest import AptosPoolLatest
+from signals import ingested
+from sqlalchemy import func
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the trigger of migrations/0007_pool_change_notify.sql
+CHANNEL = 'aptos_pools_changed'
+
+
+class ChangeFeed:
+    """
+    The pools whose latest snapshot changed, so the broadcaster queries only their rooms.
+
+    'notify' LISTENs on a dedicated Postgres connection; reading what the
+    trigger on aptos_pools_latest sent costs no query. 'poll' runs one
+    max(id) query on aptos_pools_latest and reads the changed rows only when
+    it moved. Pools ingested by this worker are added in both modes, as
+    re-ingested snapshots are updated in place and keep their id.
+
+    REALTIME_CHANGE_FEED 'auto' picks 'notify' on Postgres and 'poll'
+    elsewhere; 'off' leaves the broadcaster querying every room on a timer.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mode = 'poll'
+        self.connection = None
+        self.watermark = None
+        self.pending = set()
+
+    def init_app(self, app):
+        self.app = app
+        mode = app.config['REALTIME_CHANGE_FEED']
+        if mode == 'auto':
+            with app.app_context():
+                mode = 'notify' if db.engine.dialect.name == 'postgresql' else 'poll'
+        self.mode = mode
+        ingested.connect(self._on_ingested, sender=app)
+
+    def changes(self):
+        """
+        Return the addresses of the pools changed since the previous call.
+
+        None means the changes are unknown, on the first call and after a
+        lost connection: every room should be refreshed.
+        """
+        pending, self.pending = self.pending, set()
+        try:
+            changed = self._notified() if self.mode == 'notify' else self._polled()
+        except Exception as e:
+            logger.error(f"Change feed failed: {str(e)}", exc_info=True)
+            self.close()
+            return None
+        return None if changed is None else changed | pending
+
+    def _notified(self):
+        if self.connection is None:
+            connection = db.engine.raw_connection()
+            # Listens for as long as the feed runs, so it must not go back to the pool
+            connection.detach()
+            connection.driver_connection.autocommit = True
+            cursor = connection.cursor()
+            cursor.execute(f'LISTEN {CHANNEL}')
+            cursor.close()
+            self.connection = connection
+            # Anything may have changed before we listened
+            return None
+
+        driver = self.connection.driver_connection
+        driver.poll()
+        changed = {notify.payload for notify in driver.notifies}
+        driver.notifies.clear()
+        return changed
+
+    def _polled(self):
+        max_id = db.session.query(func.max(AptosPoolLatest.id)).scalar() or 0
+        if self.watermark is None or max_id < self.watermark:
+            # First call, or the table was rebuilt
+            self.watermark = max_id
+            return None
+        if max_id == self.watermark:
+            return set()
+
+        rows = db.session.query(AptosPoolLatest.pool_address).filter(AptosPoolLatest.id > self.watermark).all()
+        self.watermark = max_id
+        return {row.pool_address for row in rows}
+
+    def close(self):
+        """Stop listening; the next changes() starts over and reports everything as changed."""
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.watermark = None
+
+    def _on_ingested(self, sender, kind, rows, **extra):
+        if kind == 'pools':
+            self.pending.update(row['pool_address'] for row in rows)
+
+
+change_feed = ChangeFeed()
@@ -1,5 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
+from scheduler import Scheduler
+from cache import ResponseCache
+from metrics import Metrics
+from leader import LeaderElection
+from rate_limits import ApiKeyTiers
+from database import DatabaseRouter, RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 socketio = SocketIO()
+scheduler = Scheduler()
+cache = ResponseCache()
+metrics = Metrics()
+leader = LeaderElection()
+api_keys = ApiKeyTiers()
+db_router = DatabaseRouter()
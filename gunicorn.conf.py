@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# Each eventlet worker serves many concurrent requests and WebSocket clients.
+# Workers share Socket.IO rooms and emits through SOCKETIO_MESSAGE_QUEUE and
+# elect the one running the scheduled jobs, so without a queue there is a
+# single worker. The load balancer needs sticky sessions for clients that
+# fall back to long-polling.
+worker_class = 'eventlet'
+_message_queue = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() if _message_queue else 1))
+if workers > 1:
+    if not _message_queue:
+        raise RuntimeError('WEB_CONCURRENCY > 1 needs SOCKETIO_MESSAGE_QUEUE, or rooms and emits are not shared')
+    if os.environ.get('LEADER_ELECTION') == 'none':
+        raise RuntimeError('WEB_CONCURRENCY > 1 needs LEADER_ELECTION redis or postgres, or every worker runs the jobs')
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+
+accesslog = None  # The app writes its own sampled access log
+errorlog = '-'
+
+
+def on_starting(server):
+    # Start every run with an empty directory for the workers' Prometheus metrics
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def post_worker_init(worker):
+    from app import start_background_tasks
+
+    start_background_tasks()
+
+
+def worker_exit(server, worker):
+    from extensions import leader
+    from events.broadcaster import broadcaster
+
+    # Hand leadership and this worker's rooms over immediately instead of waiting for expiry
+    leader.release()
+    if broadcaster.registry is not None:
+        broadcaster.registry.clear()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
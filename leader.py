@@ -0,0 +1,162 @@
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key of the Postgres advisory lock
+ADVISORY_LOCK_KEY = 0x61707469
+
+
+class RedisLock:
+    """Leader lock held as a Redis key with a TTL that the holder keeps renewing."""
+
+    # Extend the lock only while this worker still holds it
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url, ttl, key='aptos-api:leader'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f'{os.getpid()}-{uuid.uuid4().hex}'
+        self.renew = self.client.register_script(self.RENEW_SCRIPT)
+        self.release_script = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, held):
+        """Try to take or renew the lock; return whether it is held afterwards."""
+        if held and self.renew(keys=[self.key], args=[self.token, self.ttl_ms]):
+            return True
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    def release(self):
+        self.release_script(keys=[self.key], args=[self.token])
+
+
+class AdvisoryLock:
+    """
+    Leader lock held as a session-level Postgres advisory lock.
+
+    The lock lives as long as its dedicated connection, so it is released by
+    the server as soon as a crashed worker's connection goes away.
+    """
+
+    def __init__(self, engine, key=ADVISORY_LOCK_KEY):
+        self.engine = engine
+        self.key = key
+        self.connection = None
+
+    def acquire(self, held):
+        from sqlalchemy import text
+
+        try:
+            if held:
+                # The lock is ours while the session is alive
+                self.connection.execute(text('SELECT 1'))
+                return True
+            if self.connection is None:
+                self.connection = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+            return bool(self.connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar())
+        except Exception:
+            self.close()
+            raise
+
+    def release(self):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class LeaderElection:
+    """
+    Elects the one worker that runs the scheduler jobs and the real-time broadcasts.
+
+    LEADER_ELECTION selects the lock: 'redis' (a renewed key in
+    LEADER_REDIS_URL), 'postgres' (an advisory lock) or 'none' for a single
+    process that always leads. Every worker retries every LEADER_LOCK_TTL / 3
+    seconds, so a new leader takes over within one TTL of the old one dying.
+
+    Usage:
+        if leader.is_leader:
+            ...
+    """
+
+    def __init__(self):
+        self.app = None
+        self.lock = None
+        self.ttl = 15.0
+        self.is_leader = True
+        self.started = False
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config['LEADER_LOCK_TTL']
+        backend = app.config['LEADER_ELECTION']
+        if backend == 'redis':
+            self.lock = RedisLock(app.config['LEADER_REDIS_URL'], self.ttl)
+        elif backend == 'postgres':
+            from extensions import db
+
+            with app.app_context():
+                self.lock = AdvisoryLock(db.engine)
+        else:
+            self.lock = None
+        # Followers until the first election round
+        self.is_leader = self.lock is None
+
+    @property
+    def distributed(self):
+        """Whether several workers share the work, i.e. an election backend is configured."""
+        return self.lock is not None
+
+    def start(self):
+        """Start campaigning for leadership. Calling it more than once is a no-op."""
+        from extensions import socketio
+
+        if self.started or self.lock is None:
+            return
+        self.started = True
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        from extensions import socketio
+
+        while True:
+            try:
+                held = self.lock.acquire(self.is_leader)
+            except Exception as e:
+                logger.error(f"Leader election failed: {str(e)}", exc_info=True)
+                held = False
+            if held != self.is_leader:
+                logger.info(f"Worker {os.getpid()} {'became' if held else 'is no longer'} the leader")
+            self.is_leader = held
+            socketio.sleep(self.ttl / 3)
+
+    def release(self):
+        """Give up leadership, e.g. on worker shutdown, so another worker takes over at once."""
+        if self.lock is None or not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            self.lock.release()
+        except Exception as e:
+            logger.error(f"Could not release the leader lock: {str(e)}", exc_info=True)
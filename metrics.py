@@ -0,0 +1,175 @@
+import logging
+import os
+import random
+import time
+from flask import Response, g, request
+from prometheus_client import CollectorRegistry, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+access_logger = logging.getLogger('access')
+
+# Requests that matched no route share one label, so scanners cannot blow up the series count
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class RuntimeCollector:
+    """Read the Socket.IO rooms and pushes, DB connection pool and replica, response cache, provider rollups and ingestion counters at scrape time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        from events.broadcaster import broadcaster, split_room, OVERALL_STATS_ROOM
+        from extensions import db, cache, db_router
+        from models.provider_rollup import provider_rollups
+        from models.ingest import stats as ingest_stats
+
+        rooms = GaugeMetricFamily('socketio_rooms', 'Real-time rooms with at least one subscriber', labels=['kind'])
+        subscribers = GaugeMetricFamily('socketio_subscriptions', 'Client subscriptions per room kind', labels=['kind'])
+        # Every format of a room is a Socket.IO room of its own; count them as one
+        counts = {'pool': (set(), 0), 'overall_stats': (set(), 0)}
+        for name, sids in list(broadcaster.rooms.items()):
+            room = split_room(name)[0]
+            kind = 'overall_stats' if room == OVERALL_STATS_ROOM else 'pool'
+            names, total = counts[kind]
+            names.add(room)
+            counts[kind] = (names, total + len(sids))
+        for kind, (names, total) in counts.items():
+            rooms.add_metric([kind], len(names))
+            subscribers.add_metric([kind], total)
+        yield rooms
+        yield subscribers
+        yield GaugeMetricFamily(
+            'socketio_clients', 'Distinct clients subscribed to any room',
+            value=len(set().union(*broadcaster.rooms.values())) if broadcaster.rooms else 0
+        )
+
+        with self.app.app_context():
+            pool = db.engine.pool
+        # Only queue-based pools (the default for Postgres and file SQLite) keep these counters
+        if hasattr(pool, 'checkedout'):
+            connections = GaugeMetricFamily('db_pool_connections', 'Database pool connections by state', labels=['state'])
+            connections.add_metric(['checked_out'], pool.checkedout())
+            connections.add_metric(['checked_in'], pool.checkedin())
+            connections.add_metric(['overflow'], max(pool.overflow(), 0))
+            yield connections
+            yield GaugeMetricFamily('db_pool_size', 'Configured database pool size', value=pool.size())
+
+        if db_router.engine is not None:
+            yield GaugeMetricFamily('db_replica_healthy', 'Whether reads currently go to the replica', value=int(db_router.healthy))
+            if db_router.lag is not None:
+                yield GaugeMetricFamily('db_replica_lag_seconds', 'Replication lag at the last check', value=db_router.lag)
+            yield CounterMetricFamily('db_replica_reads', 'Statements sent to the replica', value=db_router.stats['replica_reads'])
+            yield CounterMetricFamily(
+                'db_replica_fallbacks', 'Replica reads sent to the primary instead', value=db_router.stats['primary_fallbacks']
+            )
+
+        for name in ('messages', 'keyframes', 'unchanged'):
+            yield CounterMetricFamily(
+                f'socketio_push_{name}', f'Real-time room pushes: {name}', value=broadcaster.stats[name]
+            )
+
+        for name in ('hits', 'misses', 'invalidations'):
+            yield CounterMetricFamily(f'response_cache_{name}', f'Response cache {name}', value=cache.stats[name])
+
+        rows = CounterMetricFamily('ingested_rows', 'Rows written by bulk ingestion', labels=['kind'])
+        batches = CounterMetricFamily('ingested_batches', 'Batches committed by bulk ingestion', labels=['kind'])
+        for kind, counts in ingest_stats.items():
+            rows.add_metric([kind], counts['rows'])
+            batches.add_metric([kind], counts['batches'])
+        yield rows
+        yield batches
+
+        for name in ('updates', 'verifications', 'drifts'):
+            yield CounterMetricFamily(
+                f'provider_rollup_{name}', f'Provider rollup {name}', value=provider_rollups.stats[name]
+            )
+
+
+class Metrics:
+    """
+    Prometheus metrics and sampled structured access logs.
+
+    Every request is timed into a per-route latency histogram and counted in
+    an in-flight gauge, both labelled with the route template (e.g.
+    /api/pool/<pool_address>/history) rather than the raw path. One JSON
+    access log line is written for a random ACCESS_LOG_SAMPLE_RATE share of
+    requests, and always for server errors and requests slower than
+    ACCESS_LOG_SLOW_MS. Request bodies are never read or logged.
+
+    The /metrics endpoint serves everything in the Prometheus text format.
+    Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so the request metrics of
+    all workers are aggregated; the runtime gauges are those of the worker
+    answering the scrape.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.sample_rate = 0.0
+        self.slow_seconds = 1.0
+        self.registry = CollectorRegistry()
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Request latency by route',
+            ['method', 'route', 'status'], registry=self.registry,
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+        )
+        self.in_flight = Gauge(
+            'http_requests_in_flight', 'Requests being handled by route', ['route'], registry=self.registry,
+            multiprocess_mode='livesum'
+        )
+        self.runtime = None
+
+    def init_app(self, app):
+        self.app = app
+        self.sample_rate = app.config['ACCESS_LOG_SAMPLE_RATE']
+        self.slow_seconds = app.config['ACCESS_LOG_SLOW_MS'] / 1000
+        self.runtime = RuntimeCollector(app)
+        self.registry.register(self.runtime)
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+    @staticmethod
+    def route():
+        return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+    def before_request(self):
+        g.metrics_started = time.perf_counter()
+        self.in_flight.labels(self.route()).inc()
+
+    def after_request(self, response):
+        g.metrics_status = response.status_code
+        # Streamed responses have no length until they are sent
+        g.metrics_size = None if response.is_streamed else response.calculate_content_length()
+        return response
+
+    def teardown_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        route = self.route()
+        status = g.pop('metrics_status', 500)
+        self.in_flight.labels(route).dec()
+        self.latency.labels(request.method, route, str(status)).observe(duration)
+
+        if status >= 500 or duration >= self.slow_seconds or random.random() < self.sample_rate:
+            access_logger.info(self.app.json.dumps({
+                'method': request.method,
+                'route': route,
+                'path': request.path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 3),
+                'size': g.pop('metrics_size', None),
+            }))
+
+    def export(self):
+        registry = self.registry
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            # Request metrics live in per-worker files; merge them on every scrape
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(self.runtime)
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,70 @@
+-- Latest snapshot per pool, maintained on every insert into and update of
+-- aptos_pools. Updates of older snapshots do not overwrite a newer one.
+
+CREATE TABLE IF NOT EXISTS aptos_pools_latest (
+    pool_address VARCHAR PRIMARY KEY,
+    id INTEGER NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    provider VARCHAR NOT NULL,
+    token_a VARCHAR NOT NULL,
+    token_b VARCHAR NOT NULL,
+    tvl NUMERIC NOT NULL,
+    volume_day NUMERIC NOT NULL,
+    volume_week NUMERIC NOT NULL,
+    volume_month NUMERIC NOT NULL,
+    fees_day NUMERIC NOT NULL,
+    fees_week NUMERIC NOT NULL,
+    fees_month NUMERIC NOT NULL,
+    state VARCHAR NOT NULL,
+    median_slippage_1d NUMERIC,
+    median_slippage_7d NUMERIC,
+    median_slippage_30d NUMERIC
+);
+
+CREATE OR REPLACE FUNCTION aptos_pools_latest_upsert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO aptos_pools_latest AS latest (
+        pool_address, id, timestamp, provider, token_a, token_b, tvl,
+        volume_day, volume_week, volume_month, fees_day, fees_week, fees_month,
+        state, median_slippage_1d, median_slippage_7d, median_slippage_30d
+    ) VALUES (
+        NEW.pool_address, NEW.id, NEW.timestamp, NEW.provider, NEW.token_a, NEW.token_b, NEW.tvl,
+        NEW.volume_day, NEW.volume_week, NEW.volume_month, NEW.fees_day, NEW.fees_week, NEW.fees_month,
+        NEW.state, NEW.median_slippage_1d, NEW.median_slippage_7d, NEW.median_slippage_30d
+    )
+    ON CONFLICT (pool_address) DO UPDATE SET
+        id = EXCLUDED.id,
+        timestamp = EXCLUDED.timestamp,
+        provider = EXCLUDED.provider,
+        token_a = EXCLUDED.token_a,
+        token_b = EXCLUDED.token_b,
+        tvl = EXCLUDED.tvl,
+        volume_day = EXCLUDED.volume_day,
+        volume_week = EXCLUDED.volume_week,
+        volume_month = EXCLUDED.volume_month,
+        fees_day = EXCLUDED.fees_day,
+        fees_week = EXCLUDED.fees_week,
+        fees_month = EXCLUDED.fees_month,
+        state = EXCLUDED.state,
+        median_slippage_1d = EXCLUDED.median_slippage_1d,
+        median_slippage_7d = EXCLUDED.median_slippage_7d,
+        median_slippage_30d = EXCLUDED.median_slippage_30d
+    WHERE latest.timestamp <= EXCLUDED.timestamp;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS aptos_pools_latest_upsert ON aptos_pools;
+CREATE TRIGGER aptos_pools_latest_upsert
+    AFTER INSERT OR UPDATE ON aptos_pools
+    FOR EACH ROW EXECUTE FUNCTION aptos_pools_latest_upsert();
+
+-- Seed from existing history
+INSERT INTO aptos_pools_latest
+SELECT DISTINCT ON (pool_address)
+    pool_address, id, timestamp, provider, token_a, token_b, tvl,
+    volume_day, volume_week, volume_month, fees_day, fees_week, fees_month,
+    state, median_slippage_1d, median_slippage_7d, median_slippage_30d
+FROM aptos_pools
+ORDER BY pool_address, timestamp DESC, id DESC
+ON CONFLICT (pool_address) DO NOTHING;
@@ -0,0 +1,22 @@
+-- Per-pair slippage rollups at 1, 5 and 30 minute resolution, updated
+-- incrementally by aptos_transactions.version.
+
+CREATE TABLE IF NOT EXISTS job_watermarks (
+    name VARCHAR PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS slippage_rollups (
+    resolution VARCHAR NOT NULL,
+    coin_a VARCHAR NOT NULL,
+    coin_b VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    tx_count INTEGER NOT NULL,
+    slippage_median NUMERIC,
+    slippage_p90 NUMERIC,
+    slippage_p99 NUMERIC,
+    volume_sum NUMERIC,
+    fees_sum NUMERIC,
+    max_version BIGINT NOT NULL,
+    PRIMARY KEY (resolution, coin_a, coin_b, bucket_start)
+);
@@ -0,0 +1,27 @@
+-- migrate:no-transaction
+-- Indexes matching the route and job access paths. Built concurrently so
+-- ingestion keeps writing while they are created.
+
+-- /api/pool/<addr>/current and /history (incl. (timestamp, id) keyset pages)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_pools_pool_address_timestamp
+    ON aptos_pools (pool_address, timestamp DESC, id DESC);
+
+-- Provider-scoped snapshot scans
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_pools_provider_pool_address_timestamp
+    ON aptos_pools (provider, pool_address, timestamp);
+
+-- Pair-scoped slippage scans, answered from the index alone
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_transactions_coins_timestamp
+    ON aptos_transactions (coin1, coin2, timestamp) INCLUDE (slippage);
+
+-- Time-range scans of the slippage rollup job
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_transactions_timestamp
+    ON aptos_transactions (timestamp);
+
+-- max(version) watermarks and version > watermark increments
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_transactions_version
+    ON aptos_transactions (version);
+
+-- /api/providers/<name> and provider-filtered /top
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_pools_latest_provider
+    ON aptos_pools_latest (provider);
@@ -0,0 +1,9 @@
+-- API keys granting rate-limit tiers, stored as SHA-256 digests.
+
+CREATE TABLE IF NOT EXISTS api_keys (
+    key_hash VARCHAR PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    tier VARCHAR NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
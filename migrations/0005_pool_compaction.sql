@@ -0,0 +1,90 @@
+-- Compacted aptos_pools snapshots: one row per pool and hour for snapshots
+-- older than RAW_SNAPSHOT_RETENTION_DAYS, one per pool and day for hourly
+-- rows older than HOURLY_SNAPSHOT_RETENTION_DAYS. Each row keeps the last
+-- snapshot of its bucket (with its id) plus per-metric averages and maxima.
+
+CREATE TABLE IF NOT EXISTS aptos_pools_hourly (
+    pool_address VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    id INTEGER NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    provider VARCHAR NOT NULL,
+    token_a VARCHAR NOT NULL,
+    token_b VARCHAR NOT NULL,
+    tvl NUMERIC NOT NULL,
+    volume_day NUMERIC NOT NULL,
+    volume_week NUMERIC NOT NULL,
+    volume_month NUMERIC NOT NULL,
+    fees_day NUMERIC NOT NULL,
+    fees_week NUMERIC NOT NULL,
+    fees_month NUMERIC NOT NULL,
+    state VARCHAR NOT NULL,
+    median_slippage_1d NUMERIC,
+    median_slippage_7d NUMERIC,
+    median_slippage_30d NUMERIC,
+    samples INTEGER NOT NULL,
+    tvl_avg NUMERIC,
+    tvl_max NUMERIC,
+    volume_day_avg NUMERIC,
+    volume_day_max NUMERIC,
+    volume_week_avg NUMERIC,
+    volume_week_max NUMERIC,
+    volume_month_avg NUMERIC,
+    volume_month_max NUMERIC,
+    fees_day_avg NUMERIC,
+    fees_day_max NUMERIC,
+    fees_week_avg NUMERIC,
+    fees_week_max NUMERIC,
+    fees_month_avg NUMERIC,
+    fees_month_max NUMERIC,
+    median_slippage_1d_avg NUMERIC,
+    median_slippage_1d_max NUMERIC,
+    median_slippage_7d_avg NUMERIC,
+    median_slippage_7d_max NUMERIC,
+    median_slippage_30d_avg NUMERIC,
+    median_slippage_30d_max NUMERIC,
+    PRIMARY KEY (pool_address, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS aptos_pools_daily (
+    pool_address VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    id INTEGER NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    provider VARCHAR NOT NULL,
+    token_a VARCHAR NOT NULL,
+    token_b VARCHAR NOT NULL,
+    tvl NUMERIC NOT NULL,
+    volume_day NUMERIC NOT NULL,
+    volume_week NUMERIC NOT NULL,
+    volume_month NUMERIC NOT NULL,
+    fees_day NUMERIC NOT NULL,
+    fees_week NUMERIC NOT NULL,
+    fees_month NUMERIC NOT NULL,
+    state VARCHAR NOT NULL,
+    median_slippage_1d NUMERIC,
+    median_slippage_7d NUMERIC,
+    median_slippage_30d NUMERIC,
+    samples INTEGER NOT NULL,
+    tvl_avg NUMERIC,
+    tvl_max NUMERIC,
+    volume_day_avg NUMERIC,
+    volume_day_max NUMERIC,
+    volume_week_avg NUMERIC,
+    volume_week_max NUMERIC,
+    volume_month_avg NUMERIC,
+    volume_month_max NUMERIC,
+    fees_day_avg NUMERIC,
+    fees_day_max NUMERIC,
+    fees_week_avg NUMERIC,
+    fees_week_max NUMERIC,
+    fees_month_avg NUMERIC,
+    fees_month_max NUMERIC,
+    median_slippage_1d_avg NUMERIC,
+    median_slippage_1d_max NUMERIC,
+    median_slippage_7d_avg NUMERIC,
+    median_slippage_7d_max NUMERIC,
+    median_slippage_30d_avg NUMERIC,
+    median_slippage_30d_max NUMERIC,
+    PRIMARY KEY (pool_address, bucket_start)
+);
@@ -0,0 +1,35 @@
+-- migrate:no-transaction
+-- Unique keys that bulk ingestion upserts on. One Aptos transaction version
+-- can hold swaps in several pools, so trades are keyed on (version,
+-- pool_address). Rows already duplicated by out-of-band inserts are not
+-- deleted: the migration stops and lists them, so they can be reviewed and
+-- removed by hand before it is run again.
+-- (Each statement ends its last line with a semicolon only, as statements
+-- are split on ';' followed by a newline.)
+
+DO $$ DECLARE duplicates TEXT; BEGIN
+    SELECT string_agg(format('version %s in pool %s (%s rows)', version, pool_address, copies), ', ') INTO duplicates
+    FROM (
+        SELECT version, pool_address, count(*) AS copies FROM aptos_transactions
+        GROUP BY version, pool_address HAVING count(*) > 1 ORDER BY version LIMIT 20
+    ) found; IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'aptos_transactions has duplicate (version, pool_address) rows: %', duplicates
+            USING HINT = 'Remove the extra rows, then rerun the migration. Only the first 20 are listed.'; END IF; END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_aptos_transactions_version_pool_address
+    ON aptos_transactions (version, pool_address);
+
+-- Superseded by the unique index, which also leads with version
+DROP INDEX CONCURRENTLY IF EXISTS ix_aptos_transactions_version;
+
+DO $$ DECLARE duplicates TEXT; BEGIN
+    SELECT string_agg(format('pool %s at %s (%s rows)', pool_address, timestamp, copies), ', ') INTO duplicates
+    FROM (
+        SELECT pool_address, timestamp, count(*) AS copies FROM aptos_pools
+        GROUP BY pool_address, timestamp HAVING count(*) > 1 ORDER BY pool_address, timestamp LIMIT 20
+    ) found; IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'aptos_pools has duplicate (pool_address, timestamp) rows: %', duplicates
+            USING HINT = 'Remove the extra rows, then rerun the migration. Only the first 20 are listed.'; END IF; END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_aptos_pools_pool_address_timestamp
+    ON aptos_pools (pool_address, timestamp);
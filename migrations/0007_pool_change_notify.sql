@@ -0,0 +1,19 @@
+-- NOTIFY aptos_pools_changed with the address of every pool whose latest
+-- snapshot changed, so the real-time broadcaster only queries those rooms.
+-- Notifications are sent at commit, once per pool and transaction.
+
+CREATE OR REPLACE FUNCTION aptos_pools_latest_notify() RETURNS trigger AS $$
+BEGIN
+    -- refresh_latest_pools() rewrites unchanged rows; they are no news
+    IF TG_OP = 'UPDATE' AND OLD IS NOT DISTINCT FROM NEW THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('aptos_pools_changed', NEW.pool_address);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS aptos_pools_latest_notify ON aptos_pools_latest;
+CREATE TRIGGER aptos_pools_latest_notify
+    AFTER INSERT OR UPDATE ON aptos_pools_latest
+    FOR EACH ROW EXECUTE FUNCTION aptos_pools_latest_notify();
@@ -0,0 +1,21 @@
+-- Per-pool t-digest sketches of transaction slippage at 1 minute, 1 hour
+-- and 1 day resolution, merged to answer /api/slippage/percentiles for any
+-- window. Updated incrementally by aptos_transactions.version.
+
+CREATE TABLE IF NOT EXISTS slippage_sketches (
+    resolution VARCHAR NOT NULL,
+    pool_address VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    coin_a VARCHAR NOT NULL,
+    coin_b VARCHAR NOT NULL,
+    tx_count INTEGER NOT NULL,
+    slippage_min DOUBLE PRECISION NOT NULL,
+    slippage_max DOUBLE PRECISION NOT NULL,
+    -- (mean, weight) float64 pairs, little-endian
+    centroids BYTEA NOT NULL,
+    PRIMARY KEY (resolution, pool_address, bucket_start)
+);
+
+-- Pair-scoped window reads
+CREATE INDEX IF NOT EXISTS ix_slippage_sketches_pair
+    ON slippage_sketches (coin_a, coin_b, resolution, bucket_start);
@@ -0,0 +1,13 @@
+-- migrate:no-transaction
+-- Keyset index of the per-pool trade feed (/api/pool/<addr>/transactions).
+-- The INCLUDE holds every column the feed returns, so tailing a pool is an
+-- index-only scan. The global feed has its own covering index on
+-- (version, pool_address), its keyset order, so its filters stay index-only.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_transactions_pool_address_version
+    ON aptos_transactions (pool_address, version)
+    INCLUDE (timestamp, provider, coin1, coin2, volume, delta_x, delta_y, price_x, price_y, fees, slippage);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_aptos_transactions_version_feed
+    ON aptos_transactions (version, pool_address)
+    INCLUDE (timestamp, provider, coin1, coin2, volume, delta_x, delta_y, price_x, price_y, fees, slippage);
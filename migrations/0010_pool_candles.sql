@@ -0,0 +1,21 @@
+-- Closed OHLCV candles of every pool at 1 minute, 5 minute, 1 hour and
+-- 1 day intervals, read by /api/pool/<addr>/candles. Filled by
+-- `flask backfill-pool-candles`, then kept current by the update-pool-candles job.
+
+CREATE TABLE IF NOT EXISTS pool_candles (
+    resolution VARCHAR NOT NULL,
+    pool_address VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    open_x DOUBLE PRECISION NOT NULL,
+    high_x DOUBLE PRECISION NOT NULL,
+    low_x DOUBLE PRECISION NOT NULL,
+    close_x DOUBLE PRECISION NOT NULL,
+    open_y DOUBLE PRECISION,
+    high_y DOUBLE PRECISION,
+    low_y DOUBLE PRECISION,
+    close_y DOUBLE PRECISION,
+    volume DOUBLE PRECISION NOT NULL,
+    fees DOUBLE PRECISION NOT NULL,
+    trades INTEGER NOT NULL,
+    PRIMARY KEY (resolution, pool_address, bucket_start)
+);
@@ -0,0 +1,29 @@
+-- Change time of every aptos_pools_latest row, so the provider rollups of
+-- every worker fold in the pools that changed, including snapshots updated
+-- in place, through an index instead of scanning the table.
+
+ALTER TABLE aptos_pools_latest
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+
+CREATE OR REPLACE FUNCTION aptos_pools_latest_touch() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        -- refresh_latest_pools() rewrites unchanged rows; they keep their change time
+        NEW.updated_at := OLD.updated_at;
+        IF OLD IS NOT DISTINCT FROM NEW THEN
+            RETURN NEW;
+        END IF;
+    END IF;
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS aptos_pools_latest_touch ON aptos_pools_latest;
+CREATE TRIGGER aptos_pools_latest_touch
+    BEFORE INSERT OR UPDATE ON aptos_pools_latest
+    FOR EACH ROW EXECUTE FUNCTION aptos_pools_latest_touch();
+
+-- One row per pool, so a plain build is quick
+CREATE INDEX IF NOT EXISTS ix_aptos_pools_latest_updated_at
+    ON aptos_pools_latest (updated_at) INCLUDE (pool_address);
@@ -0,0 +1,12 @@
+-- Order the coin_a/coin_b pair keys by bytes (COLLATE "C"), as the API's
+-- normalize_pair does. The rollup jobs used LEAST/GREATEST under the database
+-- collation, which can put a pair's coins the other way round; swap those
+-- keys so the rows are found again.
+
+UPDATE slippage_rollups
+SET coin_a = coin_b, coin_b = coin_a
+WHERE coin_a COLLATE "C" > coin_b COLLATE "C";
+
+UPDATE slippage_sketches
+SET coin_a = coin_b, coin_b = coin_a
+WHERE coin_a COLLATE "C" > coin_b COLLATE "C";
@@ -0,0 +1,23 @@
+from extensions import db
+from sqlalchemy import func
+import hashlib
+
+
+class ApiKey(db.Model):
+    """
+    An API key and the rate-limit tier it grants.
+
+    Only the SHA-256 digest of the key is stored; the key itself is shown
+    once when it is created.
+    """
+    __tablename__ = 'api_keys'
+
+    key_hash = db.Column(db.String, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    tier = db.Column(db.String, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    @staticmethod
+    def hash(api_key):
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
@@ -45,3 +45,10 @@ class AptosPool(db.Model):
             'median_slippage_7d': float(self.median_slippage_7d or 0.0),
             'median_slippage_30d': float(self.median_slippage_30d or 0.0),
         }
+
+
+# Latest snapshot / history of one pool, including (timestamp, id) keyset pages
+db.Index('ix_aptos_pools_pool_address_timestamp', AptosPool.pool_address, AptosPool.timestamp.desc(), AptosPool.id.desc())
+db.Index('ix_aptos_pools_provider_pool_address_timestamp', AptosPool.provider, AptosPool.pool_address, AptosPool.timestamp)
+# One snapshot per pool and timestamp; bulk ingestion upserts on it
+db.Index('uq_aptos_pools_pool_address_timestamp', AptosPool.pool_address, AptosPool.timestamp, unique=True)
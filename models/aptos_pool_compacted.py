@@ -0,0 +1,244 @@
+from extensions import db
+from models.aptos_pool import AptosPool
+from models.aptos_pool_latest import AptosPoolLatest, SNAPSHOT_COLUMNS
+from models.functions import time_bucket, greatest, dialect_insert
+from sqlalchemy import case, delete, exists, func, literal, select, union_all
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta, timezone
+
+# Numeric snapshot columns whose per-bucket average and maximum are kept
+METRICS = [
+    column.name for column in AptosPool.__table__.columns
+    if isinstance(column.type, db.Numeric)
+]
+
+STAT_COLUMNS = ['samples'] + [f'{name}_{stat}' for name in METRICS for stat in ('avg', 'max')]
+
+
+class CompactedSnapshot:
+    """
+    One bucket of a pool's snapshots, compacted into a single row.
+
+    The snapshot columns hold the last snapshot of the bucket, including its
+    id and timestamp, so compacted rows can stand in for raw ones. `samples`
+    counts the raw snapshots folded in; `<metric>_avg` and `<metric>_max`
+    aggregate them so coarser buckets can still be computed exactly.
+    """
+    pool_address = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    id = db.Column(db.Integer, nullable=False)
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
+    provider = db.Column(db.String, nullable=False)
+    token_a = db.Column(db.String, nullable=False)
+    token_b = db.Column(db.String, nullable=False)
+    tvl = db.Column(db.Numeric, nullable=False)
+    volume_day = db.Column(db.Numeric, nullable=False)
+    volume_week = db.Column(db.Numeric, nullable=False)
+    volume_month = db.Column(db.Numeric, nullable=False)
+    fees_day = db.Column(db.Numeric, nullable=False)
+    fees_week = db.Column(db.Numeric, nullable=False)
+    fees_month = db.Column(db.Numeric, nullable=False)
+    state = db.Column(db.String, nullable=False)
+    median_slippage_1d = db.Column(db.Numeric, nullable=True)
+    median_slippage_7d = db.Column(db.Numeric, nullable=True)
+    median_slippage_30d = db.Column(db.Numeric, nullable=True)
+    samples = db.Column(db.Integer, nullable=False)
+    tvl_avg = db.Column(db.Numeric, nullable=True)
+    tvl_max = db.Column(db.Numeric, nullable=True)
+    volume_day_avg = db.Column(db.Numeric, nullable=True)
+    volume_day_max = db.Column(db.Numeric, nullable=True)
+    volume_week_avg = db.Column(db.Numeric, nullable=True)
+    volume_week_max = db.Column(db.Numeric, nullable=True)
+    volume_month_avg = db.Column(db.Numeric, nullable=True)
+    volume_month_max = db.Column(db.Numeric, nullable=True)
+    fees_day_avg = db.Column(db.Numeric, nullable=True)
+    fees_day_max = db.Column(db.Numeric, nullable=True)
+    fees_week_avg = db.Column(db.Numeric, nullable=True)
+    fees_week_max = db.Column(db.Numeric, nullable=True)
+    fees_month_avg = db.Column(db.Numeric, nullable=True)
+    fees_month_max = db.Column(db.Numeric, nullable=True)
+    median_slippage_1d_avg = db.Column(db.Numeric, nullable=True)
+    median_slippage_1d_max = db.Column(db.Numeric, nullable=True)
+    median_slippage_7d_avg = db.Column(db.Numeric, nullable=True)
+    median_slippage_7d_max = db.Column(db.Numeric, nullable=True)
+    median_slippage_30d_avg = db.Column(db.Numeric, nullable=True)
+    median_slippage_30d_max = db.Column(db.Numeric, nullable=True)
+
+
+class AptosPoolHourly(CompactedSnapshot, db.Model):
+    """aptos_pools snapshots older than RAW_SNAPSHOT_RETENTION_DAYS, one row per pool and hour."""
+    __tablename__ = 'aptos_pools_hourly'
+
+
+class AptosPoolDaily(CompactedSnapshot, db.Model):
+    """Hourly rows older than HOURLY_SNAPSHOT_RETENTION_DAYS, one row per pool and day."""
+    __tablename__ = 'aptos_pools_daily'
+
+
+# Coarser tables whose buckets supersede a table's rows, with their bucket width
+COARSER = {
+    AptosPool: [(AptosPoolHourly, 3600), (AptosPoolDaily, 86400)],
+    AptosPoolHourly: [(AptosPoolDaily, 86400)],
+}
+
+
+def _history_select(model):
+    if model is AptosPool:
+        stats = [literal(1).label('samples')]
+        for name in METRICS:
+            stats += [getattr(model, name).label(f'{name}_avg'), getattr(model, name).label(f'{name}_max')]
+    else:
+        stats = [getattr(model, name) for name in STAT_COLUMNS]
+    query = select(*[getattr(model, name) for name in SNAPSHOT_COLUMNS], *stats)
+
+    # Snapshots ingested into a bucket that is already compacted stay out of
+    # the history until the next pass folds them into it
+    for compacted, seconds in COARSER.get(model, ()):
+        query = query.where(~exists().where(
+            compacted.pool_address == model.pool_address,
+            compacted.bucket_start == time_bucket(seconds, model.timestamp)
+        ))
+    return query
+
+
+# Raw and compacted snapshots as one relation. Compaction moves rows in a
+# single transaction, and rows of buckets that a coarser table already
+# holds are left out, so every bucket is counted once. Filters on
+# pool_address and timestamp are pushed down into each branch.
+pool_history = union_all(*[_history_select(model) for model in (AptosPool, AptosPoolHourly, AptosPoolDaily)]).subquery('aptos_pools_history')
+
+# Query it like AptosPool, e.g. with RowSerializer.for_model(AptosPoolHistory)
+AptosPoolHistory = aliased(AptosPool, pool_history, name='AptosPoolHistory')
+
+
+def _floor(value, seconds):
+    epoch = int(value.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def _compacted_rows(source, seconds, filters):
+    """SELECT the compacted rows of `source` snapshots matching `filters`, one per bucket."""
+    bucket_start = time_bucket(seconds, source.timestamp)
+    window = {'partition_by': bucket_start}
+
+    if source is AptosPool:
+        stats = [func.count().over(**window).label('samples')]
+        for name in METRICS:
+            column = getattr(source, name)
+            stats += [func.avg(column).over(**window).label(f'{name}_avg'), func.max(column).over(**window).label(f'{name}_max')]
+    else:
+        stats = [func.sum(source.samples).over(**window).label('samples')]
+        for name in METRICS:
+            average = getattr(source, f'{name}_avg')
+            # Weight every bucket by its samples; NULL averages carry no weight
+            stats += [
+                (func.sum(average * source.samples).over(**window) /
+                 func.sum(case((average.isnot(None), source.samples))).over(**window)).label(f'{name}_avg'),
+                func.max(getattr(source, f'{name}_max')).over(**window).label(f'{name}_max')
+            ]
+
+    ranked = select(
+        *[getattr(source, name) for name in SNAPSHOT_COLUMNS],
+        bucket_start.label('bucket_start'),
+        *stats,
+        func.row_number().over(order_by=(source.timestamp.desc(), source.id.desc()), **window).label('rank')
+    ).where(*filters).subquery()
+
+    return select(*[ranked.c[name] for name in SNAPSHOT_COLUMNS + ['bucket_start'] + STAT_COLUMNS]).where(ranked.c.rank == 1)
+
+
+def _merge_compacted(connection, target, rows):
+    """
+    Insert compacted rows, merging them into any existing row of the same bucket.
+
+    A bucket is compacted again if late snapshots arrive for it: the samples
+    add up, the averages are weighted by samples and the newer last snapshot wins.
+    """
+    insert = dialect_insert(connection, target.__table__).from_select(SNAPSHOT_COLUMNS + ['bucket_start'] + STAT_COLUMNS, rows)
+    table = target.__table__
+    new = insert.excluded
+    total = table.c.samples + new.samples
+    newer = new.timestamp >= table.c.timestamp
+
+    set_ = {name: case((newer, new[name]), else_=table.c[name]) for name in SNAPSHOT_COLUMNS if name != 'pool_address'}
+    set_['samples'] = total
+    for name in METRICS:
+        average, maximum = f'{name}_avg', f'{name}_max'
+        set_[average] = case(
+            (table.c[average].is_(None), new[average]),
+            (new[average].is_(None), table.c[average]),
+            else_=(table.c[average] * table.c.samples + new[average] * new.samples) / total
+        )
+        set_[maximum] = case(
+            (table.c[maximum].is_(None), new[maximum]),
+            (new[maximum].is_(None), table.c[maximum]),
+            else_=greatest(table.c[maximum], new[maximum])
+        )
+
+    connection.execute(insert.on_conflict_do_update(
+        index_elements=[table.c.pool_address, table.c.bucket_start],
+        set_=set_
+    ))
+
+
+def _compact(source, target, seconds, cutoff, latest, max_id=None):
+    """
+    Move the `source` snapshots older than `cutoff` into `target` buckets, pool by pool.
+
+    Each pool is one transaction, so readers never see a bucket in both
+    tables. A pool's newest raw snapshot is never moved, so it keeps backing
+    /api/pool/<pool_address>/current and refresh_latest_pools().
+
+    Returns:
+        int: The number of source rows compacted.
+    """
+    compacted = 0
+    for pool_address, latest_timestamp in latest:
+        # Only whole buckets are compacted
+        bound = _floor(min(cutoff, latest_timestamp), seconds)
+        filters = [source.pool_address == pool_address, source.timestamp < bound]
+        if max_id is not None:
+            # Snapshots inserted while compacting are left for the next run
+            filters.append(source.id <= max_id)
+
+        connection = db.session.connection()
+        _merge_compacted(connection, target, _compacted_rows(source, seconds, filters))
+        compacted += connection.execute(delete(source).where(*filters)).rowcount
+        db.session.commit()
+    return compacted
+
+
+def compact_pool_snapshots(raw_days=None, hourly_days=None, now=None):
+    """
+    Roll old aptos_pools snapshots into hourly rows and old hourly rows into daily rows.
+
+    Snapshots older than `raw_days` (RAW_SNAPSHOT_RETENTION_DAYS) are folded
+    into aptos_pools_hourly and deleted; hourly rows older than `hourly_days`
+    (HOURLY_SNAPSHOT_RETENTION_DAYS) into aptos_pools_daily. A stage whose
+    retention is 0 is skipped, so raw snapshots are only deleted once
+    RAW_SNAPSHOT_RETENTION_DAYS is set.
+
+    Returns:
+        dict: The number of raw and hourly rows compacted.
+    """
+    from flask import current_app
+
+    if raw_days is None:
+        raw_days = current_app.config['RAW_SNAPSHOT_RETENTION_DAYS']
+    if hourly_days is None:
+        hourly_days = current_app.config['HOURLY_SNAPSHOT_RETENTION_DAYS']
+    now = now or datetime.now(timezone.utc)
+
+    latest = [
+        (pool_address, timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc))
+        for pool_address, timestamp in db.session.query(AptosPoolLatest.pool_address, AptosPoolLatest.timestamp)
+    ]
+    max_id = db.session.query(func.max(AptosPool.id)).scalar() or 0
+    db.session.commit()
+
+    raw = hourly = 0
+    if raw_days:
+        raw = _compact(AptosPool, AptosPoolHourly, 3600, now - timedelta(days=raw_days), latest, max_id)
+    if hourly_days:
+        hourly = _compact(AptosPoolHourly, AptosPoolDaily, 86400, now - timedelta(days=hourly_days), latest)
+    return {'raw': raw, 'hourly': hourly}
@@ -0,0 +1,140 @@
+from extensions import db
+from models.aptos_pool import AptosPool
+from models.functions import dialect_insert
+from sqlalchemy import event, func, literal, select
+from datetime import datetime, timezone
+
+# Columns copied verbatim from aptos_pools into aptos_pools_latest
+SNAPSHOT_COLUMNS = [column.name for column in AptosPool.__table__.columns]
+
+
+class AptosPoolLatest(db.Model):
+    """
+    The most recent AptosPool snapshot of every pool, one row per pool_address.
+
+    On Postgres the table is kept current by the trigger installed in
+    migrations/0001_aptos_pools_latest.sql; on other backends by the ORM
+    listener below. refresh_latest_pools() rebuilds it from aptos_pools.
+    """
+    __tablename__ = 'aptos_pools_latest'
+
+    pool_address = db.Column(db.String, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
+    provider = db.Column(db.String, nullable=False)
+    token_a = db.Column(db.String, nullable=False)
+    token_b = db.Column(db.String, nullable=False)
+    tvl = db.Column(db.Numeric, nullable=False)
+    volume_day = db.Column(db.Numeric, nullable=False)
+    volume_week = db.Column(db.Numeric, nullable=False)
+    volume_month = db.Column(db.Numeric, nullable=False)
+    fees_day = db.Column(db.Numeric, nullable=False)
+    fees_week = db.Column(db.Numeric, nullable=False)
+    fees_month = db.Column(db.Numeric, nullable=False)
+    state = db.Column(db.String, nullable=False)
+    median_slippage_1d = db.Column(db.Numeric, nullable=True)
+    median_slippage_7d = db.Column(db.Numeric, nullable=True)
+    median_slippage_30d = db.Column(db.Numeric, nullable=True)
+    # When the row last changed, set by the trigger of migrations/0011 on Postgres
+    # and by upsert_latest() elsewhere; internal, so not part of the API
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, info={'internal': True})
+
+    to_dict = AptosPool.to_dict
+
+
+db.Index('ix_aptos_pools_latest_provider', AptosPoolLatest.provider)
+# Pools changed since a time, for the provider rollups
+db.Index(
+    'ix_aptos_pools_latest_updated_at', AptosPoolLatest.updated_at,
+    postgresql_include=['pool_address']
+)
+
+
+def upsert_latest(connection, source):
+    """
+    Upsert snapshots into aptos_pools_latest, keeping the newest row per pool.
+
+    Args:
+        connection: The SQLAlchemy connection to execute on.
+        source: Either a list of snapshot dictionaries or a SELECT returning
+                the SNAPSHOT_COLUMNS in order.
+    """
+    # On Postgres the trigger replaces this with the time of the change, and
+    # keeps the old value when a row is rewritten unchanged
+    now = datetime.now(timezone.utc)
+    insert = dialect_insert(connection, AptosPoolLatest.__table__)
+    if isinstance(source, list):
+        insert = insert.values([dict(row, updated_at=now) for row in source])
+    else:
+        insert = insert.from_select(
+            SNAPSHOT_COLUMNS + ['updated_at'],
+            source.add_columns(literal(now, db.DateTime(timezone=True)))
+        )
+
+    table = AptosPoolLatest.__table__
+    statement = insert.on_conflict_do_update(
+        index_elements=[table.c.pool_address],
+        set_={name: insert.excluded[name] for name in SNAPSHOT_COLUMNS + ['updated_at'] if name != 'pool_address'},
+        where=table.c.timestamp <= insert.excluded.timestamp
+    )
+    connection.execute(statement)
+
+
+def latest_snapshots(pool_addresses=None):
+    """Return a SELECT of the newest aptos_pools snapshot of every pool, or of `pool_addresses`."""
+    ranked = select(
+        *AptosPool.__table__.columns,
+        func.row_number().over(
+            partition_by=AptosPool.pool_address,
+            order_by=(AptosPool.timestamp.desc(), AptosPool.id.desc())
+        ).label('rank')
+    )
+    if pool_addresses is not None:
+        ranked = ranked.where(AptosPool.pool_address.in_(pool_addresses))
+    ranked = ranked.subquery()
+
+    return select(*[ranked.c[name] for name in SNAPSHOT_COLUMNS]).where(ranked.c.rank == 1)
+
+
+def refresh_latest_pools():
+    """
+    Rebuild aptos_pools_latest from the full aptos_pools history.
+
+    Used to seed the table and as a periodic job to repair any drift from
+    rows written while the incremental path was unavailable.
+    """
+    upsert_latest(db.session.connection(), latest_snapshots())
+    db.session.commit()
+
+
+@event.listens_for(AptosPool, 'after_insert')
+def _track_latest_snapshot(mapper, connection, target):
+    # Postgres maintains the table with a trigger, so only mirror the row here
+    # on backends without it.
+    if connection.dialect.name == 'postgresql':
+        return
+    upsert_latest(connection, [{name: getattr(target, name) for name in SNAPSHOT_COLUMNS}])
+
+
+def latest_snapshot_version(provider=None, pool_address=None):
+    """
+    Cheap validator of the latest snapshots, optionally scoped to a provider or pool.
+
+    Returns:
+        tuple: (newest snapshot timestamp, version token). The token changes
+               whenever a pool in scope gets a new snapshot, a snapshot is
+               updated in place or a pool is added or removed. (None, token) if there is no snapshot in scope.
+    """
+    query = db.session.query(
+        func.max(AptosPoolLatest.timestamp),
+        func.max(AptosPoolLatest.id),
+        func.count(),
+        func.max(AptosPoolLatest.updated_at)
+    )
+    if provider is not None:
+        query = query.filter(AptosPoolLatest.provider == provider)
+    if pool_address is not None:
+        query = query.filter(AptosPoolLatest.pool_address == pool_address)
+
+    last_modified, max_id, count, updated_at = query.one()
+    return last_modified, f'{max_id}-{count}-{updated_at.timestamp() if updated_at else 0}'
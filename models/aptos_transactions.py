@@ -43,3 +43,34 @@ class AptosTransactions(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else '',
             'pool_name': self.pool_name or '',
         }
+
+
+# Pair-scoped slippage scans; the INCLUDE makes them index-only on Postgres
+db.Index(
+    'ix_aptos_transactions_coins_timestamp',
+    AptosTransactions.coin1, AptosTransactions.coin2, AptosTransactions.timestamp,
+    postgresql_include=['slippage']
+)
+db.Index('ix_aptos_transactions_timestamp', AptosTransactions.timestamp)
+# Per-pool trade feed keyset; the INCLUDE makes it index-only on Postgres
+db.Index(
+    'ix_aptos_transactions_pool_address_version',
+    AptosTransactions.pool_address, AptosTransactions.version,
+    postgresql_include=[
+        'timestamp', 'provider', 'coin1', 'coin2', 'volume', 'delta_x', 'delta_y', 'price_x', 'price_y', 'fees', 'slippage'
+    ]
+)
+# Global trade feed keyset; the INCLUDE makes it index-only on Postgres
+db.Index(
+    'ix_aptos_transactions_version_feed',
+    AptosTransactions.version, AptosTransactions.pool_address,
+    postgresql_include=[
+        'timestamp', 'provider', 'coin1', 'coin2', 'volume', 'delta_x', 'delta_y', 'price_x', 'price_y', 'fees', 'slippage'
+    ]
+)
+# One row per pool and transaction version (a version can swap in several pools);
+# bulk ingestion upserts on it
+db.Index(
+    'uq_aptos_transactions_version_pool_address', AptosTransactions.version, AptosTransactions.pool_address,
+    unique=True
+)
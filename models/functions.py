@@ -0,0 +1,105 @@
+from sqlalchemy import DateTime, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class time_bucket(FunctionElement):
+    """
+    Floor a timestamp column to a fixed-width bucket of `seconds` seconds.
+
+    Buckets are aligned to the Unix epoch, so for widths that divide an hour
+    (1, 5, 30 minutes...) they start on the same minute boundaries as
+    replacing the minute with (minute // width) * width.
+
+    Usage:
+        time_bucket(300, AptosTransactions.timestamp)
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+    name = 'time_bucket'
+
+    def __init__(self, seconds, column):
+        # Rendered inline so the width is part of the statement cache key
+        super().__init__(literal_column(str(int(seconds))), column)
+
+
+@compiles(time_bucket, 'postgresql')
+def _time_bucket_postgresql(element, compiler, **kw):
+    seconds, column = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"to_timestamp(floor(extract(epoch from {column}) / {seconds}) * {seconds})"
+
+
+@compiles(time_bucket, 'sqlite')
+def _time_bucket_sqlite(element, compiler, **kw):
+    seconds, column = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"datetime((CAST(strftime('%s', {column}) AS INTEGER) / {seconds}) * {seconds}, 'unixepoch')"
+
+
+class least(FunctionElement):
+    """The smaller of two values (LEAST on Postgres, two-argument MIN on SQLite)."""
+    inherit_cache = True
+    name = 'least'
+
+
+class greatest(FunctionElement):
+    """The larger of two values (GREATEST on Postgres, two-argument MAX on SQLite)."""
+    inherit_cache = True
+    name = 'greatest'
+
+
+@compiles(least)
+def _least(element, compiler, **kw):
+    return f"least({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(least, 'sqlite')
+def _least_sqlite(element, compiler, **kw):
+    return f"min({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest)
+def _greatest(element, compiler, **kw):
+    return f"greatest({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest, 'sqlite')
+def _greatest_sqlite(element, compiler, **kw):
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+
+class pair_least(least):
+    """
+    The smaller of two coin types in byte order, the order normalize_pair uses.
+
+    LEAST and GREATEST follow the column collation on Postgres, which can
+    order coin types differently from Python; COLLATE "C" compares bytes.
+    SQLite's MIN and MAX already compare bytes (BINARY).
+    """
+    inherit_cache = True
+
+
+class pair_greatest(greatest):
+    """The larger of two coin types in byte order (see pair_least)."""
+    inherit_cache = True
+
+
+@compiles(pair_least, 'postgresql')
+def _pair_least_postgresql(element, compiler, **kw):
+    coins = ', '.join(f'{compiler.process(clause, **kw)} COLLATE "C"' for clause in element.clauses)
+    return f"least({coins})"
+
+
+@compiles(pair_greatest, 'postgresql')
+def _pair_greatest_postgresql(element, compiler, **kw):
+    coins = ', '.join(f'{compiler.process(clause, **kw)} COLLATE "C"' for clause in element.clauses)
+    return f"greatest({coins})"
+
+
+def dialect_insert(connection, table):
+    """Return an INSERT for `table` that supports on_conflict_do_update on this connection."""
+    if connection.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    if connection.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Unsupported dialect: {connection.dialect.name}")
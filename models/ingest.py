@@ -0,0 +1,285 @@
+from extensions import db
+from models.aptos_pool import AptosPool
+from models.aptos_transactions import AptosTransactions
+from models.aptos_pool_latest import upsert_latest, latest_snapshots
+from models.functions import dialect_insert
+from signals import ingested
+from flask import current_app
+from sqlalchemy import column, select, table
+from datetime import datetime, timezone
+from decimal import Decimal
+import csv
+import io
+import json
+import time
+
+# Ingestible kinds: the model and the columns identifying a row, which
+# re-ingested rows are upserted on
+KINDS = {
+    'pools': (AptosPool, ('pool_address', 'timestamp')),
+    'transactions': (AptosTransactions, ('version', 'pool_address')),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+# Rows and batches written by this process, per kind
+stats = {kind: {'rows': 0, 'batches': 0} for kind in KINDS}
+
+
+class IngestError(ValueError):
+    """
+    An ingestion that stopped early.
+
+    Batches committed before the failure stay committed; `summary` reports
+    them, so the client can resume after the last ingested row.
+    """
+
+    def __init__(self, message, summary):
+        super().__init__(message)
+        self.summary = summary
+
+
+class IngestLimitError(IngestError):
+    """The input has more rows than allowed."""
+
+
+def _datetime(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    value = datetime.fromisoformat(value)
+    # Naive timestamps are UTC, like everything the indexer writes
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _integer(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+
+def _decimal(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    value = Decimal(str(value))
+    if not value.is_finite():
+        raise ValueError(value)
+    return value
+
+
+def _converters(model):
+    """Return {column: (converter, nullable)} of the columns a record may set."""
+    converters = {}
+    for name, col in model.__table__.columns.items():
+        # Surrogate keys are assigned by the database
+        if name == 'id':
+            continue
+        if isinstance(col.type, db.DateTime):
+            convert = _datetime
+        elif isinstance(col.type, db.Integer):
+            convert = _integer
+        elif isinstance(col.type, db.Numeric):
+            convert = _decimal
+        else:
+            convert = str
+        converters[name] = (convert, col.nullable)
+    return converters
+
+
+CONVERTERS = {kind: _converters(model) for kind, (model, keys) in KINDS.items()}
+
+
+def coerce(kind, record):
+    """
+    Validate one parsed record and convert its values to the column types.
+
+    Missing and empty values are NULL. An `id` is ignored, so rows exported
+    from the API can be ingested back.
+
+    Raises:
+        ValueError: On unknown columns, missing required values or values
+                    of the wrong type.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('expected an object')
+    converters = CONVERTERS[kind]
+    unknown = [str(name) for name in record if name not in converters and name != 'id']
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(unknown)}")
+
+    row = {}
+    for name, (convert, nullable) in converters.items():
+        value = record.get(name)
+        if value is None or value == '':
+            if not nullable:
+                raise ValueError(f'{name} is required')
+            row[name] = None
+            continue
+        try:
+            row[name] = convert(value)
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError(f'invalid {name}: {value!r}')
+    return row
+
+
+def read_records(lines, format='ndjson'):
+    """
+    Parse NDJSON or CSV (with a header row) text lines.
+
+    Yields:
+        tuple: (line number, record dictionary).
+    """
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                raise ValueError(f'Line {reader.line_num}: more values than columns')
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f'Line {number}: invalid JSON')
+        yield number, record
+
+
+def _copy_text(value):
+    """Encode a value for COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_to_staging(connection, target, columns, rows):
+    """
+    COPY rows into a temporary staging table and return a SELECT over it (Postgres).
+
+    The staging table lives as long as the connection and is emptied at
+    every commit, so it is created once per pooled connection.
+    """
+    staging = f'{target.name}_ingest'
+    names = ', '.join(columns)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_text(row[name]) for name in columns) + '\n')
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS '
+            f'SELECT {names} FROM {target.name} WITH NO DATA'
+        )
+        cursor.copy_expert(f'COPY {staging} ({names}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+    return select(*[column(name) for name in columns]).select_from(table(staging))
+
+
+def write_batch(kind, rows):
+    """
+    Upsert one batch of coerced rows and commit it.
+
+    Postgres loads the batch with COPY into a staging table and upserts from
+    there in one statement; other backends upsert with executemany. New
+    snapshots are folded into aptos_pools_latest in the same transaction,
+    and `ingested` is sent once the batch is committed.
+    """
+    model, keys = KINDS[kind]
+    target = model.__table__
+    columns = list(CONVERTERS[kind])
+    connection = db.session.connection()
+
+    insert = dialect_insert(connection, target)
+    if connection.dialect.name == 'postgresql':
+        insert = insert.from_select(columns, _copy_to_staging(connection, target, columns, rows))
+    statement = insert.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: insert.excluded[name] for name in columns if name not in keys}
+    )
+    if connection.dialect.name == 'postgresql':
+        connection.execute(statement)
+    else:
+        connection.execute(statement, rows)
+
+    if kind == 'pools' and connection.dialect.name != 'postgresql':
+        # On Postgres the trigger covers inserted and updated snapshots; the
+        # ORM listener of other backends does not see Core upserts
+        upsert_latest(connection, latest_snapshots({row['pool_address'] for row in rows}))
+
+    db.session.commit()
+    stats[kind]['rows'] += len(rows)
+    stats[kind]['batches'] += 1
+    ingested.send(current_app._get_current_object(), kind=kind, rows=rows)
+
+
+def ingest(kind, lines, format='ndjson', batch_size=None, max_rows=None, progress=None):
+    """
+    Ingest NDJSON or CSV records of `kind` in committed batches.
+
+    Rows are upserted on their identifying columns, so re-sending a file,
+    or resuming after a failure, never duplicates anything. Within a batch
+    the last record of a key wins, as it would across batches. Only one
+    batch is held in memory at a time.
+
+    Args:
+        kind (str): 'pools' or 'transactions'.
+        lines (iterable): Text lines, e.g. an open file.
+        format (str): 'ndjson' or 'csv'.
+        batch_size (int): Rows per transaction (default INGEST_BATCH_SIZE).
+        max_rows (int): Optional upper bound of the rows accepted.
+        progress (callable): Called with the running summary after every batch.
+
+    Returns:
+        dict: {'kind', 'rows', 'batches', 'seconds', 'rows_per_second'}.
+
+    Raises:
+        IngestError: On the first invalid record; IngestLimitError past max_rows.
+    """
+    keys = KINDS[kind][1]
+    batch_size = batch_size or current_app.config['INGEST_BATCH_SIZE']
+    summary = {'kind': kind, 'rows': 0, 'batches': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    began = time.perf_counter()
+
+    def flush(batch):
+        write_batch(kind, list(batch.values()))
+        summary['rows'] += len(batch)
+        summary['batches'] += 1
+        elapsed = time.perf_counter() - began
+        summary['seconds'] = round(elapsed, 3)
+        summary['rows_per_second'] = round(summary['rows'] / elapsed, 1)
+        if progress is not None:
+            progress(summary)
+
+    batch = {}
+    seen = 0
+    try:
+        for line, record in read_records(lines, format):
+            seen += 1
+            if max_rows is not None and seen > max_rows:
+                raise IngestLimitError(f'More than {max_rows} rows; split the input', summary)
+            try:
+                row = coerce(kind, record)
+            except ValueError as e:
+                raise IngestError(f'Line {line}: {e}', summary)
+            batch[tuple(row[key] for key in keys)] = row
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = {}
+        if batch:
+            flush(batch)
+    except IngestError:
+        db.session.rollback()
+        raise
+    except ValueError as e:
+        db.session.rollback()
+        raise IngestError(str(e), summary)
+
+    return summary
@@ -0,0 +1,49 @@
+from extensions import db
+from models.aptos_transactions import AptosTransactions
+from sqlalchemy import func
+
+
+class JobWatermark(db.Model):
+    """
+    Progress marker of an incremental job, e.g. the highest
+    aptos_transactions.version already folded into a rollup.
+    """
+    __tablename__ = 'job_watermarks'
+
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @classmethod
+    def get(cls, name):
+        """Return the stored version for `name`, or 0 if the job never ran."""
+        watermark = db.session.get(cls, name)
+        return watermark.version if watermark else 0
+
+    @classmethod
+    def set(cls, name, version):
+        """Record `version` for `name`; committed with the caller's transaction."""
+        watermark = db.session.get(cls, name)
+        if watermark is None:
+            db.session.add(cls(name=name, version=version))
+        else:
+            watermark.version = version
+
+
+def settled_version(before):
+    """
+    Return the highest version of the newest transactions timestamped before
+    `before`, or 0 if there are none.
+
+    Versions are not committed in order, so storing max(version) as a
+    watermark skips a lower version committed a moment later. Storing this
+    version instead keeps the watermark a safety margin behind: as long as
+    every transaction lands within that margin of its timestamp, the
+    versions still to come are above it.
+    """
+    newest = db.session.query(func.max(AptosTransactions.timestamp)).filter(
+        AptosTransactions.timestamp < before
+    ).scalar_subquery()
+    version = db.session.query(func.max(AptosTransactions.version)).filter(
+        AptosTransactions.timestamp == newest
+    ).scalar()
+    return version or 0
@@ -0,0 +1,397 @@
+from extensions import db
+from models.aptos_transactions import AptosTransactions
+from models.job_watermark import JobWatermark, settled_version
+from models.functions import dialect_insert
+from aggregates import cover_window, group_bounds
+from signals import ingested
+from flask import current_app
+from sqlalchemy import and_, func, or_
+from datetime import datetime, timezone
+import numpy as np
+import time
+
+# Candle intervals and their width in seconds, finest first. 1m candles are
+# built from the transactions, coarser ones from the previous interval.
+CANDLE_INTERVALS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+
+# Every candle older than this epoch second is stored, and every transaction
+# from it on has a version above the second watermark
+CLOSED_WATERMARK = 'pool_candles_closed'
+VERSION_WATERMARK = 'pool_candles'
+
+# Per-candle values, in the order of the arrays passed between the helpers
+CANDLE_FIELDS = [
+    'open_x', 'high_x', 'low_x', 'close_x', 'open_y', 'high_y', 'low_y', 'close_y', 'volume', 'fees', 'trades'
+]
+
+
+class PoolCandle(db.Model):
+    """
+    Closed OHLCV candle of one pool's trades in a 1m, 5m, 1h or 1d bucket.
+
+    Prices are price_x (x in units of y) and price_y (its inverse) in
+    version order. A candle is only written once its bucket has closed, so
+    the rows never change unless transactions arrive late.
+    """
+    __tablename__ = 'pool_candles'
+
+    resolution = db.Column(db.String, primary_key=True)
+    pool_address = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    open_x = db.Column(db.Float, nullable=False)
+    high_x = db.Column(db.Float, nullable=False)
+    low_x = db.Column(db.Float, nullable=False)
+    close_x = db.Column(db.Float, nullable=False)
+    open_y = db.Column(db.Float, nullable=True)
+    high_y = db.Column(db.Float, nullable=True)
+    low_y = db.Column(db.Float, nullable=True)
+    close_y = db.Column(db.Float, nullable=True)
+    volume = db.Column(db.Float, nullable=False)
+    fees = db.Column(db.Float, nullable=False)
+    trades = db.Column(db.Integer, nullable=False)
+
+
+def _epoch(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _datetime(epoch):
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+
+
+def _float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _from_trades(rows, seconds):
+    """
+    Build candles from (pool_address, timestamp, price_x, price_y, volume, fees)
+    rows sorted by pool and time.
+
+    Returns:
+        tuple: (pool addresses, bucket starts in epoch seconds, {field: array}).
+    """
+    pools, timestamps, prices_x, prices_y, volumes, fees = zip(*rows)
+    epochs = np.array([_epoch(value) for value in timestamps], dtype=np.int64)
+    prices_x = np.array(prices_x, dtype=float)
+    prices_y = np.array(prices_y, dtype=float)
+    fields = {
+        'open_x': prices_x, 'high_x': prices_x, 'low_x': prices_x, 'close_x': prices_x,
+        'open_y': prices_y, 'high_y': prices_y, 'low_y': prices_y, 'close_y': prices_y,
+        'volume': np.nan_to_num(np.array(volumes, dtype=float)),
+        'fees': np.nan_to_num(np.array(fees, dtype=float)),
+        'trades': np.ones(len(rows), dtype=np.int64),
+    }
+    return _roll_up(np.array(pools, dtype=object), epochs, fields, seconds)
+
+
+def _first_valid(values, starts, ends):
+    """The first non-NaN value of every group, NaN for groups without one."""
+    positions = np.where(np.isnan(values), len(values), np.arange(len(values)))
+    first = np.minimum.reduceat(positions, starts)
+    return np.where(first <= ends, values[np.minimum(first, ends)], np.nan)
+
+
+def _last_valid(values, starts, ends):
+    """The last non-NaN value of every group, NaN for groups without one."""
+    positions = np.where(np.isnan(values), -1, np.arange(len(values)))
+    last = np.maximum.reduceat(positions, starts)
+    return np.where(last >= starts, values[np.maximum(last, starts)], np.nan)
+
+
+def _roll_up(pools, bucket_starts, fields, seconds):
+    """
+    Merge candles (or single trades) sorted by pool and time into `seconds` wide candles.
+
+    Returns:
+        tuple: (pool addresses, bucket starts in epoch seconds, {field: array}).
+    """
+    buckets = bucket_starts - bucket_starts % seconds
+    starts, counts = group_bounds(pools, buckets)
+    ends = starts + counts - 1
+    merged = {}
+    for side in ('x', 'y'):
+        # price_y may be missing: open and close skip NaN, as high and low do
+        merged[f'open_{side}'] = _first_valid(fields[f'open_{side}'], starts, ends)
+        merged[f'high_{side}'] = np.fmax.reduceat(fields[f'high_{side}'], starts)
+        merged[f'low_{side}'] = np.fmin.reduceat(fields[f'low_{side}'], starts)
+        merged[f'close_{side}'] = _last_valid(fields[f'close_{side}'], starts, ends)
+    for name in ('volume', 'fees', 'trades'):
+        merged[name] = np.add.reduceat(fields[name], starts)
+    return pools[starts], buckets[starts], merged
+
+
+def _concat(*parts):
+    parts = [part for part in parts if part is not None and len(part[0])]
+    if not parts:
+        return None
+    return (
+        np.concatenate([part[0] for part in parts]),
+        np.concatenate([part[1] for part in parts]),
+        {name: np.concatenate([part[2][name] for part in parts]) for name in CANDLE_FIELDS}
+    )
+
+
+def _closed(candles, seconds, closed_until):
+    """Keep the candles whose bucket ended by `closed_until`."""
+    pools, bucket_starts, fields = candles
+    keep = bucket_starts + seconds <= closed_until
+    return pools[keep], bucket_starts[keep], {name: values[keep] for name, values in fields.items()}
+
+
+def _load_trades(filters):
+    rows = db.session.query(
+        AptosTransactions.pool_address,
+        AptosTransactions.timestamp,
+        AptosTransactions.price_x,
+        AptosTransactions.price_y,
+        AptosTransactions.volume,
+        AptosTransactions.fees
+    ).filter(
+        AptosTransactions.price_x.isnot(None), *filters
+    ).order_by(AptosTransactions.pool_address, AptosTransactions.timestamp, AptosTransactions.version).all()
+    return rows
+
+
+def _load_candles(filters):
+    """Read stored candles as arrays, sorted by pool and time."""
+    rows = db.session.query(
+        PoolCandle.pool_address, PoolCandle.bucket_start, *[getattr(PoolCandle, name) for name in CANDLE_FIELDS]
+    ).filter(*filters).order_by(PoolCandle.pool_address, PoolCandle.bucket_start).all()
+    if not rows:
+        return None
+    columns = list(zip(*rows))
+    fields = {
+        name: np.array([np.nan if value is None else value for value in values], dtype=float)
+        for name, values in zip(CANDLE_FIELDS, columns[2:])
+    }
+    fields['trades'] = fields['trades'].astype(np.int64)
+    return (
+        np.array(columns[0], dtype=object),
+        np.array([_epoch(value) for value in columns[1]], dtype=np.int64),
+        fields
+    )
+
+
+def _write(interval, candles):
+    pools, bucket_starts, fields = candles
+    if not len(pools):
+        return 0
+    rows = [
+        {
+            'resolution': interval,
+            'pool_address': pools[index],
+            'bucket_start': _datetime(bucket_starts[index]),
+            **{name: _float(fields[name][index]) for name in CANDLE_FIELDS[:-1]},
+            'trades': int(fields['trades'][index]),
+        }
+        for index in range(len(pools))
+    ]
+    connection = db.session.connection()
+    insert = dialect_insert(connection, PoolCandle.__table__)
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=['resolution', 'pool_address', 'bucket_start'],
+            set_={name: insert.excluded[name] for name in CANDLE_FIELDS}
+        ),
+        rows
+    )
+    return len(rows)
+
+
+def _set_watermarks(closed_until):
+    JobWatermark.set(CLOSED_WATERMARK, closed_until)
+    # Every trade from the boundary on, including lower versions committed
+    # after this run, must have a version above the version watermark, so it
+    # stays JOB_WATERMARK_MARGIN seconds of transactions behind the boundary
+    margin = current_app.config['JOB_WATERMARK_MARGIN']
+    JobWatermark.set(VERSION_WATERMARK, settled_version(_datetime(closed_until - margin)))
+
+
+def closing_time():
+    """
+    The end of the newest minute old enough to be stored, in epoch seconds.
+
+    Stored candles are never rebuilt, so a minute is only closed once every
+    transaction in it is committed: at least JOB_WATERMARK_MARGIN after it ends.
+    """
+    delay = max(current_app.config['POOL_CANDLE_DELAY'], current_app.config['JOB_WATERMARK_MARGIN'])
+    now = int(time.time()) - delay
+    return now - now % 60
+
+
+def backfill_pool_candles(since=None, until=None, progress=None):
+    """
+    Rebuild every candle from aptos_transactions, one day of trades at a time.
+
+    Each day's trades are loaded once and turned into 1m candles, which are
+    rolled up into 5m, 1h and 1d candles in memory with NumPy; only closed
+    buckets are written.
+
+    Args:
+        since (datetime): Rebuild from the start of this day; defaults to the first transaction.
+        until (int): Epoch seconds up to which candles are closed; defaults to closing_time().
+        progress (callable): Called with (day start, candles written) after every day.
+
+    Returns:
+        int: The number of candle rows written.
+    """
+    closed_until = closing_time() if until is None else until
+    if since is None:
+        since = db.session.query(func.min(AptosTransactions.timestamp)).scalar()
+    written = 0
+    if since is not None:
+        day = _epoch(since)
+        day -= day % 86400
+        while day < closed_until:
+            end = min(day + 86400, closed_until)
+            rows = _load_trades((
+                AptosTransactions.timestamp >= _datetime(day),
+                AptosTransactions.timestamp < _datetime(end)
+            ))
+            day_written = 0
+            if rows:
+                candles = _from_trades(rows, 60)
+                for interval, seconds in CANDLE_INTERVALS.items():
+                    candles = _roll_up(*candles, seconds)
+                    day_written += _write(interval, _closed(candles, seconds, closed_until))
+            db.session.commit()
+            written += day_written
+            if progress is not None:
+                progress(_datetime(day), day_written)
+            day += 86400
+
+    _set_watermarks(closed_until)
+    db.session.commit()
+    return written
+
+
+def update_pool_candles():
+    """
+    Store the candles closed since the previous run.
+
+    New 1m candles are built from the transactions since the stored
+    boundary, then every coarser interval whose bucket closed in the
+    meantime is rolled up from the stored candles of the next finer one.
+    The first run backfills everything.
+
+    Returns:
+        int: The number of candle rows written.
+    """
+    since = JobWatermark.get(CLOSED_WATERMARK)
+    if not since:
+        return backfill_pool_candles()
+    closed_until = closing_time()
+    if closed_until <= since:
+        return 0
+    if closed_until - since > 86400:
+        # Far behind, e.g. after late transactions: rebuild day by day
+        return backfill_pool_candles(_datetime(since), closed_until)
+
+    written = 0
+    rows = _load_trades((
+        AptosTransactions.timestamp >= _datetime(since),
+        AptosTransactions.timestamp < _datetime(closed_until)
+    ))
+    if rows:
+        written += _write('1m', _from_trades(rows, 60))
+
+    source = '1m'
+    for interval, seconds in list(CANDLE_INTERVALS.items())[1:]:
+        first, last = since - since % seconds, closed_until - closed_until % seconds
+        if first < last:
+            # The finer candles written above are visible in this transaction
+            candles = _load_candles((
+                PoolCandle.resolution == source,
+                PoolCandle.bucket_start >= _datetime(first),
+                PoolCandle.bucket_start < _datetime(last)
+            ))
+            if candles is not None:
+                written += _write(interval, _roll_up(*candles, seconds))
+        source = interval
+
+    _set_watermarks(closed_until)
+    db.session.commit()
+    return written
+
+
+def pool_candles(pool_address, interval, start, end):
+    """
+    Return a pool's candles with a bucket start in [start, end), oldest first.
+
+    Closed candles are read from pool_candles. Buckets from the stored
+    boundary on are assembled from the finer stored candles and the pool's
+    newer trades, which are found through (pool_address, version) as they
+    all have a version above the version watermark.
+
+    Args:
+        pool_address (str): The pool.
+        interval (str): A key of CANDLE_INTERVALS.
+        start (int): Epoch seconds, aligned to the interval.
+        end (int): Epoch seconds, aligned to the interval.
+
+    Returns:
+        list: (bucket start in epoch seconds, {field: value}) tuples.
+    """
+    seconds = CANDLE_INTERVALS[interval]
+    watermarks = dict(db.session.query(JobWatermark.name, JobWatermark.version).filter(
+        JobWatermark.name.in_([CLOSED_WATERMARK, VERSION_WATERMARK])
+    ).all())
+    closed_until = watermarks.get(CLOSED_WATERMARK, 0)
+    version = watermarks.get(VERSION_WATERMARK, 0)
+
+    # Stored candles of this interval, then finer ones up to the boundary, in one statement
+    live_start = max(start, closed_until - closed_until % seconds)
+    runs = []
+    if start < min(end, live_start):
+        runs.append((interval, start, min(end, live_start) - seconds))
+    if live_start < min(end, closed_until):
+        finer = {name: width for name, width in CANDLE_INTERVALS.items() if width < seconds}
+        runs += cover_window(live_start, min(end, closed_until), finer)
+    candles = None
+    if runs:
+        candles = _load_candles((
+            PoolCandle.pool_address == pool_address,
+            or_(*[
+                and_(PoolCandle.resolution == name, PoolCandle.bucket_start.between(_datetime(first), _datetime(last)))
+                for name, first, last in runs
+            ])
+        ))
+
+    trades = None
+    trades_start = max(live_start, closed_until)
+    if trades_start < end:
+        rows = _load_trades((
+            AptosTransactions.pool_address == pool_address,
+            AptosTransactions.version > version,
+            AptosTransactions.timestamp >= _datetime(trades_start),
+            AptosTransactions.timestamp < _datetime(end)
+        ))
+        if rows:
+            trades = _from_trades(rows, 60)
+
+    candles = _concat(candles, trades)
+    if candles is None:
+        return []
+    # Stored, finer and live candles never overlap and are already in time order
+    _, bucket_starts, fields = _roll_up(*candles, seconds)
+    return [
+        (int(bucket_start), {name: fields[name][index] for name in CANDLE_FIELDS})
+        for index, bucket_start in enumerate(bucket_starts)
+    ]
+
+
+@ingested.connect
+def _rewind_watermarks(sender, kind, rows, **extra):
+    # Transactions older than the boundary would never reach their stored
+    # candles; moving the boundary back makes the next run rebuild them,
+    # and reads assemble those buckets from the trades until then.
+    if kind != 'transactions':
+        return
+    closed_until = JobWatermark.get(CLOSED_WATERMARK)
+    earliest = min(_epoch(row['timestamp']) for row in rows)
+    if closed_until and earliest < closed_until:
+        _set_watermarks(earliest - earliest % 60)
+        db.session.commit()
@@ -0,0 +1,176 @@
+from extensions import db
+from models.aptos_pool_latest import AptosPoolLatest
+from flask import current_app
+from datetime import timedelta
+from decimal import Decimal
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Columns summed per provider; the slippage sums are averaged over their non-null count
+SUM_COLUMNS = [
+    'tvl', 'volume_day', 'volume_week', 'volume_month', 'fees_day', 'fees_week', 'fees_month',
+    'median_slippage_1d', 'median_slippage_7d', 'median_slippage_30d'
+]
+
+SLIPPAGE_COLUMNS = SUM_COLUMNS[7:]
+
+ZERO = Decimal(0)
+
+
+def _contribution(row):
+    """Return what one latest snapshot adds to its provider: the sums, then the non-null slippage counts."""
+    values = [getattr(row, name) for name in SUM_COLUMNS]
+    return (
+        [value if value is not None else ZERO for value in values] +
+        [int(value is not None) for value in values[7:]]
+    )
+
+
+def _add(totals, provider, contribution, sign):
+    """Add (sign=1) or subtract (sign=-1) one pool's contribution to its provider's totals."""
+    values = totals.setdefault(provider, [ZERO] * len(SUM_COLUMNS) + [0] * len(SLIPPAGE_COLUMNS) + [0])
+    for index, value in enumerate(contribution):
+        values[index] += sign * value
+    # The last entry counts the provider's pools
+    values[-1] += sign
+    if values[-1] == 0:
+        del totals[provider]
+
+
+class ProviderRollups:
+    """
+    Per-provider totals of the latest snapshot of every pool, kept in-process.
+
+    Every read first folds in the aptos_pools_latest rows changed since the
+    newest updated_at already seen, found through its index: the pool's
+    previous contribution is subtracted from its provider's totals and the
+    new one added. Rows changed by any writer, in any worker, are picked
+    up. Changes are committed a little after their updated_at, so each read
+    looks JOB_WATERMARK_MARGIN further back; pools already folded at that
+    updated_at are skipped, so a read costs O(#changed pools + #providers).
+    Sums are exact Decimals, so the totals cannot drift numerically;
+    verify() rebuilds them from scratch to catch anything the incremental
+    path missed, such as deleted pools.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.watermark = None
+        self.pools = {}
+        self.totals = {}
+        self.stats = {'updates': 0, 'verifications': 0, 'drifts': 0}
+
+    @staticmethod
+    def _rows(*filters):
+        return db.session.query(
+            AptosPoolLatest.pool_address, AptosPoolLatest.updated_at, AptosPoolLatest.provider,
+            *[getattr(AptosPoolLatest, name) for name in SUM_COLUMNS]
+        ).filter(*filters).all()
+
+    def _build(self):
+        """Return (watermark, pools, totals) computed from the whole latest table."""
+        rows = self._rows()
+        pools, totals = {}, {}
+        for row in rows:
+            contribution = _contribution(row)
+            pools[row.pool_address] = (row.provider, contribution, row.updated_at)
+            _add(totals, row.provider, contribution, 1)
+        return max((row.updated_at for row in rows), default=None), pools, totals
+
+    def update(self):
+        """Fold the latest snapshots changed since the watermark into the totals."""
+        with self.lock:
+            if self.watermark is None:
+                self.watermark, self.pools, self.totals = self._build()
+                return
+
+            since = self.watermark - timedelta(seconds=current_app.config['JOB_WATERMARK_MARGIN'])
+            changed = db.session.query(AptosPoolLatest.pool_address, AptosPoolLatest.updated_at).filter(
+                AptosPoolLatest.updated_at > since
+            ).all()
+            stale = [
+                pool_address for pool_address, updated_at in changed
+                if pool_address not in self.pools or self.pools[pool_address][2] != updated_at
+            ]
+            rows = self._rows(AptosPoolLatest.pool_address.in_(stale)) if stale else []
+
+            for row in rows:
+                previous = self.pools.get(row.pool_address)
+                if previous is not None:
+                    _add(self.totals, previous[0], previous[1], -1)
+                contribution = _contribution(row)
+                self.pools[row.pool_address] = (row.provider, contribution, row.updated_at)
+                _add(self.totals, row.provider, contribution, 1)
+                self.watermark = max(self.watermark, row.updated_at)
+            self.stats['updates'] += len(rows)
+
+    def verify(self):
+        """
+        Recompute the totals from scratch and replace the incremental ones.
+
+        Returns:
+            list: Providers whose incremental totals had drifted.
+        """
+        self.update()
+        with self.lock:
+            watermark, pools, totals = self._build()
+            drifted = sorted(
+                provider for provider in set(totals) | set(self.totals)
+                if totals.get(provider) != self.totals.get(provider)
+            )
+            self.watermark, self.pools, self.totals = watermark, pools, totals
+            self.stats['verifications'] += 1
+            if drifted:
+                self.stats['drifts'] += 1
+                logger.warning(f"Provider rollups drifted for: {', '.join(drifted)}")
+        return drifted
+
+    def invalidate(self):
+        """Drop the totals; the next read rebuilds them from scratch."""
+        with self.lock:
+            self.watermark = None
+
+    def providers(self, provider_name=None):
+        """
+        Return the current summary of every provider, or only of `provider_name`.
+
+        Returns:
+            list: Dictionaries in the /api/providers format, sorted by provider.
+        """
+        self.update()
+        with self.lock:
+            totals = dict(self.totals)
+
+        result = []
+        for provider in sorted(totals):
+            if provider_name and provider != provider_name:
+                continue
+            values = totals[provider]
+            count = values[-1]
+            sums = dict(zip(SUM_COLUMNS, values))
+            slippage_counts = dict(zip(SLIPPAGE_COLUMNS, values[len(SUM_COLUMNS):]))
+
+            def average(name, denominator):
+                return round(float(sums[name] / denominator), 2) if denominator else 0.0
+
+            result.append({
+                'provider': provider,
+                'total_tvl': round(float(sums['tvl']), 2),
+                'total_volume_1d': round(float(sums['volume_day']), 2),
+                'total_volume_7d': round(float(sums['volume_week']), 2),
+                'total_volume_30d': round(float(sums['volume_month']), 2),
+                'avg_fees_1d': average('fees_day', count),
+                'avg_fees_7d': average('fees_week', count),
+                'avg_fees_30d': average('fees_month', count),
+                'total_pools': count,
+                'avg_tvl_per_pool': average('tvl', count),
+                'avg_slippage_1d': average('median_slippage_1d', slippage_counts['median_slippage_1d']),
+                'avg_slippage_7d': average('median_slippage_7d', slippage_counts['median_slippage_7d']),
+                'avg_slippage_30d': average('median_slippage_30d', slippage_counts['median_slippage_30d']),
+            })
+        return result
+
+
+provider_rollups = ProviderRollups()
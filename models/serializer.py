@@ -0,0 +1,76 @@
+from extensions import db
+from functools import lru_cache
+from sqlalchemy import cast
+
+
+def _integer(value):
+    return value or 0
+
+
+def _float(value):
+    return value or 0.0
+
+
+def _string(value):
+    return value or ''
+
+
+def _datetime(value):
+    return value.isoformat() if value else ''
+
+
+def public_columns(model):
+    """Return the names of the columns of `model` the API exposes, in table order."""
+    return [column.name for column in model.__table__.columns if not column.info.get('internal')]
+
+
+class RowSerializer:
+    """
+    Column-projected serializer producing the same dictionaries as a model's to_dict().
+
+    The columns to select and the converter of every column are resolved once
+    when the serializer is built. Numeric columns are cast to floats in SQL,
+    so the driver returns plain floats instead of Decimals. Query the
+    `columns` as plain tuples and pass each row to `to_dict`.
+
+    Usage:
+        serializer = RowSerializer.for_model(AptosPool, ['timestamp', 'tvl'])
+        rows = db.session.query(*serializer.columns).filter(...)
+        result = [serializer.to_dict(row) for row in rows]
+    """
+
+    def __init__(self, model, fields=None):
+        table = model.__table__
+        self.fields = list(fields or public_columns(model))
+        self.columns = []
+        self.converters = []
+        for name in self.fields:
+            column = table.c[name]
+            if isinstance(column.type, db.Numeric) and not isinstance(column.type, db.Float):
+                self.columns.append(cast(getattr(model, name), db.Float).label(name))
+                self.converters.append(_float)
+            elif isinstance(column.type, db.Float):
+                self.columns.append(getattr(model, name))
+                self.converters.append(_float)
+            elif isinstance(column.type, db.Integer):
+                self.columns.append(getattr(model, name))
+                self.converters.append(_integer)
+            elif isinstance(column.type, db.DateTime):
+                self.columns.append(getattr(model, name))
+                self.converters.append(_datetime)
+            else:
+                self.columns.append(getattr(model, name))
+                self.converters.append(_string)
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _cached(model, fields):
+        return RowSerializer(model, fields)
+
+    @classmethod
+    def for_model(cls, model, fields=None):
+        """Return a shared serializer for `model` projected on `fields` (all columns if None)."""
+        return cls._cached(model, tuple(fields) if fields else None)
+
+    def to_dict(self, row):
+        return {name: convert(value) for name, convert, value in zip(self.fields, self.converters, row)}
@@ -0,0 +1,227 @@
+from extensions import db
+from models.aptos_transactions import AptosTransactions
+from models.job_watermark import JobWatermark, settled_version
+from models.functions import time_bucket, pair_least, pair_greatest, dialect_insert
+from aggregates import group_bounds, grouped_percentiles
+from signals import ingested
+from flask import current_app
+from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# Rollup resolutions and their bucket width in seconds
+RESOLUTIONS = {'1m': 60, '5m': 300, '30m': 1800}
+
+WATERMARK_NAME = 'slippage_rollups'
+
+ROLLUP_COLUMNS = [
+    'resolution', 'coin_a', 'coin_b', 'bucket_start', 'tx_count', 'slippage_median',
+    'slippage_p90', 'slippage_p99', 'volume_sum', 'fees_sum', 'max_version'
+]
+
+
+class SlippageRollup(db.Model):
+    """
+    Per-bucket slippage statistics of every token pair at 1, 5 and 30 minutes.
+
+    Pairs are order-normalized: coin_a is the lexicographically smaller coin
+    type, so APT/USDC and USDC/APT trades land in the same rows.
+    """
+    __tablename__ = 'slippage_rollups'
+
+    resolution = db.Column(db.String, primary_key=True)
+    coin_a = db.Column(db.String, primary_key=True)
+    coin_b = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False)
+    slippage_median = db.Column(db.Numeric, nullable=True)
+    slippage_p90 = db.Column(db.Numeric, nullable=True)
+    slippage_p99 = db.Column(db.Numeric, nullable=True)
+    volume_sum = db.Column(db.Numeric, nullable=True)
+    fees_sum = db.Column(db.Numeric, nullable=True)
+    max_version = db.Column(db.BigInteger, nullable=False)
+
+
+def normalize_pair(coin1, coin2):
+    """Return the (coin_a, coin_b) key a pair is stored under."""
+    return (coin1, coin2) if coin1 <= coin2 else (coin2, coin1)
+
+
+def _floor_timestamp(value, seconds):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    epoch = int(value.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def _aggregate_sql(resolution, filters):
+    """Compute the rollup rows of one resolution with percentile_cont (Postgres)."""
+    coin_a = pair_least(AptosTransactions.coin1, AptosTransactions.coin2)
+    coin_b = pair_greatest(AptosTransactions.coin1, AptosTransactions.coin2)
+    bucket_start = time_bucket(RESOLUTIONS[resolution], AptosTransactions.timestamp)
+
+    rows = db.session.query(
+        coin_a, coin_b, bucket_start,
+        func.count(),
+        func.percentile_cont(0.5).within_group(AptosTransactions.slippage),
+        func.percentile_cont(0.9).within_group(AptosTransactions.slippage),
+        func.percentile_cont(0.99).within_group(AptosTransactions.slippage),
+        func.sum(AptosTransactions.volume),
+        func.sum(AptosTransactions.fees),
+        func.max(AptosTransactions.version)
+    ).filter(*filters).group_by(coin_a, coin_b, bucket_start)
+
+    return [dict(zip(ROLLUP_COLUMNS, (resolution,) + tuple(row))) for row in rows]
+
+
+def _aggregate_numpy(resolution, filters):
+    """Compute the rollup rows of one resolution with NumPy (backends without percentile_cont)."""
+    coin_a = pair_least(AptosTransactions.coin1, AptosTransactions.coin2)
+    coin_b = pair_greatest(AptosTransactions.coin1, AptosTransactions.coin2)
+    bucket_start = time_bucket(RESOLUTIONS[resolution], AptosTransactions.timestamp)
+
+    rows = db.session.query(
+        coin_a, coin_b, bucket_start,
+        AptosTransactions.slippage,
+        AptosTransactions.volume,
+        AptosTransactions.fees,
+        AptosTransactions.version
+    ).filter(*filters).order_by(coin_a, coin_b, bucket_start, AptosTransactions.slippage).all()
+    if not rows:
+        return []
+
+    coins_a, coins_b, bucket_starts, slippages, volumes, fees, versions = zip(*rows)
+    slippages = np.array(slippages, dtype=float)
+    starts, counts = group_bounds(coins_a, coins_b, bucket_starts)
+
+    volume_sums = np.add.reduceat(np.nan_to_num(np.array(volumes, dtype=float)), starts)
+    fees_sums = np.add.reduceat(np.nan_to_num(np.array(fees, dtype=float)), starts)
+    max_versions = np.maximum.reduceat(np.array(versions, dtype=np.int64), starts)
+
+    # Percentiles ignore NULL slippage, like percentile_cont
+    percentiles = np.full((len(starts), 3), np.nan)
+    present = ~np.isnan(slippages)
+    group_ids = np.repeat(np.arange(len(starts)), counts)[present]
+    if len(group_ids):
+        present_starts, present_counts = group_bounds(group_ids)
+        percentiles[group_ids[present_starts]] = grouped_percentiles(
+            slippages[present], present_starts, present_counts, [0.5, 0.9, 0.99]
+        )
+
+    return [
+        dict(zip(ROLLUP_COLUMNS, (
+            resolution, coins_a[start], coins_b[start], bucket_starts[start], int(count),
+            *(None if np.isnan(value) else float(value) for value in percentiles[index]),
+            float(volume_sums[index]), float(fees_sums[index]), int(max_versions[index])
+        )))
+        for index, (start, count) in enumerate(zip(starts, counts))
+    ]
+
+
+def aggregate_rollups(resolution, filters):
+    """Compute the rollup rows of one resolution for the transactions matching `filters`."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _aggregate_sql(resolution, filters)
+    return _aggregate_numpy(resolution, filters)
+
+
+def _pair_bucket(resolution, coins, bucket_start, since):
+    """Compute the rollup row of one bucket of a pair from its transactions at or after `since`."""
+    rows = aggregate_rollups(resolution, (
+        AptosTransactions.timestamp >= since,
+        AptosTransactions.timestamp < datetime.fromtimestamp(
+            bucket_start.timestamp() + RESOLUTIONS[resolution], tz=timezone.utc
+        ),
+        pair_least(AptosTransactions.coin1, AptosTransactions.coin2) == coins[0],
+        pair_greatest(AptosTransactions.coin1, AptosTransactions.coin2) == coins[1]
+    ))
+    return rows[0] if rows else None
+
+
+def bucket_floor(resolution, value):
+    """Return the start of the `resolution` bucket containing `value`."""
+    return _floor_timestamp(value, RESOLUTIONS[resolution])
+
+
+def partial_bucket(resolution, coins, start_time):
+    """
+    Compute the rollup row of the bucket containing `start_time` from only the
+    pair's transactions at or after it, or None if that bucket starts exactly
+    at `start_time` or holds no such transactions.
+    """
+    bucket_start = bucket_floor(resolution, start_time)
+    if bucket_start == start_time:
+        return None
+    return _pair_bucket(resolution, coins, bucket_start, start_time)
+
+
+def current_bucket(resolution, coins, now):
+    """
+    Compute the rollup row of the still open bucket containing `now` from the
+    pair's transactions, or None if it holds none yet. The stored row lags by
+    up to SLIPPAGE_ROLLUP_INTERVAL.
+    """
+    bucket_start = bucket_floor(resolution, now)
+    return _pair_bucket(resolution, coins, bucket_start, bucket_start)
+
+
+def update_slippage_rollups():
+    """
+    Fold transactions newer than the stored version watermark into the rollups.
+
+    Closed buckets never change, so only the buckets touched by the new
+    versions (normally the current one and those within
+    JOB_WATERMARK_MARGIN of now) are recomputed from aptos_transactions and
+    upserted. The first run backfills everything.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    watermark = JobWatermark.get(WATERMARK_NAME)
+    latest_version = db.session.query(func.max(AptosTransactions.version)).scalar()
+    if latest_version is None or latest_version <= watermark:
+        return 0
+
+    earliest_touched = db.session.query(func.min(AptosTransactions.timestamp)).filter(
+        AptosTransactions.version > watermark,
+        AptosTransactions.version <= latest_version
+    ).scalar()
+
+    connection = db.session.connection()
+    written = 0
+    for resolution, seconds in RESOLUTIONS.items():
+        rows = aggregate_rollups(resolution, (
+            AptosTransactions.timestamp >= _floor_timestamp(earliest_touched, seconds),
+            AptosTransactions.version <= latest_version
+        ))
+        if not rows:
+            continue
+
+        insert = dialect_insert(connection, SlippageRollup.__table__)
+        connection.execute(
+            insert.on_conflict_do_update(
+                index_elements=['resolution', 'coin_a', 'coin_b', 'bucket_start'],
+                set_={name: insert.excluded[name] for name in ROLLUP_COLUMNS[4:]}
+            ),
+            rows
+        )
+        written += len(rows)
+
+    # Stay a margin behind, so the next run recomputes the newest buckets with
+    # any lower versions committed after this one read them
+    margin = timedelta(seconds=current_app.config['JOB_WATERMARK_MARGIN'])
+    JobWatermark.set(WATERMARK_NAME, min(latest_version, settled_version(datetime.now(timezone.utc) - margin)))
+    db.session.commit()
+    return written
+
+
+@ingested.connect
+def _rewind_watermark(sender, kind, rows, **extra):
+    # Versions at or below the watermark (late or re-ingested transactions)
+    # would be skipped; rewinding makes the next update recompute their buckets.
+    if kind != 'transactions':
+        return
+    earliest = min(row['version'] for row in rows)
+    if earliest <= JobWatermark.get(WATERMARK_NAME):
+        JobWatermark.set(WATERMARK_NAME, earliest - 1)
+        db.session.commit()
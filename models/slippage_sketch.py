@@ -0,0 +1,232 @@
+from extensions import db
+from models.aptos_transactions import AptosTransactions
+from models.job_watermark import JobWatermark, settled_version
+from models.functions import time_bucket, pair_least, pair_greatest, dialect_insert
+from aggregates import TDigest, cover_window, group_bounds
+from signals import ingested
+from flask import current_app
+from sqlalchemy import and_, func, or_
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# Sketch resolutions and their bucket width in seconds, finest first. 1m
+# sketches are built from the transactions, coarser ones by merging the
+# sketches of the previous resolution.
+SKETCH_RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+WATERMARK_NAME = 'slippage_sketches'
+
+SKETCH_COLUMNS = [
+    'resolution', 'pool_address', 'bucket_start', 'coin_a', 'coin_b',
+    'tx_count', 'slippage_min', 'slippage_max', 'centroids'
+]
+
+
+class SlippageSketch(db.Model):
+    """
+    t-digest of the slippage of one pool's transactions in a 1m, 1h or 1d bucket.
+
+    Pairs are order-normalized as in slippage_rollups; a pair's sketch is the
+    merge of its pools' sketches.
+    """
+    __tablename__ = 'slippage_sketches'
+
+    resolution = db.Column(db.String, primary_key=True)
+    pool_address = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    coin_a = db.Column(db.String, nullable=False)
+    coin_b = db.Column(db.String, nullable=False)
+    tx_count = db.Column(db.Integer, nullable=False)
+    slippage_min = db.Column(db.Float, nullable=False)
+    slippage_max = db.Column(db.Float, nullable=False)
+    centroids = db.Column(db.LargeBinary, nullable=False)
+
+    def digest(self):
+        return TDigest.from_bytes(self.centroids, self.slippage_min, self.slippage_max)
+
+
+# Pair-scoped window reads
+db.Index(
+    'ix_slippage_sketches_pair',
+    SlippageSketch.coin_a, SlippageSketch.coin_b, SlippageSketch.resolution, SlippageSketch.bucket_start
+)
+
+
+def _epoch(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _datetime(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _sketch_row(resolution, pool_address, bucket_start, coin_a, coin_b, digest):
+    return dict(zip(SKETCH_COLUMNS, (
+        resolution, pool_address, bucket_start, coin_a, coin_b,
+        digest.count, digest.minimum, digest.maximum, digest.to_bytes()
+    )))
+
+
+def _minute_sketches(since, latest_version, compression):
+    """Build the 1m sketches of every pool from its transactions at or after `since`."""
+    coin_a = pair_least(AptosTransactions.coin1, AptosTransactions.coin2)
+    coin_b = pair_greatest(AptosTransactions.coin1, AptosTransactions.coin2)
+    bucket_start = time_bucket(60, AptosTransactions.timestamp)
+
+    rows = db.session.query(
+        AptosTransactions.pool_address, bucket_start, coin_a, coin_b, AptosTransactions.slippage
+    ).filter(
+        AptosTransactions.timestamp >= since,
+        AptosTransactions.version <= latest_version,
+        AptosTransactions.slippage.isnot(None)
+    ).order_by(AptosTransactions.pool_address, bucket_start).all()
+    if not rows:
+        return []
+
+    pools, bucket_starts, coins_a, coins_b, slippages = zip(*rows)
+    slippages = np.array(slippages, dtype=float)
+    starts, counts = group_bounds(pools, bucket_starts)
+    return [
+        _sketch_row(
+            '1m', pools[start], bucket_starts[start], coins_a[start], coins_b[start],
+            TDigest.from_values(slippages[start:start + count], compression)
+        )
+        for start, count in zip(starts, counts)
+    ]
+
+
+def _merged_sketches(resolution, source, since, compression):
+    """Build the `resolution` sketches at or after `since` by merging the `source` sketches."""
+    seconds = SKETCH_RESOLUTIONS[resolution]
+    sketches = db.session.query(SlippageSketch).filter(
+        SlippageSketch.resolution == source,
+        SlippageSketch.bucket_start >= since
+    ).order_by(SlippageSketch.pool_address, SlippageSketch.bucket_start).all()
+
+    groups = {}
+    for sketch in sketches:
+        epoch = _epoch(sketch.bucket_start)
+        groups.setdefault((sketch.pool_address, epoch - epoch % seconds), []).append(sketch)
+    return [
+        _sketch_row(
+            resolution, pool_address, _datetime(bucket_start), group[0].coin_a, group[0].coin_b,
+            TDigest.merge([sketch.digest() for sketch in group], compression)
+        )
+        for (pool_address, bucket_start), group in groups.items()
+    ]
+
+
+def update_slippage_sketches():
+    """
+    Fold transactions newer than the stored version watermark into the sketches.
+
+    As with the slippage rollups, only the buckets touched by the new
+    versions and the last JOB_WATERMARK_MARGIN seconds are rebuilt: their 1m sketches from aptos_transactions, then
+    their 1h and 1d sketches from the finer sketches. The first run
+    backfills everything.
+
+    Returns:
+        int: The number of sketch rows written.
+    """
+    watermark = JobWatermark.get(WATERMARK_NAME)
+    latest_version = db.session.query(func.max(AptosTransactions.version)).scalar()
+    if latest_version is None or latest_version <= watermark:
+        return 0
+
+    earliest_touched = db.session.query(func.min(AptosTransactions.timestamp)).filter(
+        AptosTransactions.version > watermark,
+        AptosTransactions.version <= latest_version
+    ).scalar()
+    earliest = _epoch(earliest_touched)
+    compression = current_app.config['SLIPPAGE_SKETCH_COMPRESSION']
+
+    connection = db.session.connection()
+    written = 0
+    source = None
+    for resolution, seconds in SKETCH_RESOLUTIONS.items():
+        since = _datetime(earliest - earliest % seconds)
+        if source is None:
+            rows = _minute_sketches(since, latest_version, compression)
+        else:
+            # The finer sketches written above are visible in this transaction
+            rows = _merged_sketches(resolution, source, since, compression)
+        source = resolution
+        if not rows:
+            continue
+
+        insert = dialect_insert(connection, SlippageSketch.__table__)
+        connection.execute(
+            insert.on_conflict_do_update(
+                index_elements=['resolution', 'pool_address', 'bucket_start'],
+                set_={name: insert.excluded[name] for name in SKETCH_COLUMNS[3:]}
+            ),
+            rows
+        )
+        written += len(rows)
+
+    # Stay a margin behind, as the rollups do, for lower versions committed after this run
+    margin = timedelta(seconds=current_app.config['JOB_WATERMARK_MARGIN'])
+    JobWatermark.set(WATERMARK_NAME, min(latest_version, settled_version(datetime.now(timezone.utc) - margin)))
+    db.session.commit()
+    return written
+
+
+def slippage_percentiles(quantiles, start, end, coins=None, pool_address=None):
+    """
+    Estimate slippage quantiles of a pair's or a pool's transactions in [start, end).
+
+    The window is widened to whole minutes and covered with the fewest 1d,
+    1h and 1m sketches, which are merged into one digest.
+
+    Args:
+        quantiles (sequence): Fractions in [0, 1].
+        start (datetime): Window start.
+        end (datetime): Window end (exclusive).
+        coins (tuple): A normalized (coin_a, coin_b) pair, or
+        pool_address (str): a single pool.
+
+    Returns:
+        dict: {'count', 'min', 'max', 'quantiles' (list, None when empty), 'sketches'}.
+    """
+    first = _epoch(start) // 60 * 60
+    last = -(-_epoch(end) // 60) * 60
+    runs = cover_window(first, last, SKETCH_RESOLUTIONS)
+
+    query = db.session.query(SlippageSketch).filter(or_(*[
+        and_(
+            SlippageSketch.resolution == resolution,
+            SlippageSketch.bucket_start.between(_datetime(run_start), _datetime(run_end))
+        )
+        for resolution, run_start, run_end in runs
+    ]))
+    if pool_address is not None:
+        query = query.filter(SlippageSketch.pool_address == pool_address)
+    else:
+        query = query.filter(SlippageSketch.coin_a == coins[0], SlippageSketch.coin_b == coins[1])
+
+    sketches = query.all() if runs else []
+    digest = TDigest.merge(
+        [sketch.digest() for sketch in sketches], current_app.config['SLIPPAGE_SKETCH_COMPRESSION']
+    )
+    if not digest.count:
+        return {'count': 0, 'min': None, 'max': None, 'quantiles': [None] * len(quantiles), 'sketches': 0}
+    return {
+        'count': digest.count,
+        'min': digest.minimum,
+        'max': digest.maximum,
+        'quantiles': [float(value) for value in digest.quantile(quantiles)],
+        'sketches': len(sketches),
+    }
+
+
+@ingested.connect
+def _rewind_watermark(sender, kind, rows, **extra):
+    # Same as the slippage rollups: late or re-ingested versions rebuild their buckets
+    if kind != 'transactions':
+        return
+    earliest = min(row['version'] for row in rows)
+    if earliest <= JobWatermark.get(WATERMARK_NAME):
+        JobWatermark.set(WATERMARK_NAME, earliest - 1)
+        db.session.commit()
@@ -0,0 +1,90 @@
+import logging
+from flask import g, request
+from flask_limiter.util import get_remote_address
+from cache import LRUBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ApiKeyTiers:
+    """
+    Per-API-key rate-limit tiers for Flask-Limiter.
+
+    Clients sending a known key in the API_KEY_HEADER header are limited per
+    key with the limits of their tier in RATELIMIT_TIERS; everyone else is
+    limited per IP address with RATELIMIT_DEFAULT. Key lookups are cached
+    in-process for API_KEY_CACHE_TTL seconds (unknown keys included), so a
+    request costs at most one database read per key and TTL.
+
+    Usage:
+        Limiter(key_func=api_keys.key_func, default_limits=[api_keys.limits], ...)
+    """
+
+    def __init__(self):
+        self.app = None
+        self.header = 'X-API-Key'
+        self.tiers = {}
+        self.default_limits = ''
+        self.exempt_endpoints = frozenset()
+        self.cache_ttl = 300
+        self.lookups = LRUBackend(max_entries=10000)
+
+    def init_app(self, app):
+        self.app = app
+        self.header = app.config['API_KEY_HEADER']
+        self.tiers = app.config['RATELIMIT_TIERS']
+        self.default_limits = app.config['RATELIMIT_DEFAULT']
+        self.exempt_endpoints = frozenset(app.config['RATELIMIT_EXEMPT_ENDPOINTS'])
+        self.cache_ttl = app.config['API_KEY_CACHE_TTL']
+
+    def lookup(self, key_hash):
+        """Return the tier of an active key digest, or None."""
+        from extensions import db
+        from models.api_key import ApiKey
+
+        entry = self.lookups.get(key_hash)
+        if entry is None:
+            tier = db.session.query(ApiKey.tier).filter(
+                ApiKey.key_hash == key_hash,
+                ApiKey.active.is_(True)
+            ).scalar()
+            entry = (tier,)
+            self.lookups.set(key_hash, entry, self.cache_ttl)
+        return entry[0]
+
+    def current(self):
+        """Return (key digest, tier) of the current request, or (None, None) when anonymous."""
+        if 'api_key_tier' not in g:
+            api_key = request.headers.get(self.header)
+            key_hash, tier = None, None
+            if api_key:
+                from models.api_key import ApiKey
+
+                key_hash = ApiKey.hash(api_key)
+                try:
+                    tier = self.lookup(key_hash)
+                except Exception as e:
+                    logger.error(f"API key lookup failed: {str(e)}", exc_info=True)
+                if tier not in self.tiers:
+                    key_hash, tier = None, None
+            g.api_key_tier = (key_hash, tier)
+        return g.api_key_tier
+
+    def key_func(self):
+        key_hash, tier = self.current()
+        return f'key:{key_hash}' if key_hash else get_remote_address()
+
+    def limits(self):
+        key_hash, tier = self.current()
+        return self.tiers[tier] if key_hash else self.default_limits
+
+    def exempt(self):
+        """Request filter: skip the limiter for exempt endpoints and unlimited tiers."""
+        if request.endpoint in self.exempt_endpoints:
+            return True
+        key_hash, tier = self.current()
+        return key_hash is not None and self.tiers[tier] is None
+
+    def invalidate(self):
+        """Forget cached lookups, e.g. after revoking a key."""
+        self.lookups.clear()
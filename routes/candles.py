@@ -0,0 +1,95 @@
+from flask import Blueprint, jsonify, request
+from models.pool_candle import CANDLE_INTERVALS, pool_candles
+from routes.helpers import MAX_PAGE_SIZE
+from routes.slippage import parse_time
+from extensions import cache
+from datetime import datetime, timezone
+import logging
+bp = Blueprint('candles', __name__)
+
+# Set up a logger for error handling
+logger = logging.getLogger(__name__)
+
+
+@bp.route('/api/pool/<string:pool_address>/candles', methods=['GET'])
+@cache.cached()
+def get_pool_candles(pool_address):
+    """
+    Retrieve OHLCV candles of a pool's trades.
+
+    Closed candles come from the pool_candles table; only the candles from
+    the last stored boundary on (normally just the open one) are assembled
+    per request. Buckets without trades are left out.
+
+    Query Parameters:
+        interval (str): '1m', '5m', '1h' or '1d'. Defaults to '1h'.
+        price (str): 'x' for price_x (x in units of y) or 'y' for price_y. Defaults to 'x'.
+        end (str): The last candle is the one containing this time (ISO 8601 or epoch
+                   seconds). Defaults to now, so the last candle may still be open.
+        start (str): Optional first candle time; at most 1000 intervals before `end`.
+        limit (int): Without `start`, the number of intervals before `end` to cover
+                     (at most 1000). Defaults to 200.
+
+    Returns:
+        JSON: The pool, interval and price side, and the candles oldest first under 'data',
+              each with its bucket start as 'timestamp', 'open', 'high', 'low', 'close',
+              'volume', 'fees' and the number of 'trades'.
+
+    Raises:
+        400: If an invalid interval, price, start, end or limit is provided.
+        500: If there's an internal server error.
+    """
+    try:
+        interval = request.args.get('interval', '1h')
+        if interval not in CANDLE_INTERVALS:
+            return jsonify({"error": "Invalid interval. Use '1m', '5m', '1h' or '1d'."}), 400
+        seconds = CANDLE_INTERVALS[interval]
+
+        side = request.args.get('price', 'x').lower()
+        if side not in ('x', 'y'):
+            return jsonify({"error": "Invalid price. Use 'x' or 'y'."}), 400
+
+        end = parse_time(request.args['end']) if 'end' in request.args else datetime.now(timezone.utc)
+        if end is None:
+            return jsonify({"error": "Invalid end. Use ISO 8601 or epoch seconds."}), 400
+        end = int(end.timestamp())
+        end = end - end % seconds + seconds
+
+        if 'start' in request.args:
+            start = parse_time(request.args['start'])
+            if start is None:
+                return jsonify({"error": "Invalid start. Use ISO 8601 or epoch seconds."}), 400
+            start = int(start.timestamp())
+            start -= start % seconds
+            if not 0 < (end - start) // seconds <= MAX_PAGE_SIZE:
+                return jsonify({"error": f"Invalid start. Use a time before end and at most {MAX_PAGE_SIZE} intervals before it."}), 400
+        else:
+            limit = request.args.get('limit', '200')
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+                return jsonify({"error": f"Invalid limit. Use an integer between 1 and {MAX_PAGE_SIZE}."}), 400
+            start = end - int(limit) * seconds
+
+        candles = pool_candles(pool_address, interval, start, end)
+
+        return jsonify({
+            "pool_address": pool_address,
+            "interval": interval,
+            "price": side,
+            "data": [
+                {
+                    "timestamp": datetime.fromtimestamp(bucket_start, tz=timezone.utc).isoformat(),
+                    "open": float(candle[f'open_{side}']),
+                    "high": float(candle[f'high_{side}']),
+                    "low": float(candle[f'low_{side}']),
+                    "close": float(candle[f'close_{side}']),
+                    "volume": float(candle['volume']),
+                    "fees": float(candle['fees']),
+                    "trades": int(candle['trades']),
+                }
+                for bucket_start, candle in candles
+            ],
+        })
+
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving candles for pool {pool_address}: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
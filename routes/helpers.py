@@ -0,0 +1,186 @@
+from flask import Response, current_app, jsonify, make_response, request, stream_with_context
+from datetime import timezone
+from functools import wraps
+from models.serializer import public_columns
+import base64
+import hashlib
+import logging
+
+# Set up a logger for error handling
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Upper bound of the `limit` pagination parameter
+MAX_PAGE_SIZE = 1000
+
+
+def wants_stream():
+    """
+    Whether the client asked for a streamed NDJSON response, either with
+    `?stream=1` or by preferring application/x-ndjson in its Accept header.
+    """
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(rows, chunk_size=100):
+    """
+    Stream rows as newline-delimited JSON while they are being produced.
+
+    Rows are encoded as they come off the cursor and flushed every
+    `chunk_size` rows, so memory stays flat and the first bytes go out
+    as soon as the first chunk is ready.
+
+    Args:
+        rows (iterable): Dictionaries to encode, typically a generator over a
+                         yield_per query. It is consumed inside the request context.
+        chunk_size (int): Number of rows per written chunk.
+    """
+    def generate():
+        lines = []
+        try:
+            for row in rows:
+                lines.append(current_app.json.dumps(row))
+                if len(lines) >= chunk_size:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+            if lines:
+                yield '\n'.join(lines) + '\n'
+        except Exception as e:
+            # Headers are already sent, so the stream can only be cut short
+            logger.error(f"An error occurred while streaming: {str(e)}", exc_info=True)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def requested_fields(model):
+    """
+    Parse the optional `?fields=a,b,c` projection against the columns of `model`.
+
+    Returns:
+        list: The requested column names in order, or None to return all columns.
+
+    Raises:
+        ValueError: If a requested field is not a column of `model`.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    available = public_columns(model)
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Invalid fields: {', '.join(unknown)}. Available fields: {', '.join(available)}.")
+    return fields
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last returned row as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(current_app.json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = current_app.json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+def page_params(default_limit):
+    """
+    Read the keyset pagination parameters `limit` and `cursor`.
+
+    Returns:
+        tuple: (paginated, limit, cursor values or None). `paginated` is False
+               when neither parameter was given, so callers can keep their
+               unpaginated response shape.
+
+    Raises:
+        ValueError: If limit or cursor is invalid.
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    paginated = limit is not None or cursor is not None
+
+    if limit is None:
+        limit = default_limit
+    elif not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+        raise ValueError(f"Invalid limit. Use an integer between 1 and {MAX_PAGE_SIZE}.")
+
+    return paginated, int(limit), decode_cursor(cursor) if cursor else None
+
+
+def page_response(rows, next_cursor):
+    """
+    Return a page of rows with the cursor of the next page, or None on the last page.
+
+    JSON responses are wrapped as {"data": [...], "next_cursor": ...}; streamed
+    NDJSON pages carry the cursor in the X-Next-Cursor header.
+    """
+    if wants_stream():
+        response = ndjson_response(rows)
+    else:
+        response = jsonify({'data': list(rows), 'next_cursor': next_cursor})
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def conditional(validator):
+    """
+    Answer conditional GETs from a cheap validator before running the view.
+
+    `validator` receives the view arguments and returns (last_modified,
+    version token) describing the data the view would read. The ETag is
+    derived from the token and the request's full path and representation,
+    so If-None-Match / If-Modified-Since requests for unchanged data get a
+    304 without running the view's aggregation or serialization.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                last_modified, version = validator(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Could not compute the validator: {str(e)}", exc_info=True)
+                return view(*args, **kwargs)
+
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            representation = f"{version}|{request.full_path}|{wants_stream()}"
+            etag = hashlib.sha1(representation.encode('utf-8')).hexdigest()
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                # HTTP dates only have whole seconds
+                not_modified = (
+                    request.if_modified_since is not None and last_modified is not None and
+                    last_modified.replace(microsecond=0) <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
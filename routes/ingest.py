@@ -0,0 +1,95 @@
+from flask import Blueprint, current_app, jsonify, request
+from models.ingest import KINDS, IngestError, IngestLimitError, ingest
+from extensions import api_keys
+import logging
+import threading
+bp = Blueprint('ingest', __name__)
+
+# Set up a logger for error handling
+logger = logging.getLogger(__name__)
+
+# Ingestion slots of this worker, sized from INGEST_MAX_CONCURRENCY on first use
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def ingestion_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(current_app.config['INGEST_MAX_CONCURRENCY'])
+    return _slots
+
+
+@bp.route('/api/ingest/<kind>', methods=['POST'])
+def ingest_rows(kind):
+    """
+    Bulk upsert pool snapshots or transactions.
+
+    The body is read as a stream and written in committed batches of
+    INGEST_BATCH_SIZE rows, so memory stays bounded whatever the body size.
+    Rows are upserted on (pool_address, timestamp) for pools and on
+    (version, pool_address) for transactions, so a failed request can simply
+    be sent again.
+
+    Args:
+        kind (str): 'pools' or 'transactions'.
+
+    Query Parameters:
+        format (str): 'ndjson' (default) or 'csv' with a header row. Also taken from
+                      the Content-Type (application/x-ndjson or text/csv).
+
+    Headers:
+        X-API-Key: A key of a tier listed in INGEST_TIERS.
+
+    Returns:
+        JSON: The number of rows and batches written, the elapsed seconds and rows_per_second.
+
+    Raises:
+        400: If the kind, format or a record is invalid; batches before the bad record
+             stay committed and are reported under 'ingested'.
+        401: If no valid API key is sent.
+        403: If the key's tier may not ingest.
+        413: If the body has more than INGEST_MAX_ROWS rows.
+        503: If the worker is already running INGEST_MAX_CONCURRENCY ingestions; retry later.
+        500: If there's an internal server error.
+    """
+    key_hash, tier = api_keys.current()
+    if key_hash is None:
+        return jsonify({"error": "A valid API key is required."}), 401
+    if tier not in current_app.config['INGEST_TIERS']:
+        return jsonify({"error": "This API key may not ingest data."}), 403
+
+    if kind not in KINDS:
+        return jsonify({"error": f"Invalid kind. Use one of: {', '.join(KINDS)}."}), 400
+
+    format = request.args.get('format')
+    if format is None:
+        format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if format not in ('ndjson', 'csv'):
+        return jsonify({"error": "Invalid format. Use 'ndjson' or 'csv'."}), 400
+
+    # Backpressure: turn requests away instead of queueing them on the database
+    slots = ingestion_slots()
+    if not slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many concurrent ingestions, retry later."})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    try:
+        lines = (line.decode('utf-8') for line in request.stream)
+        summary = ingest(kind, lines, format=format, max_rows=current_app.config['INGEST_MAX_ROWS'])
+        return jsonify(summary)
+
+    except IngestLimitError as e:
+        return jsonify({"error": str(e), "ingested": e.summary}), 413
+
+    except IngestError as e:
+        return jsonify({"error": str(e), "ingested": e.summary}), 400
+
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
+
+    finally:
+        slots.release()
@@ -1,15 +1,153 @@
 from flask import Blueprint, jsonify, request
 from models.aptos_pool import AptosPool
-from extensions import db
+from models.aptos_pool_latest import AptosPoolLatest, latest_snapshot_version
+from models.aptos_pool_compacted import AptosPoolHistory, pool_history
+from extensions import db, cache, db_router
+from models.serializer import RowSerializer
+from models.functions import time_bucket
+from aggregates import lttb_indices
+from routes.helpers import wants_stream, ndjson_response, requested_fields, page_params, page_response, encode_cursor, conditional
 import logging
 bp = Blueprint('pools', __name__)
-from sqlalchemy import func, Integer, Float, and_ 
+from sqlalchemy import func, and_, or_, cast, case, tuple_
+from decimal import Decimal
 from datetime import datetime, timedelta, timezone
 
 # Set up a logger for error handling
 logger = logging.getLogger(__name__)
 
+# Lookback of the history `range` parameter
+HISTORY_RANGES = {'day': timedelta(days=1), 'week': timedelta(weeks=1), 'month': timedelta(days=30)}
+
+# Bucket widths accepted by the history `resolution` parameter, in seconds
+HISTORY_RESOLUTIONS = {'5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+
+# Numeric snapshot columns, aggregated per bucket and usable for downsampling
+HISTORY_METRICS = [
+    column.name for column in AptosPool.__table__.columns
+    if isinstance(column.type, db.Numeric)
+]
+
+# Upper bound of the addresses of one /api/pools/batch request
+MAX_BATCH_ADDRESSES = 200
+
+
+def bucketed_history(serializer, pool_address, start_date, seconds):
+    """
+    Aggregate a pool's snapshots into fixed time buckets in SQL.
+
+    Each bucket carries the values of its last snapshot (projected by
+    `serializer`), its start as `timestamp`, the number of `samples`, and
+    `<metric>_avg` / `<metric>_max` for every projected numeric column.
+    Raw and compacted snapshots are aggregated alike: compacted rows count
+    with the number of snapshots they stand for.
+
+    Yields:
+        dict: One entry per bucket, oldest first.
+    """
+    for _, item in bucketed_histories(serializer, [pool_address], start_date, seconds):
+        yield item
+
+
+def bucketed_histories(serializer, pool_addresses, start_date, seconds):
+    """
+    Aggregate the snapshots of several pools into time buckets with one query.
+
+    Yields:
+        tuple: (pool_address, bucket dict as in bucketed_history), grouped by
+               pool and oldest first within a pool.
+    """
+    history = pool_history.c
+    bucket_start = time_bucket(seconds, history.timestamp)
+    metrics = [name for name in serializer.fields if name in HISTORY_METRICS]
+
+    def average(name):
+        # Weighted by samples; NULL values carry no weight, like avg()
+        column = history[f'{name}_avg']
+        return func.sum(column * history.samples) / func.sum(case((column.isnot(None), history.samples)))
+
+    buckets = db.session.query(
+        history.pool_address.label('pool_address'),
+        bucket_start.label('bucket_start'),
+        func.max(history.timestamp).label('last_timestamp'),
+        func.sum(history.samples).label('samples'),
+        *[cast(average(name), db.Float).label(f'{name}_avg') for name in metrics],
+        *[cast(func.max(history[f'{name}_max']), db.Float).label(f'{name}_max') for name in metrics]
+    ).filter(
+        history.pool_address.in_(pool_addresses),
+        history.timestamp >= start_date
+    ).group_by(history.pool_address, bucket_start).subquery()
+
+    aggregates = [buckets.c.samples]
+    aggregates += [buckets.c[f'{name}_avg'] for name in metrics]
+    aggregates += [buckets.c[f'{name}_max'] for name in metrics]
+
+    # Join back to the last snapshot of every bucket for the "last" values
+    query = db.session.query(buckets.c.pool_address, buckets.c.bucket_start, *aggregates, *serializer.columns).join(
+        AptosPoolHistory,
+        and_(
+            AptosPoolHistory.pool_address == buckets.c.pool_address,
+            AptosPoolHistory.timestamp == buckets.c.last_timestamp
+        )
+    ).filter(
+        # Repeated so they are pushed into every branch of the history union
+        AptosPoolHistory.pool_address.in_(pool_addresses),
+        AptosPoolHistory.timestamp >= start_date
+    ).order_by(buckets.c.pool_address.asc(), buckets.c.bucket_start.asc())
+
+    previous_bucket = None
+    for row in query.yield_per(100):
+        # Two snapshots sharing the last timestamp would repeat the bucket
+        if row[:2] == previous_bucket:
+            continue
+        previous_bucket = row[:2]
+
+        item = serializer.to_dict(row[2 + len(aggregates):])
+        item['timestamp'] = row[1].isoformat()
+        item['samples'] = row[2]
+        for column, value in zip(aggregates[1:], row[3:2 + len(aggregates)]):
+            item[column.name] = value or 0.0
+        yield row[0], item
+
+
+def history_page(serializer, pool_address, start_date, limit, cursor):
+    """
+    Return one keyset page of raw history ordered by (timestamp, id).
+
+    The cursor holds the (timestamp, id) of the last row returned, so every
+    page is a bounded index range scan no matter how deep it is.
+    """
+    query = db.session.query(AptosPoolHistory.timestamp, AptosPoolHistory.id, *serializer.columns).filter(
+        AptosPoolHistory.pool_address == pool_address,
+        AptosPoolHistory.timestamp >= start_date
+    )
+    if cursor is not None:
+        try:
+            after = (datetime.fromisoformat(cursor[0]), int(cursor[1]))
+        except (IndexError, TypeError, ValueError):
+            return jsonify({"error": "Invalid cursor."}), 400
+        query = query.filter(tuple_(AptosPoolHistory.timestamp, AptosPoolHistory.id) > after)
+
+    rows = query.order_by(AptosPoolHistory.timestamp.asc(), AptosPoolHistory.id.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][0].isoformat(), rows[-1][1]])
+
+    return page_response((serializer.to_dict(row[2:]) for row in rows), next_cursor)
+
+
+def downsample(history, metric, points):
+    """Keep `points` entries of `history` chosen by LTTB on the `metric` series."""
+    history = list(history)
+    x = [datetime.fromisoformat(item['timestamp']).replace(tzinfo=timezone.utc).timestamp() for item in history]
+    y = [item[metric] for item in history]
+    return [history[index] for index in lttb_indices(x, y, points)]
+
 @bp.route('/api/pool/<pool_address>/current')
+@conditional(lambda pool_address: latest_snapshot_version(pool_address=pool_address))
+@cache.cached(ttl=15)
 def get_pool(pool_address):
     """
     Retrieve the current data for a specific pool.
@@ -17,64 +155,170 @@ def get_pool(pool_address):
     Args:
         pool_address (str): The address of the pool to retrieve.
 
+    Query Parameters:
+        fields (str): Optional comma-separated list of columns to return.
+
     Returns:
         JSON: A dictionary containing the pool's current data.
 
     Raises:
+        400: If an unknown field is requested.
         404: If the pool is not found.
         500: If there's an internal server error.
     """
     try:
-        # Query to get the latest entry for the given pool_address
-        pool = db.session.query(AptosPool).filter_by(pool_address=pool_address).order_by(AptosPool.timestamp.desc()).first_or_404()
+        try:
+            serializer = RowSerializer.for_model(AptosPoolLatest, requested_fields(AptosPoolLatest))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Latest snapshot of the pool, maintained in aptos_pools_latest
+        pool = db.session.query(*serializer.columns).filter(
+            AptosPoolLatest.pool_address == pool_address
+        ).first()
+
+        if pool is None:
+            return jsonify({'error': 'Pool not found'}), 404
 
-        # Convert the pool object to a dictionary and replace None values accordingly
-        pool_dict = {
-            key: (0 if value is None and isinstance(pool.__table__.c[key].type, (Integer, Float)) else value or '')
-            for key, value in pool.to_dict().items()
-        }
+        # This endpoint has always returned '' for empty and zero values
+        pool_dict = {key: value or '' for key, value in serializer.to_dict(pool).items()}
 
         return jsonify(pool_dict)
     
     except Exception as e:
-        print(f"Error occurred: {str(e)}")
+        logger.error(f"An error occurred while retrieving pool {pool_address}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred while processing the request'}), 500
 
 @bp.route('/api/pools')
+@conditional(lambda: latest_snapshot_version())
+@cache.cached(ttl=15)
 def get_current_pools():
     """
     Retrieve the current data for all pools.
 
+    Query Parameters:
+        stream (str): Set to '1' to stream the rows as NDJSON (same as sending
+                      'Accept: application/x-ndjson').
+        fields (str): Optional comma-separated list of columns to return.
+
     Returns:
-        JSON: A list of dictionaries, each containing a pool's current data.
+        JSON: A list of dictionaries, each containing a pool's current data,
+              or one JSON object per line when streaming.
 
     Raises:
+        400: If an unknown field is requested.
         500: If there's an internal server error.
     """
     try:
-        # Subquery to get the latest timestamp for each pool
-        latest_timestamps = db.session.query(
-            AptosPool.pool_address,
-            func.max(AptosPool.timestamp).label('max_timestamp')
-        ).group_by(AptosPool.pool_address).subquery()
-
-        # Main query to get the latest data for each pool
-        query = db.session.query(AptosPool).join(
-            latest_timestamps,
-            (AptosPool.pool_address == latest_timestamps.c.pool_address) &
-            (AptosPool.timestamp == latest_timestamps.c.max_timestamp)
-        )
+        try:
+            serializer = RowSerializer.for_model(AptosPoolLatest, requested_fields(AptosPoolLatest))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Latest snapshot of every pool, maintained in aptos_pools_latest
+        query = db.session.query(*serializer.columns)
 
         # Use yield_per for memory efficiency
         pools = query.yield_per(100)
 
-        # Optimize result formatting
-        result = [
-            {key: (0 if value is None and isinstance(pool.__table__.c[key].type, (db.Integer, db.Float)) 
-                   else ('' if value is None else value))
-             for key, value in pool.to_dict().items()}
-            for pool in pools
-        ]
+        # Format plain rows with the precompiled serializer
+        result = (serializer.to_dict(pool) for pool in pools)
+
+        # Stream rows straight off the cursor if requested
+        if wants_stream():
+            return ndjson_response(result)
+
+        return jsonify(list(result))
+
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
+
+
+@bp.route('/api/pools/batch', methods=['POST'])
+@db_router.read_only
+def get_pools_batch():
+    """
+    Retrieve the current data, and optionally the history, of many pools at once.
+
+    The whole batch is answered with a constant number of queries: one IN (...)
+    lookup in aptos_pools_latest, plus one set-based history query if a range
+    is requested.
+
+    Request Body (JSON):
+        addresses (list): Pool addresses, at most 200.
+        fields (list): Optional columns to return for every snapshot.
+        range (str): Optional history range, 'day', 'week' or 'month'. Without it
+                     only the current data is returned.
+        resolution (str): Optional bucket width of the history ('5m', '15m', '1h',
+                          '4h' or '1d'), aggregated as in /api/pool/<pool_address>/history.
+
+    Returns:
+        JSON: A dictionary keyed by pool address, each with the pool's 'current' data
+              (null for unknown pools) and, if a range was given, its 'history'.
+
+    Raises:
+        400: If the body, an address, field, range or resolution is invalid.
+        500: If there's an internal server error.
+    """
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "Send a JSON object with an 'addresses' list."}), 400
+
+        addresses = body.get('addresses')
+        if (not isinstance(addresses, list) or not addresses or
+                not all(isinstance(address, str) and address for address in addresses)):
+            return jsonify({"error": "addresses must be a non-empty list of pool addresses."}), 400
+        # Keep the request order, drop repeats
+        addresses = list(dict.fromkeys(addresses))
+        if len(addresses) > MAX_BATCH_ADDRESSES:
+            return jsonify({"error": f"At most {MAX_BATCH_ADDRESSES} addresses per request."}), 400
+
+        fields = body.get('fields')
+        if fields is not None:
+            if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+                return jsonify({"error": "fields must be a list of column names."}), 400
+            unknown = [field for field in fields if field not in AptosPool.__table__.c]
+            if unknown:
+                return jsonify({"error": f"Invalid fields: {', '.join(unknown)}. Available fields: {', '.join(AptosPool.__table__.c.keys())}."}), 400
+
+        time_range = body.get('range')
+        resolution = body.get('resolution')
+        if time_range is not None and time_range not in HISTORY_RANGES:
+            return jsonify({"error": "Invalid time range. Use 'day', 'week', or 'month'."}), 400
+        if resolution is not None:
+            if time_range is None:
+                return jsonify({"error": "resolution requires a range."}), 400
+            if resolution not in HISTORY_RESOLUTIONS:
+                return jsonify({"error": f"Invalid resolution. Use one of: {', '.join(HISTORY_RESOLUTIONS)}."}), 400
+
+        # pool_address is selected separately to key the rows
+        current_serializer = RowSerializer.for_model(AptosPoolLatest, fields)
+        current = db.session.query(AptosPoolLatest.pool_address, *current_serializer.columns).filter(
+            AptosPoolLatest.pool_address.in_(addresses)
+        )
+        result = {address: {'current': None} for address in addresses}
+        for row in current:
+            result[row[0]]['current'] = current_serializer.to_dict(row[1:])
+
+        if time_range is not None:
+            for address in addresses:
+                result[address]['history'] = []
+            start_date = datetime.now(timezone.utc) - HISTORY_RANGES[time_range]
+            serializer = RowSerializer.for_model(AptosPoolHistory, fields)
+
+            if resolution is not None:
+                history = bucketed_histories(serializer, addresses, start_date, HISTORY_RESOLUTIONS[resolution])
+            else:
+                rows = db.session.query(AptosPoolHistory.pool_address, *serializer.columns).filter(
+                    AptosPoolHistory.pool_address.in_(addresses),
+                    AptosPoolHistory.timestamp >= start_date
+                ).order_by(AptosPoolHistory.pool_address.asc(), AptosPoolHistory.timestamp.asc()).yield_per(1000)
+                history = ((row[0], serializer.to_dict(row[1:])) for row in rows)
+
+            for address, item in history:
+                result[address]['history'].append(item)
 
         return jsonify(result)
 
@@ -84,6 +328,7 @@ def get_current_pools():
 
 
 @bp.route('/api/pool/<pool_address>/history')
+@cache.cached(ttl=60)
 def get_pool_history(pool_address):
     """
     Retrieve historical data for a specific pool.
@@ -93,49 +338,89 @@ def get_pool_history(pool_address):
 
     Query Parameters:
         range (str): The time range for the history. Can be 'day', 'week', or 'month'.
+        stream (str): Set to '1' to stream the rows as NDJSON (same as sending
+                      'Accept: application/x-ndjson').
+        fields (str): Optional comma-separated list of columns to return.
+        resolution (str): Optional bucket width ('5m', '15m', '1h', '4h' or '1d'). Snapshots
+                          are aggregated per bucket into the last values plus
+                          '<metric>_avg' and '<metric>_max' and a 'samples' count.
+        points (int): Optional maximum number of points to return, chosen with
+                      Largest-Triangle-Three-Buckets downsampling of the `metric` series.
+        metric (str): The numeric column `points` preserves the shape of. Defaults to 'tvl'.
+        limit (int): Page size for keyset pagination over raw snapshots (at most 1000).
+        cursor (str): The `next_cursor` of the previous page.
 
     Returns:
-        JSON: A list of dictionaries, each containing the pool's data at a specific timestamp.
+        JSON: A list of dictionaries, each containing the pool's data at a specific timestamp,
+              or one JSON object per line when streaming. With `limit` or `cursor`, a dictionary
+              with the page under 'data' and the cursor of the next page under 'next_cursor'.
 
     Raises:
-        400: If an invalid time range is provided.
+        400: If an invalid time range, field, resolution, points, metric, limit or cursor is provided.
         500: If there's an internal server error.
     """
     try:
         # Get the time range parameter
         time_range = request.args.get('range', '1day')
-        
+
         # Calculate the start date based on the time range
-        now = datetime.now(timezone.utc)
-        if time_range == 'day':
-            start_date = now - timedelta(days=1)
-        elif time_range == 'week':
-            start_date = now - timedelta(weeks=1)
-        elif time_range == 'month':
-            start_date = now - timedelta(days=30)
-        else:
+        if time_range not in HISTORY_RANGES:
             return jsonify({"error": "Invalid time range. Use 'day', 'week', or 'month'."}), 400
+        start_date = datetime.now(timezone.utc) - HISTORY_RANGES[time_range]
+
+        resolution = request.args.get('resolution')
+        if resolution is not None and resolution not in HISTORY_RESOLUTIONS:
+            return jsonify({"error": f"Invalid resolution. Use one of: {', '.join(HISTORY_RESOLUTIONS)}."}), 400
+
+        points = request.args.get('points')
+        metric = request.args.get('metric', 'tvl')
+        if points is not None:
+            if not points.isdigit() or int(points) < 2:
+                return jsonify({"error": "Invalid points. Use an integer of at least 2."}), 400
+            if metric not in HISTORY_METRICS:
+                return jsonify({"error": f"Invalid metric. Use one of: {', '.join(HISTORY_METRICS)}."}), 400
+
+        try:
+            fields = requested_fields(AptosPool)
+            paginated, limit, cursor = page_params(default_limit=100)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if paginated and (resolution is not None or points is not None):
+            return jsonify({"error": "limit and cursor cannot be combined with resolution or points."}), 400
+
+        # Downsampling needs the x and y series even if they were not requested
+        if points is not None and fields is not None:
+            fields += [name for name in ('timestamp', metric) if name not in fields]
+        # Raw snapshots, stitched with the hourly and daily rows they were compacted into
+        serializer = RowSerializer.for_model(AptosPoolHistory, fields)
+
+        if paginated:
+            return history_page(serializer, pool_address, start_date, limit, cursor)
+
+        if resolution is not None:
+            result = bucketed_history(serializer, pool_address, start_date, HISTORY_RESOLUTIONS[resolution])
+        else:
+            # Query to get historical data for the specified pool
+            query = db.session.query(*serializer.columns).filter(
+                AptosPoolHistory.pool_address == pool_address,
+                AptosPoolHistory.timestamp >= start_date
+            ).order_by(AptosPoolHistory.timestamp.asc())
 
-        # Query to get historical data for the specified pool
-        query = db.session.query(AptosPool).filter(
-            AptosPool.pool_address == pool_address,
-            AptosPool.timestamp >= start_date
-        ).order_by(AptosPool.timestamp.asc())
+            # Use yield_per for memory efficiency
+            pool_history = query.yield_per(100)
 
-        # Use yield_per for memory efficiency
-        pool_history = query.yield_per(100)
-
-        # Format the result
-        result = []
-        for pool in pool_history:
-            pool_dict = {
-                key: (0 if value is None and isinstance(pool.__table__.c[key].type, (db.Integer, db.Float)) 
-                      else ('' if value is None else value))
-                for key, value in pool.to_dict().items()
-            }
-            result.append(pool_dict)
+            # Format plain rows with the precompiled serializer
+            result = (serializer.to_dict(pool) for pool in pool_history)
 
-        return jsonify(result)
+        if points is not None:
+            result = downsample(result, metric, int(points))
+
+        # Stream rows straight off the cursor if requested
+        if wants_stream():
+            return ndjson_response(result)
+
+        return jsonify(list(result))
 
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
@@ -143,6 +428,7 @@ def get_pool_history(pool_address):
 
 
 @bp.route('/top', methods=['GET'])
+@cache.cached(ttl=30)
 def get_top_pools():
     """
     Get the top 10 pools based on TVL, volume, or fees, optionally filtered by provider.
@@ -150,12 +436,17 @@ def get_top_pools():
     Query Parameters:
         metric (str): The metric to sort by. Can be 'tvl', 'volume_day', or 'fees_day'. Defaults to 'tvl'.
         provider (str): The provider to filter by. If not provided, no filtering is applied.
+        fields (str): Optional comma-separated list of columns to return.
+        limit (int): Number of pools per page (at most 1000). Defaults to 10.
+        cursor (str): The `next_cursor` of the previous page.
 
     Returns:
-        JSON: A list of dictionaries, each containing the pool's data.
+        JSON: A list of dictionaries, each containing the pool's data. With `limit` or
+              `cursor`, a dictionary with the page under 'data' and the cursor of the
+              next page under 'next_cursor'.
 
     Raises:
-        400: If an invalid metric is provided.
+        400: If an invalid metric, field, limit or cursor is provided.
         500: If there's an internal server error.
     """
     try:
@@ -167,42 +458,52 @@ def get_top_pools():
 
         # Map the metric to the corresponding database column
         metric_column = {
-            'tvl': AptosPool.tvl,
-            'volume_day': AptosPool.volume_day,
-            'fees_day': AptosPool.fees_day
+            'tvl': AptosPoolLatest.tvl,
+            'volume_day': AptosPoolLatest.volume_day,
+            'fees_day': AptosPoolLatest.fees_day
         }[metric]
 
-        # Query to get the latest data for each pool, sorted by the specified metric
-        subquery = db.session.query(
-            AptosPool.pool_address,
-            func.max(AptosPool.timestamp).label('max_timestamp')
-        ).group_by(AptosPool.pool_address).subquery()
-
-        query = db.session.query(AptosPool).join(
-            subquery,
-            and_(
-                AptosPool.pool_address == subquery.c.pool_address,
-                AptosPool.timestamp == subquery.c.max_timestamp
-            )
-        )
+        try:
+            serializer = RowSerializer.for_model(AptosPoolLatest, requested_fields(AptosPoolLatest))
+            paginated, limit, cursor = page_params(default_limit=10)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Query the latest data for each pool, sorted by the specified metric
+        query = db.session.query(metric_column, AptosPoolLatest.pool_address, *serializer.columns)
 
         # Apply provider filter if provided
         if provider:
-            query = query.filter(AptosPool.provider == provider)
-
-        query = query.order_by(metric_column.desc()).limit(10)
+            query = query.filter(AptosPoolLatest.provider == provider)
+
+        # Continue after the (metric value, pool_address) of the previous page
+        if cursor is not None:
+            try:
+                cursor_metric, value, after_address = cursor
+                value = Decimal(value)
+            except (TypeError, ValueError, ArithmeticError):
+                return jsonify({"error": "Invalid cursor."}), 400
+            if cursor_metric != metric:
+                return jsonify({"error": "Cursor was issued for a different metric."}), 400
+            query = query.filter(or_(
+                metric_column < value,
+                and_(metric_column == value, AptosPoolLatest.pool_address > after_address)
+            ))
+
+        query = query.order_by(metric_column.desc(), AptosPoolLatest.pool_address.asc()).limit(limit + 1)
 
         top_pools = query.all()
 
-        # Format the result
-        result = []
-        for pool in top_pools:
-            pool_dict = {
-                key: (0 if value is None and isinstance(pool.__table__.c[key].type, (db.Integer, db.Float)) 
-                      else ('' if value is None else value))
-                for key, value in pool.to_dict().items()
-            }
-            result.append(pool_dict)
+        next_cursor = None
+        if len(top_pools) > limit:
+            top_pools = top_pools[:limit]
+            next_cursor = encode_cursor([metric, str(top_pools[-1][0]), top_pools[-1][1]])
+
+        # Format plain rows with the precompiled serializer
+        result = [serializer.to_dict(pool[2:]) for pool in top_pools]
+
+        if paginated:
+            return page_response(result, next_cursor)
 
         return jsonify(result)
 
@@ -1,7 +1,8 @@
 from flask import Blueprint, jsonify
-from models.aptos_pool import AptosPool
-from sqlalchemy import func
-from extensions import db
+from models.aptos_pool_latest import latest_snapshot_version
+from models.provider_rollup import provider_rollups
+from routes.helpers import conditional
+from extensions import cache
 import logging
 from datetime import datetime, timezone
 bp = Blueprint('providers', __name__)
@@ -11,12 +12,16 @@ logger = logging.getLogger(__name__)
 
 @bp.route('/api/providers')
 @bp.route('/api/providers/<provider_name>')
+@conditional(lambda provider_name=None: latest_snapshot_version(provider=provider_name))
+@cache.cached(ttl=30)
 def get_providers(provider_name=None):
     """
     Retrieve provider information from the AptosPool database.
 
-    This function queries the AptosPool database to get the latest data for each pool,
-    aggregates the data by provider, and returns summary statistics for each provider.
+    This function returns summary statistics for each provider over the latest
+    data of each pool (aptos_pools_latest). The per-provider totals are kept in
+    memory by models.provider_rollup and updated with only the pools whose
+    latest snapshot changed, so a request costs O(number of providers).
 
     Args:
         provider_name (str, optional): If provided, filters the results to show data
@@ -40,72 +45,19 @@ def get_providers(provider_name=None):
         - avg_slippage_30d: Average slippage for the provider in the last month
 
     Raises:
-        500 Internal Server Error: If an exception occurs during the database query
-                                   or data processing.
+        500 Internal Server Error: If an exception occurs while updating the rollups
+                                   or processing the data.
     """
     try:
-        # Subquery to get the latest timestamp for each pool
-        latest_timestamps = db.session.query(
-            AptosPool.pool_address,
-            func.max(AptosPool.timestamp).label('max_timestamp')
-        ).group_by(AptosPool.pool_address).subquery()
-
-        # Main query to get the latest data for each pool and aggregate by provider
-        query = db.session.query(
-            AptosPool.provider,
-            func.sum(AptosPool.tvl).label('total_tvl'),
-            func.sum(AptosPool.volume_day).label('total_volume_1d'),
-            func.sum(AptosPool.volume_week).label('total_volume_7d'),
-            func.sum(AptosPool.volume_month).label('total_volume_30d'),
-            func.avg(AptosPool.fees_day).label('avg_fees_1d'),
-            func.avg(AptosPool.fees_week).label('avg_fees_7d'),
-            func.avg(AptosPool.fees_month).label('avg_fees_30d'),
-            func.count(AptosPool.pool_address).label('total_pools'),
-            (func.sum(AptosPool.tvl) / func.count(AptosPool.pool_address)).label('avg_tvl_per_pool'),
-            func.avg(AptosPool.median_slippage_1d).label('avg_slippage_1d'),
-            func.avg(AptosPool.median_slippage_7d).label('avg_slippage_7d'),
-            func.avg(AptosPool.median_slippage_30d).label('avg_slippage_30d')
-        ).join( 
-            latest_timestamps,
-            (AptosPool.pool_address == latest_timestamps.c.pool_address) &
-            (AptosPool.timestamp == latest_timestamps.c.max_timestamp)
-        )
-
-        # Apply the provider_name filter directly in the query if provided
-        if provider_name:
-            query = query.filter(AptosPool.provider == provider_name)
-
-        # Group by provider after filtering
-        query = query.group_by(AptosPool.provider)
-
-        # Use yield_per to optimize memory usage for large datasets
-        providers = query.yield_per(100).all()
-
-        # Get current UTC timestamp
-        current_timestamp = datetime.now(timezone.utc).isoformat()
-
-        # Format the result, handle None values by replacing them with 0
+        # Per-provider totals are maintained incrementally, so this only folds
+        # in the pools that changed since the last read
         result = {
-            'timestamp': current_timestamp,
-            'providers': [{
-                'provider': provider,
-                'total_tvl': round(float(total_tvl or 0), 2),
-                'total_volume_1d': round(float(total_volume_1d or 0), 2),
-                'total_volume_7d': round(float(total_volume_7d or 0), 2),
-                'total_volume_30d': round(float(total_volume_30d or 0), 2),
-                'avg_fees_1d': round(float(avg_fees_1d or 0), 2),
-                'avg_fees_7d': round(float(avg_fees_7d or 0), 2),
-                'avg_fees_30d': round(float(avg_fees_30d or 0), 2),
-                'total_pools': total_pools,
-                'avg_tvl_per_pool': round(float(avg_tvl_per_pool or 0), 2),
-                'avg_slippage_1d': round(float(avg_slippage_1d or 0), 2),
-                'avg_slippage_7d': round(float(avg_slippage_7d or 0), 2),
-                'avg_slippage_30d': round(float(avg_slippage_30d or 0), 2)
-            } for provider, total_tvl, total_volume_1d, total_volume_7d, total_volume_30d, avg_fees_1d, avg_fees_7d, avg_fees_30d, total_pools, avg_tvl_per_pool, avg_slippage_1d, avg_slippage_7d, avg_slippage_30d in providers]
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'providers': provider_rollups.providers(provider_name)
         }
 
         return jsonify(result)
-    
+
     except Exception as e:
         # Log the error for better debugging
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
@@ -1,29 +1,67 @@
-from flask import Blueprint, jsonify, request
-from models.aptos_transactions import AptosTransactions
-from extensions import db
+from flask import Blueprint, jsonify, request, current_app
+from models.slippage_rollup import SlippageRollup, RESOLUTIONS, normalize_pair, bucket_floor, partial_bucket, current_bucket
+from models.slippage_sketch import slippage_percentiles
+from extensions import db, cache
+from sqlalchemy import type_coerce
 import logging
 bp = Blueprint('slippage', __name__)
-from sqlalchemy import func, Integer, Float, and_ 
 from datetime import datetime, timedelta, timezone
-from statistics import median  # Import the median functio
 # Set up a logger for error handling
 logger = logging.getLogger(__name__)
 
+# Lookback of the percentiles `range` parameter
+PERCENTILE_RANGES = {
+    'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1), 'month': timedelta(days=30)
+}
+
+
+def parse_pair(pair):
+    """
+    Resolve a pair such as 'apt-usdc' to its normalized (coin_a, coin_b) key.
+
+    Each side is either a short name from TOKEN_ALIASES or a full coin type.
+
+    Returns:
+        tuple: The normalized pair, or None if the pair is malformed.
+    """
+    coins = pair.split('-')
+    if len(coins) != 2 or not all(coins):
+        return None
+    aliases = current_app.config['TOKEN_ALIASES']
+    coin1, coin2 = (aliases.get(coin.lower(), coin) for coin in coins)
+    return normalize_pair(coin1, coin2)
 
 
 @bp.route('/api/slippage', methods=['GET'])
+@cache.cached(ttl=60)
 def get_slippage():
     """
-    Retrieve slippage values for the Aptos/USDC pair from the aptos_transactions table with time binning.
+    Retrieve binned median slippage for a token pair from the slippage rollups.
 
     Query Parameters:
+        pair (str): The token pair as '<coin>-<coin>', where each coin is a short name
+                    (e.g. 'apt', 'usdc') or a full coin type. Defaults to 'apt-usdc'.
         range (str): The time range for the query. Can be 'hour', 'week', or 'month'.
                      Defaults to 'hour' if not provided or invalid.
+        resolution (str): Optional bin width, '1m', '5m' or '30m'. Defaults to 5-minute
+                          bins for 'hour' and 'week' and 30-minute bins for 'month'.
 
     Returns:
-        JSON: A dictionary with the pair ('apt-usdc') and binned slippage data.
+        JSON: A dictionary with the pair and binned slippage data. As before the rollups,
+              the first bin is labelled with the start of the bucket containing the range
+              start but only covers the trades from the range start on, and the last bin
+              covers the trades of the current bucket so far.
+
+    Raises:
+        400: If the pair or resolution is invalid.
+        500: If there's an internal server error.
     """
     try:
+        pair = request.args.get('pair', 'apt-usdc')
+        coins = parse_pair(pair)
+        if coins is None:
+            return jsonify({"error": "Invalid pair. Use '<coin>-<coin>', e.g. 'apt-usdc'."}), 400
+
         # Get and validate the 'range' parameter, default to 'hour' if invalid
         time_range = request.args.get('range', 'hour').lower()
         if time_range not in ['hour', 'week', 'month']:
@@ -33,63 +71,143 @@ def get_slippage():
         now = datetime.now(timezone.utc)
         if time_range == 'hour':
             start_time = now - timedelta(hours=1)
-            bin_interval = 5  # 5-minute bins
+            resolution = '5m'  # 5-minute bins
         elif time_range == 'week':
             start_time = now - timedelta(weeks=1)
-            bin_interval = 5  # 5-minute bins
+            resolution = '5m'  # 5-minute bins
         elif time_range == 'month':
             start_time = now - timedelta(days=30)
-            bin_interval = 30  # 30-minute bins
-
-        # Define the token pair condition
-        token_condition = db.or_(
-            db.and_(
-                AptosTransactions.coin1 == '0x1::aptos_coin::AptosCoin',
-                AptosTransactions.coin2 == '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::USDC'
-            ),
-            db.and_(
-                AptosTransactions.coin1 == '0xf22bede237a07e121b56d91a491eb7bcdfd1f5907926a9e58338f964a01b17fa::asset::USDC',
-                AptosTransactions.coin2 == '0x1::aptos_coin::AptosCoin'
-            )
-        )
+            resolution = '30m'  # 30-minute bins
+
+        resolution = request.args.get('resolution', resolution).lower()
+        if resolution not in RESOLUTIONS:
+            return jsonify({"error": "Invalid resolution. Use '1m', '5m', or '30m'."}), 400
+
+        # The bin containing start_time only counts the trades from start_time on,
+        # and the open bin at now is still filling, so both come from
+        # aptos_transactions; the whole bins between them are precomputed
+        open_start = bucket_floor(resolution, now)
+        bins = []
+        first = partial_bucket(resolution, coins, start_time)
+        if first is not None and first['slippage_median'] is not None:
+            bins.append((first['bucket_start'], first['slippage_median']))
 
-        # Query to get transactions within the specified range
-        query = db.session.query(
-            AptosTransactions.timestamp,
-            AptosTransactions.slippage
+        # Read the medians as floats: Numeric rounds to 10 decimals on SQLite, which
+        # can tip the 8-decimal rounding below
+        bins += db.session.query(
+            SlippageRollup.bucket_start,
+            type_coerce(SlippageRollup.slippage_median, db.Float)
         ).filter(
-            AptosTransactions.timestamp >= start_time,
-            token_condition
-        )
+            SlippageRollup.resolution == resolution,
+            SlippageRollup.coin_a == coins[0],
+            SlippageRollup.coin_b == coins[1],
+            SlippageRollup.bucket_start >= start_time,
+            SlippageRollup.bucket_start < open_start,
+            SlippageRollup.slippage_median.isnot(None)
+        ).order_by(SlippageRollup.bucket_start.asc()).all()
+
+        last = current_bucket(resolution, coins, now)
+        if last is not None and last['slippage_median'] is not None:
+            bins.append((last['bucket_start'], last['slippage_median']))
 
-        # Fetch results and apply binning
-        transactions = query.order_by(AptosTransactions.timestamp.asc()).all()
-
-        # Group transactions into bins
-        bins = {}
-        for txn in transactions:
-            # Calculate the bin key (start of the interval)
-            bin_start = txn.timestamp.replace(
-                minute=(txn.timestamp.minute // bin_interval) * bin_interval,
-                second=0,
-                microsecond=0
-            )
-            if bin_start not in bins:
-                bins[bin_start] = []
-            bins[bin_start].append(txn.slippage)
-
-        # Calculate the median slippage for each bin
         binned_data = [
             {
-                "timestamp": bin_start.isoformat(),
-                "slippage": round(float(median(bins[bin_start])), 8)  # Round for readability
+                "timestamp": bucket_start.isoformat(),
+                "slippage": round(float(slippage_median), 8)  # Round for readability
             }
-            for bin_start in sorted(bins.keys())
+            for bucket_start, slippage_median in bins
         ]
 
         # Return the response with the pair and binned data
-        return jsonify({"pair": "apt-usdc", "data": binned_data})
+        return jsonify({"pair": pair, "data": binned_data})
 
     except Exception as e:
         logger.error(f"An error occurred while retrieving slippage data: {str(e)}", exc_info=True)
         return jsonify({"error": "An error occurred while processing the request"}), 500
+
+
+def parse_time(value):
+    """Parse an ISO 8601 timestamp (naive means UTC) or epoch seconds; None if malformed."""
+    try:
+        if value.replace('.', '', 1).isdigit():
+            return datetime.fromtimestamp(float(value), tz=timezone.utc)
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except (ValueError, OverflowError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@bp.route('/api/slippage/percentiles', methods=['GET'])
+@cache.cached(ttl=60)
+def get_slippage_percentiles():
+    """
+    Estimate slippage percentiles of a token pair or a pool over any window.
+
+    Answered from per-pool t-digest sketches: the window is widened to whole
+    minutes and covered with the fewest daily, hourly and minute sketches,
+    which are merged. See benchmarks/sketch_accuracy.py for the error bounds.
+
+    Query Parameters:
+        pair (str): The token pair as '<coin>-<coin>', as in /api/slippage. Defaults to 'apt-usdc'.
+        pool (str): A pool address; takes precedence over `pair`.
+        range (str): 'hour', 'day', 'week' or 'month' before `end`. Defaults to 'day'.
+        start (str): Optional window start (ISO 8601 or epoch seconds); overrides `range`.
+        end (str): Optional window end (ISO 8601 or epoch seconds). Defaults to now.
+        q (str): Comma-separated percentiles between 0 and 100. Defaults to '50,90,99'.
+
+    Returns:
+        JSON: The window, the transaction count, the min and max slippage and
+              the estimated percentiles keyed 'p<percentile>', e.g. 'p99.9'.
+
+    Raises:
+        400: If the pair, range, start, end or a percentile is invalid.
+        500: If there's an internal server error.
+    """
+    try:
+        pool_address = request.args.get('pool')
+        pair = None if pool_address else request.args.get('pair', 'apt-usdc')
+        coins = None
+        if pair is not None:
+            coins = parse_pair(pair)
+            if coins is None:
+                return jsonify({"error": "Invalid pair. Use '<coin>-<coin>', e.g. 'apt-usdc'."}), 400
+
+        try:
+            percentiles = [float(value) for value in request.args.get('q', '50,90,99').split(',')]
+        except ValueError:
+            percentiles = []
+        if not percentiles or not all(0 <= value <= 100 for value in percentiles):
+            return jsonify({"error": "Invalid q. Use comma-separated percentiles between 0 and 100."}), 400
+
+        end = parse_time(request.args['end']) if 'end' in request.args else datetime.now(timezone.utc)
+        if 'start' in request.args:
+            start = parse_time(request.args['start'])
+        else:
+            time_range = request.args.get('range', 'day').lower()
+            if time_range not in PERCENTILE_RANGES:
+                return jsonify({"error": "Invalid range. Use 'hour', 'day', 'week' or 'month'."}), 400
+            start = end - PERCENTILE_RANGES[time_range] if end else None
+        if start is None or end is None or start >= end:
+            return jsonify({"error": "Invalid start or end. Use ISO 8601 or epoch seconds, start before end."}), 400
+
+        result = slippage_percentiles(
+            [value / 100 for value in percentiles], start, end, coins=coins, pool_address=pool_address
+        )
+
+        return jsonify({
+            "pair": pair,
+            "pool": pool_address,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "count": result['count'],
+            "min": result['min'],
+            "max": result['max'],
+            "percentiles": {
+                f"p{value:g}": None if estimate is None else round(estimate, 8)
+                for value, estimate in zip(percentiles, result['quantiles'])
+            },
+        })
+
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving slippage percentiles: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
@@ -0,0 +1,246 @@
+from flask import Blueprint, jsonify, request, current_app
+from models.aptos_transactions import AptosTransactions
+from models.job_watermark import settled_version
+from models.serializer import RowSerializer
+from routes.helpers import MAX_PAGE_SIZE
+from routes.slippage import parse_pair
+from extensions import db
+from signals import ingested
+from sqlalchemy import and_, or_
+from datetime import datetime, timedelta, timezone
+import logging
+import threading
+import time
+bp = Blueprint('transactions', __name__)
+
+# Set up a logger for error handling
+logger = logging.getLogger(__name__)
+
+# Columns of a trade in the feed, all held by ix_aptos_transactions_pool_address_version and _version_feed
+TRADE_FIELDS = [
+    'version', 'timestamp', 'pool_address', 'provider', 'coin1', 'coin2',
+    'volume', 'delta_x', 'delta_y', 'price_x', 'price_y', 'fees', 'slippage'
+]
+
+# Notified when this worker ingests transactions, so long polls answer without waiting for their next check
+new_versions = threading.Condition()
+
+
+@ingested.connect
+def _wake_long_polls(sender, kind, rows, **extra):
+    if kind == 'transactions':
+        with new_versions:
+            new_versions.notify_all()
+
+
+def version_param(name):
+    """
+    Read an optional non-negative version parameter.
+
+    Raises:
+        ValueError: If it is not a non-negative integer.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise ValueError(f"Invalid {name}. Use a non-negative integer.")
+    return int(value)
+
+
+def trade_page(filters, since_version, until_version, limit):
+    """
+    Read one keyset page of trades in version order.
+
+    With `since_version`, the oldest `limit` trades after it, so a client
+    tails the feed by passing back the `last_version` of each page.
+    Without it, the newest `limit` trades (up to `until_version`), still
+    returned oldest first.
+
+    A version can hold trades in several pools. A page never splits one:
+    when the trades of its boundary version do not all fit, the page holds
+    all of them, so it may exceed `limit`.
+
+    Returns:
+        tuple: (trade dictionaries, whether more trades lie beyond the page).
+    """
+    serializer = RowSerializer.for_model(AptosTransactions, TRADE_FIELDS)
+    query = db.session.query(*serializer.columns).filter(*filters)
+    if until_version is not None:
+        query = query.filter(AptosTransactions.version <= until_version)
+
+    if since_version is not None:
+        page = query.filter(AptosTransactions.version > since_version).order_by(
+            AptosTransactions.version.asc(), AptosTransactions.pool_address.asc()
+        )
+    else:
+        page = query.order_by(AptosTransactions.version.desc(), AptosTransactions.pool_address.desc())
+    rows = page.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    if has_more and rows[limit].version == rows[limit - 1].version:
+        boundary = rows[limit].version
+        rows = [row for row in rows if row.version != boundary] + page.filter(
+            AptosTransactions.version == boundary
+        ).all()
+    else:
+        rows = rows[:limit]
+    if since_version is None:
+        rows = rows[::-1]
+
+    return [serializer.to_dict(row) for row in rows], has_more
+
+
+def settled_until():
+    """The highest version every lower version of which is committed (see JOB_WATERMARK_MARGIN)."""
+    margin = timedelta(seconds=current_app.config['JOB_WATERMARK_MARGIN'])
+    return settled_version(datetime.now(timezone.utc) - margin)
+
+
+def capped(until_version, settled):
+    return settled if until_version is None else min(until_version, settled)
+
+
+def trade_feed(filters):
+    """
+    Answer a trade feed request: validate the paging parameters, read a page
+    and, with `wait`, hold the request until trades after `since_version` exist.
+    """
+    try:
+        since_version = version_param('since_version')
+        until_version = version_param('until_version')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    limit = request.args.get('limit', '100')
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"Invalid limit. Use an integer between 1 and {MAX_PAGE_SIZE}."}), 400
+    limit = int(limit)
+
+    max_wait = current_app.config['TRANSACTIONS_MAX_WAIT']
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = -1
+    if not 0 <= wait <= max_wait:
+        return jsonify({"error": f"Invalid wait. Use seconds between 0 and {max_wait:g}."}), 400
+    if wait and since_version is None:
+        return jsonify({"error": "wait requires since_version."}), 400
+
+    # Versions are not committed in order, so the feed stops at the settled ones:
+    # a lower version committed later would land behind a client's last_version
+    settled = settled_until()
+    trades, has_more = trade_page(filters, since_version, capped(until_version, settled), limit)
+
+    # Long poll: re-read only once the settled version moved past what was already scanned
+    deadline = time.monotonic() + wait
+    checked = since_version
+    while not trades and (until_version is None or checked < until_version):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # Give the connection back to the pool while waiting
+        db.session.close()
+        with new_versions:
+            new_versions.wait(min(current_app.config['TRANSACTIONS_POLL_INTERVAL'], remaining))
+        settled = settled_until()
+        if settled > checked:
+            trades, has_more = trade_page(filters, checked, capped(until_version, settled), limit)
+            checked = settled
+
+    return jsonify({
+        "data": trades,
+        "last_version": trades[-1]['version'] if trades else since_version,
+        "has_more": has_more,
+    })
+
+
+@bp.route('/api/pool/<string:pool_address>/transactions', methods=['GET'])
+def get_pool_transactions(pool_address):
+    """
+    Retrieve a pool's trades in version order, for tailing by version.
+
+    Trades from the last JOB_WATERMARK_MARGIN seconds are left out until
+    every lower version is committed, so tailing by last_version never
+    skips a trade.
+
+    Query Parameters:
+        since_version (int): Return the trades after this version, oldest first. Without it,
+                             the newest trades are returned.
+        until_version (int): Return no trade after this version.
+        limit (int): Trades per response (at most 1000). Defaults to 100.
+        wait (float): With since_version, seconds to hold the request until a newer trade
+                      exists (at most TRANSACTIONS_MAX_WAIT). Defaults to 0.
+
+    Returns:
+        JSON: The trades under 'data', the version to pass as the next since_version under
+              'last_version', and whether more trades lie beyond this page under 'has_more'
+              (newer ones with since_version, older ones without).
+
+    Raises:
+        400: If an invalid version, limit or wait is provided.
+        500: If there's an internal server error.
+    """
+    try:
+        return trade_feed([AptosTransactions.pool_address == pool_address])
+
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving transactions for pool {pool_address}: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
+
+
+@bp.route('/api/transactions', methods=['GET'])
+def get_transactions():
+    """
+    Retrieve the trades of all pools in version order, for tailing by version.
+
+    Filters apply on top of the version range, so a narrow filter tailed
+    from an old since_version may scan many versions per page.
+
+    Query Parameters:
+        since_version (int): Return the trades after this version, oldest first. Without it,
+                             the newest trades are returned.
+        until_version (int): Return no trade after this version.
+        limit (int): Trades per response (at most 1000). Defaults to 100.
+        wait (float): With since_version, seconds to hold the request until a newer
+                      matching trade exists (at most TRANSACTIONS_MAX_WAIT). Defaults to 0.
+        provider (str): Only trades of this provider.
+        coin (str): Only trades with this coin on either side, as a short name such as
+                    'apt' or a full coin type.
+        pair (str): Only trades of this pair, as '<coin>-<coin>' in either order.
+
+    Returns:
+        JSON: As /api/pool/<pool_address>/transactions.
+
+    Raises:
+        400: If an invalid version, limit, wait, coin or pair is provided.
+        500: If there's an internal server error.
+    """
+    try:
+        filters = []
+        provider = request.args.get('provider')
+        if provider:
+            filters.append(AptosTransactions.provider == provider)
+
+        coin = request.args.get('coin')
+        if coin is not None:
+            if not coin:
+                return jsonify({"error": "Invalid coin."}), 400
+            coin = current_app.config['TOKEN_ALIASES'].get(coin.lower(), coin)
+            filters.append(or_(AptosTransactions.coin1 == coin, AptosTransactions.coin2 == coin))
+
+        pair = request.args.get('pair')
+        if pair is not None:
+            coins = parse_pair(pair)
+            if coins is None:
+                return jsonify({"error": "Invalid pair. Use '<coin>-<coin>', e.g. 'apt-usdc'."}), 400
+            coin_a, coin_b = coins
+            filters.append(or_(
+                and_(AptosTransactions.coin1 == coin_a, AptosTransactions.coin2 == coin_b),
+                and_(AptosTransactions.coin1 == coin_b, AptosTransactions.coin2 == coin_a)
+            ))
+
+        return trade_feed(filters)
+
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving transactions: {str(e)}", exc_info=True)
+        return jsonify({"error": "An error occurred while processing the request"}), 500
@@ -0,0 +1,60 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Minimal periodic job runner built on Socket.IO background tasks.
+
+    Jobs run inside an application context, each in its own background task,
+    so they cooperate with the eventlet loop that serves the API. When
+    several workers run, only the elected leader runs the jobs, except
+    those registered with leader_only=False, which maintain per-worker state.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.jobs = {}
+        self.started = False
+
+    def init_app(self, app):
+        self.app = app
+
+    def add_job(self, name, interval, func, leader_only=True):
+        """
+        Register a job to run every `interval` seconds.
+
+        Args:
+            name (str): Unique job name, used in logs.
+            interval (float): Seconds to wait between runs. Jobs with a
+                              non-positive interval are ignored.
+            func (callable): Called with no arguments inside an app context.
+            leader_only (bool): Run only on the elected leader (default) or on
+                                every worker.
+        """
+        if interval and interval > 0:
+            self.jobs[name] = (interval, func, leader_only)
+
+    def start(self):
+        """Start all registered jobs. Calling it more than once is a no-op."""
+        from extensions import socketio
+
+        if self.started:
+            return
+        self.started = True
+        for name, (interval, func, leader_only) in self.jobs.items():
+            socketio.start_background_task(self._run, name, interval, func, leader_only)
+
+    def _run(self, name, interval, func, leader_only):
+        from extensions import socketio, leader
+
+        while True:
+            socketio.sleep(interval)
+            if leader_only and not leader.is_leader:
+                continue
+            try:
+                with self.app.app_context():
+                    func()
+            except Exception as e:
+                logger.error(f"Scheduled job {name} failed: {str(e)}", exc_info=True)
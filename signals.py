@@ -0,0 +1,8 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after every committed ingestion batch with `kind` ('pools' or
+# 'transactions') and `rows`, the dictionaries written. Receivers refresh
+# whatever they derive from the raw tables.
+ingested = _signals.signal('ingested')
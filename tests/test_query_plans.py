@@ -0,0 +1,23 @@
+"""
+Query-plan regression check against a seeded database.
+
+Runs `flask check-query-plans` and fails if any endpoint reads a history
+table with a sequential scan. Needs a database: skipped unless DB_URL is
+set, e.g.
+
+    DB_URL=postgresql://... python -m pytest tests
+"""
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get('DB_URL'), reason='DB_URL is not set')
+
+
+def test_routes_use_indexes():
+    from benchmarks import load_app
+    from commands import check_query_plans
+
+    app = load_app(os.environ['DB_URL'], CACHE_BACKEND='none')
+    result = app.test_cli_runner().invoke(check_query_plans)
+    assert result.exit_code == 0, result.output
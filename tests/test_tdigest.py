@@ -0,0 +1,49 @@
+"""
+Accuracy of the t-digest percentiles against exact NumPy quantiles.
+
+Checks the bounds stated in benchmarks/sketch_accuracy.py on fixed-seed
+samples, both for a single digest and for one merged from per-minute
+digests the way the slippage sketches are.
+"""
+import numpy as np
+import pytest
+
+from aggregates import TDigest
+from benchmarks.sketch_accuracy import DISTRIBUTIONS, QUANTILES, errors, violations
+
+COMPRESSION = 200
+
+
+@pytest.mark.parametrize('name', sorted(DISTRIBUTIONS))
+def test_single_digest_within_bounds(name):
+    values = DISTRIBUTIONS[name](np.random.default_rng(7), 50000)
+    digest = TDigest.from_values(values, COMPRESSION)
+
+    assert digest.count == len(values)
+    assert digest.minimum == values.min() and digest.maximum == values.max()
+    result = {'count': len(values), 'quantiles': errors(values, digest.quantile(QUANTILES), QUANTILES)}
+    assert violations({name: result}) == []
+
+
+@pytest.mark.parametrize('name', sorted(DISTRIBUTIONS))
+def test_merged_digests_within_bounds(name):
+    rng = np.random.default_rng(11)
+    minutes = [DISTRIBUTIONS[name](rng, rng.poisson(40)) for _ in range(600)]
+    hours = [
+        TDigest.merge([TDigest.from_values(values, COMPRESSION) for values in minutes[start:start + 60]], COMPRESSION)
+        for start in range(0, len(minutes), 60)
+    ]
+    digest = TDigest.merge(hours, COMPRESSION)
+    values = np.concatenate(minutes)
+
+    assert digest.count == len(values)
+    result = {'count': len(values), 'quantiles': errors(values, digest.quantile(QUANTILES), QUANTILES)}
+    assert violations({name: result}) == []
+
+
+def test_round_trips_through_bytes():
+    digest = TDigest.from_values(np.random.default_rng(3).lognormal(-6, 1.2, 1000), COMPRESSION)
+    restored = TDigest.from_bytes(digest.to_bytes(), digest.minimum, digest.maximum)
+
+    assert restored.count == digest.count
+    assert np.array_equal(restored.quantile(QUANTILES), digest.quantile(QUANTILES))
@@ -0,0 +1,14 @@
+"""
+Production entry point, served by gunicorn with eventlet workers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Background tasks are started per worker by the post_worker_init hook in
+gunicorn.conf.py; leader election decides which worker actually runs them.
+"""
+import eventlet
+
+# Patch before anything imports sockets, threads or the database driver
+eventlet.monkey_patch()
+
+from app import app  # noqa: E402